@@ -0,0 +1,85 @@
+"""
+在Dify插件运行时之外调用工具的辅助函数
+
+工具通过ToolRuntime获取提供商凭据，session为空时不会与Dify通信；输出的消息由collect_messages直接消费，
+只统计blob字节数，不保留文件内容，避免基准测试进程本身的内存占用掩盖工具的内存占用。
+"""
+from typing import Any, Dict, Iterable, List, Type
+
+from dify_plugin.entities.tool import ToolInvokeMessage, ToolRuntime
+from dify_plugin.file.constants import DIFY_FILE_IDENTITY
+from dify_plugin.file.entities import FileType
+from dify_plugin.file.file import File
+
+
+def make_tool(tool_class: Type, endpoint: str, bucket: str, **credentials: Any) -> Any:
+    """
+    创建使用指定endpoint和bucket的工具实例
+
+    Args:
+        tool_class: 工具类，例如UploadFileTool
+        endpoint: OSS访问域名，本地服务使用127.0.0.1:port
+        bucket: 存储空间名称
+        credentials: 其他提供商凭据，例如bandwidth_limit、endpoint_routing
+
+    Returns:
+        工具实例
+    """
+    runtime_credentials = {
+        'endpoint': endpoint,
+        'bucket': bucket,
+        'access_key_id': 'bench-access-key-id',
+        'access_key_secret': 'bench-access-key-secret'
+    }
+    runtime_credentials.update(credentials)
+    runtime = ToolRuntime(credentials=runtime_credentials, user_id='bench', session_id='bench')
+    return tool_class(runtime=runtime, session=None)
+
+
+def make_file(url: str, filename: str, size: int, mime_type: str = 'application/octet-stream') -> File:
+    """创建与Dify传给工具的文件参数相同的File对象，内容从url下载"""
+    return File(dify_model_identity=DIFY_FILE_IDENTITY, url=url, mime_type=mime_type, filename=filename,
+                extension='.' + filename.rsplit('.', 1)[-1] if '.' in filename else None,
+                size=size, type=FileType.DOCUMENT)
+
+
+def collect_messages(messages: Iterable[ToolInvokeMessage]) -> Dict[str, Any]:
+    """
+    消费工具输出的消息
+
+    Returns:
+        包含以下键的字典：
+        - blob_bytes: blob和分块blob消息的总字节数
+        - blobs: 完整文件的数量（blob消息数量加上分块blob结束标记的数量）
+        - uploaded_bytes: 上传工具JSON结果中上传成功的文件的总字节数
+        - texts: 文本消息列表
+        - errors: 以Failed开头的文本消息数量加上JSON结果中的error_count
+    """
+    blob_bytes = 0
+    blobs = 0
+    uploaded_bytes = 0
+    json_errors = 0
+    texts: List[str] = []
+    for message in messages:
+        message_type = message.type
+        if message_type == ToolInvokeMessage.MessageType.BLOB:
+            blob_bytes += len(message.message.blob)
+            blobs += 1
+        elif message_type == ToolInvokeMessage.MessageType.BLOB_CHUNK:
+            blob_bytes += len(message.message.blob)
+            if message.message.end:
+                blobs += 1
+        elif message_type == ToolInvokeMessage.MessageType.TEXT:
+            texts.append(message.message.text)
+        elif message_type == ToolInvokeMessage.MessageType.JSON:
+            result = message.message.json_object
+            json_errors += result.get('error_count', 0)
+            uploaded_bytes += sum(file.get('file_size_bytes', 0) for file in result.get('files', [])
+                                  if file.get('status') == 'success')
+    return {
+        'blob_bytes': blob_bytes,
+        'blobs': blobs,
+        'uploaded_bytes': uploaded_bytes,
+        'texts': texts,
+        'errors': sum(1 for text in texts if text.startswith('Failed')) + json_errors
+    }
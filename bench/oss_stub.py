@@ -0,0 +1,554 @@
+"""
+本地OSS兼容服务，用于基准测试
+
+只实现插件用到的接口：PUT/GET/HEAD对象（包括Range读取和对象元数据）、拷贝对象、分片上传、
+列举对象和批量删除。对象保存在内存中，不校验签名，只支持path-style访问（http://host:port/bucket/key），
+使用IP或localhost作为endpoint时oss2和插件的异步客户端都会使用这种方式。
+
+可以模拟每个请求的固定延迟、每个连接的带宽上限，并按比例返回503 SlowDown错误。
+
+运行方式：
+    python -m bench.oss_stub --port 9000 --latency 0.02 --bandwidth 50 --error-rate 0.01
+
+启动后第一行输出endpoint。另外提供以下控制接口（bucket名称不能以下划线开头，因此不会与对象请求冲突）：
+    POST /_stub/seed?bucket=b&key=k&size=n  生成n字节的随机对象
+    POST /_stub/reset                       清空所有对象和分片上传
+    GET  /_stub/stats                       返回请求数、注入的错误数和收发字节数（JSON）
+    GET  /_stub/objects/<bucket>/<key>      直接读取对象，用作Dify文件的下载地址（不计入统计）
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+# 模拟带宽时每次收发的字节数
+THROTTLE_CHUNK_SIZE = 64 * 1024
+# 列举对象时默认返回的最大条目数
+DEFAULT_MAX_KEYS = 100
+
+_LAST_MODIFIED = '2024-01-01T00:00:00.000Z'
+
+
+class StubConfig:
+    """
+    模拟的网络条件
+
+    Args:
+        latency: 每个请求在处理前等待的时间（秒）
+        bandwidth: 每个连接的带宽上限（字节/秒），0表示不限制
+        error_rate: 返回503 SlowDown的请求比例（0到1）
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+
+
+class ObjectStore:
+    """内存中的对象、分片上传和请求统计"""
+
+    def __init__(self):
+        self.objects: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'requests': 0, 'errors_injected': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self.lock = threading.Lock()
+
+    def put(self, bucket: str, key: str, data: bytes, content_type: str,
+            meta: Optional[Dict[str, str]] = None, etag: Optional[str] = None) -> Dict[str, Any]:
+        obj = {
+            'data': data,
+            'content_type': content_type or 'application/octet-stream',
+            'etag': etag or '"%s"' % hashlib.md5(data).hexdigest().upper(),
+            'mtime': time.time(),
+            'meta': dict(meta or {})
+        }
+        with self.lock:
+            self.objects[(bucket, key)] = obj
+        return obj
+
+    def get(self, bucket: str, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.objects.get((bucket, key))
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[name] += amount
+
+    def reset(self) -> None:
+        with self.lock:
+            self.objects.clear()
+            self.uploads.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+
+
+class OssStubServer(ThreadingHTTPServer):
+    """每个连接一个线程的OSS兼容服务"""
+
+    daemon_threads = True
+    # 基准测试会同时建立大量连接，默认的监听队列长度（5）会导致连接被拒绝后重试
+    request_queue_size = 512
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig):
+        super().__init__(address, OssStubHandler)
+        self.config = config
+        self.store = ObjectStore()
+
+    def handle_error(self, request: Any, client_address: Tuple[str, int]) -> None:
+        # 客户端断开连接（例如取消下载、连接池关闭）属于正常情况，不输出错误
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class OssStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: OssStubServer
+
+    def setup(self) -> None:
+        super().setup()
+        # 响应头和响应体分两次写入，关闭Nagle算法避免与客户端的延迟确认叠加产生约40ms的等待
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    # ---------- 请求解析与响应 ----------
+
+    def _parse_path(self) -> Tuple[str, str, Dict[str, str]]:
+        """解析path-style请求，返回(bucket, key, 查询参数)"""
+        parsed = urlparse(self.path)
+        parts = parsed.path.lstrip('/').split('/', 1)
+        key = unquote(parts[1]) if len(parts) > 1 else ''
+        query = {name: values[0] for name, values in parse_qs(parsed.query, keep_blank_values=True).items()}
+        return parts[0], key, query
+
+    def _throttle(self, started: float, transferred: int) -> None:
+        """按连接带宽上限等待"""
+        bandwidth = self.server.config.bandwidth
+        if bandwidth > 0:
+            delay = transferred / bandwidth - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _read_body(self) -> bytes:
+        """读取请求体，支持chunked编码，按带宽上限限速"""
+        body = bytearray()
+        started = time.monotonic()
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+                self._throttle(started, len(body))
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, THROTTLE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                body += chunk
+                remaining -= len(chunk)
+                self._throttle(started, len(body))
+        self.server.store.count('bytes_in', len(body))
+        return bytes(body)
+
+    def _send(self, status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None,
+              content_length: Optional[int] = None, chunked: bool = False) -> None:
+        """发送响应，HEAD请求只发送响应头；chunked为True时以分块编码发送，不返回Content-Length"""
+        self.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault('x-oss-request-id', uuid.uuid4().hex.upper())
+        if chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        else:
+            headers['Content-Length'] = str(len(body) if content_length is None else content_length)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command == 'HEAD' or (not body and not chunked):
+            return
+        started = time.monotonic()
+        view = memoryview(body)
+        for offset in range(0, len(body), THROTTLE_CHUNK_SIZE):
+            chunk = view[offset:offset + THROTTLE_CHUNK_SIZE]
+            if chunked:
+                self.wfile.write(f'{len(chunk):x}\r\n'.encode('ascii') + chunk + b'\r\n')
+            else:
+                self.wfile.write(chunk)
+            self._throttle(started, min(offset + THROTTLE_CHUNK_SIZE, len(body)))
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+        self.server.store.count('bytes_out', len(body))
+
+    def _send_xml(self, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(200, body.encode('utf-8'), dict(headers or {}, **{'Content-Type': 'application/xml'}))
+
+    def _send_error(self, status: int, code: str, message: str = '') -> None:
+        body = (f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code>'
+                f'<Message>{escape(message)}</Message><RequestId>stub</RequestId></Error>')
+        self._send(status, body.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+    def _begin(self) -> bool:
+        """统计请求，模拟延迟和错误，返回是否继续处理"""
+        config = self.server.config
+        self.server.store.count('requests')
+        if config.latency > 0:
+            time.sleep(config.latency)
+        if config.error_rate > 0 and random.random() < config.error_rate:
+            # 先读完请求体，保证连接可以复用
+            self._read_body()
+            self.server.store.count('errors_injected')
+            self._send_error(503, 'SlowDown', 'Please reduce your request rate.')
+            return False
+        return True
+
+    def _object_headers(self, obj: Dict[str, Any]) -> Dict[str, str]:
+        headers = {
+            'Content-Type': obj['content_type'],
+            'ETag': obj['etag'],
+            'Last-Modified': formatdate(obj['mtime'], usegmt=True),
+            'Accept-Ranges': 'bytes',
+            'x-oss-object-type': 'Normal',
+            'x-oss-storage-class': 'Standard'
+        }
+        headers.update(obj['meta'])
+        return headers
+
+    def _copy_source(self) -> Optional[Dict[str, Any]]:
+        """获取x-oss-copy-source指向的对象"""
+        source = self.headers.get('x-oss-copy-source')
+        if not source:
+            return None
+        source_bucket, source_key = unquote(source).lstrip('/').split('/', 1)
+        return self.server.store.get(source_bucket, source_key)
+
+    # ---------- HTTP方法 ----------
+
+    def do_PUT(self) -> None:
+        bucket, key, query = self._parse_path()
+        if not self._begin():
+            return
+        if 'uploadId' in query:
+            return self._upload_part(query)
+
+        data = self._read_body()
+        if self.headers.get('x-oss-copy-source'):
+            source = self._copy_source()
+            if source is None:
+                return self._send_error(404, 'NoSuchKey', 'The specified key does not exist.')
+            obj = self.server.store.put(bucket, key, source['data'], source['content_type'], source['meta'],
+                                        etag=source['etag'])
+            return self._send_xml(f'<CopyObjectResult><ETag>{obj["etag"]}</ETag>'
+                                  f'<LastModified>{_LAST_MODIFIED}</LastModified></CopyObjectResult>',
+                                  {'ETag': obj['etag']})
+
+        meta = {name: value for name, value in self.headers.items() if name.lower().startswith('x-oss-meta-')}
+        obj = self.server.store.put(bucket, key, data, self.headers.get('Content-Type'), meta)
+        self._send(200, headers={'ETag': obj['etag']})
+
+    def _upload_part(self, query: Dict[str, str]) -> None:
+        """上传分片或拷贝分片"""
+        data = self._read_body()
+        store = self.server.store
+        with store.lock:
+            upload = store.uploads.get(query['uploadId'])
+        if upload is None:
+            return self._send_error(404, 'NoSuchUpload', 'The specified upload does not exist.')
+
+        copy = bool(self.headers.get('x-oss-copy-source'))
+        if copy:
+            source = self._copy_source()
+            if source is None:
+                return self._send_error(404, 'NoSuchKey', 'The specified key does not exist.')
+            data = source['data']
+            byte_range = self.headers.get('x-oss-copy-source-range')
+            if byte_range:
+                start, end = byte_range.split('=', 1)[1].split('-')
+                data = data[int(start):int(end) + 1]
+
+        etag = '"%s"' % hashlib.md5(data).hexdigest().upper()
+        with store.lock:
+            upload['parts'][int(query['partNumber'])] = (etag, data)
+        if copy:
+            return self._send_xml(f'<CopyPartResult><ETag>{etag}</ETag>'
+                                  f'<LastModified>{_LAST_MODIFIED}</LastModified></CopyPartResult>',
+                                  {'ETag': etag})
+        self._send(200, headers={'ETag': etag})
+
+    def do_POST(self) -> None:
+        bucket, key, query = self._parse_path()
+        if bucket == '_stub':
+            return self._control(key, query)
+        if not self._begin():
+            return
+        body = self._read_body()
+        store = self.server.store
+
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex.upper()
+            with store.lock:
+                store.uploads[upload_id] = {
+                    'bucket': bucket, 'key': key, 'parts': {},
+                    'content_type': self.headers.get('Content-Type') or 'application/octet-stream'
+                }
+            return self._send_xml(f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket>'
+                                  f'<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>'
+                                  f'</InitiateMultipartUploadResult>')
+
+        if 'uploadId' in query:
+            return self._complete_upload(bucket, key, query['uploadId'], body)
+
+        if 'delete' in query:
+            root = ET.fromstring(body)
+            quiet = (root.findtext('Quiet') or 'false').lower() == 'true'
+            keys = [item.findtext('Key') for item in root.findall('Object')]
+            with store.lock:
+                for item_key in keys:
+                    store.objects.pop((bucket, item_key), None)
+            deleted = '' if quiet else ''.join(f'<Deleted><Key>{escape(k)}</Key></Deleted>' for k in keys)
+            return self._send_xml(f'<DeleteResult>{deleted}</DeleteResult>')
+
+        self._send_error(400, 'InvalidRequest', 'Unsupported POST request.')
+
+    def _complete_upload(self, bucket: str, key: str, upload_id: str, body: bytes) -> None:
+        """合并分片，请求头x-oss-complete-all为yes时合并所有已上传的分片"""
+        store = self.server.store
+        with store.lock:
+            upload = store.uploads.pop(upload_id, None)
+        if upload is None:
+            return self._send_error(404, 'NoSuchUpload', 'The specified upload does not exist.')
+
+        if self.headers.get('x-oss-complete-all') == 'yes':
+            numbers = sorted(upload['parts'])
+        else:
+            numbers = [int(part.findtext('PartNumber')) for part in ET.fromstring(body).findall('Part')]
+        if any(number not in upload['parts'] for number in numbers):
+            return self._send_error(400, 'InvalidPart', 'One or more of the specified parts could not be found.')
+
+        data = b''.join(upload['parts'][number][1] for number in numbers)
+        etag = '"%s-%d"' % (hashlib.md5(data).hexdigest().upper(), len(numbers))
+        store.put(bucket, key, data, upload['content_type'], etag=etag)
+        self._send_xml(f'<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>'
+                       f'<ETag>{etag}</ETag></CompleteMultipartUploadResult>', {'ETag': etag})
+
+    def do_DELETE(self) -> None:
+        bucket, key, query = self._parse_path()
+        if not self._begin():
+            return
+        store = self.server.store
+        with store.lock:
+            if 'uploadId' in query:
+                store.uploads.pop(query['uploadId'], None)
+            else:
+                store.objects.pop((bucket, key), None)
+        self._send(204)
+
+    def do_HEAD(self) -> None:
+        self.do_GET()
+
+    def do_GET(self) -> None:
+        bucket, key, query = self._parse_path()
+        if bucket == '_stub':
+            return self._control(key, query)
+        if not self._begin():
+            return
+        if 'uploadId' in query:
+            return self._list_parts(bucket, key, query['uploadId'])
+        if not key:
+            return self._list_objects(bucket, query)
+
+        obj = self.server.store.get(bucket, key)
+        if obj is None:
+            return self._send_error(404, 'NoSuchKey', 'The specified key does not exist.')
+        headers = self._object_headers(obj)
+        data = obj['data']
+
+        if_match = self.headers.get('If-Match')
+        if if_match and if_match != obj['etag']:
+            return self._send_error(412, 'PreconditionFailed', 'At least one of the pre-conditions failed.')
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and if_none_match == obj['etag']:
+            return self._send(304, headers={'ETag': obj['etag']})
+
+        if self.command == 'HEAD' or 'objectMeta' in query:
+            return self._send(200, headers=headers, content_length=len(data))
+
+        if 'x-oss-process' in query:
+            # 不做真正的图片处理，只返回缩小后的内容，模拟处理结果比原图小；
+            # 与OSS一致，处理结果以分块编码返回，没有Content-Length
+            data = data[:max(1, len(data) // 4)]
+            headers['Content-Type'] = 'image/webp'
+            headers.pop('Content-Length', None)
+            return self._send(200, data, headers, chunked=True)
+
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            start, end = byte_range[len('bytes='):].split(',')[0].split('-')
+            if not start:
+                start, end = max(len(data) - int(end), 0), len(data) - 1
+            start = int(start)
+            end = min(int(end), len(data) - 1) if end else len(data) - 1
+            if start >= len(data):
+                return self._send_error(416, 'InvalidRange', 'The requested range cannot be satisfied.')
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return self._send(206, data[start:end + 1], headers)
+        self._send(200, data, headers)
+
+    def _list_parts(self, bucket: str, key: str, upload_id: str) -> None:
+        store = self.server.store
+        with store.lock:
+            upload = store.uploads.get(upload_id)
+            parts = sorted(upload['parts'].items()) if upload else None
+        if parts is None:
+            return self._send_error(404, 'NoSuchUpload', 'The specified upload does not exist.')
+        items = ''.join(f'<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag><Size>{len(data)}</Size>'
+                        f'<LastModified>{_LAST_MODIFIED}</LastModified></Part>' for number, (etag, data) in parts)
+        self._send_xml(f'<ListPartsResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>'
+                       f'<UploadId>{upload_id}</UploadId><NextPartNumberMarker>0</NextPartNumberMarker>'
+                       f'<MaxParts>1000</MaxParts><IsTruncated>false</IsTruncated>{items}</ListPartsResult>')
+
+    def _list_objects(self, bucket: str, query: Dict[str, str]) -> None:
+        """列举对象，list-type为2时使用ListObjectsV2的分页参数，否则使用ListObjects（V1）"""
+        store = self.server.store
+        v2 = query.get('list-type') == '2'
+        prefix = query.get('prefix', '')
+        delimiter = query.get('delimiter', '')
+        max_keys = int(query.get('max-keys') or DEFAULT_MAX_KEYS)
+        after = (query.get('continuation-token') or query.get('start-after', '')) if v2 else query.get('marker', '')
+
+        with store.lock:
+            keys = sorted(k for (b, k) in store.objects if b == bucket and k.startswith(prefix) and k > after)
+            objects = {k: store.objects[(bucket, k)] for k in keys}
+
+        contents, prefixes = [], []
+        last_key = ''
+        truncated = False
+        for k in keys:
+            rest = k[len(prefix):]
+            common_prefix = prefix + rest.split(delimiter, 1)[0] + delimiter if delimiter and delimiter in rest else None
+            if common_prefix in prefixes:
+                last_key = k
+                continue
+            if len(contents) + len(prefixes) >= max_keys:
+                truncated = True
+                break
+            if common_prefix:
+                prefixes.append(common_prefix)
+            else:
+                contents.append(k)
+            last_key = k
+
+        xml = [f'<ListBucketResult><Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>'
+               f'<MaxKeys>{max_keys}</MaxKeys><Delimiter>{escape(delimiter)}</Delimiter>'
+               f'<IsTruncated>{"true" if truncated else "false"}</IsTruncated>']
+        if v2:
+            xml.append(f'<KeyCount>{len(contents) + len(prefixes)}</KeyCount>')
+            if truncated:
+                xml.append(f'<NextContinuationToken>{escape(last_key)}</NextContinuationToken>')
+        else:
+            xml.append(f'<Marker>{escape(after)}</Marker>')
+            if truncated:
+                xml.append(f'<NextMarker>{escape(last_key)}</NextMarker>')
+        for k in contents:
+            obj = objects[k]
+            xml.append(f'<Contents><Key>{escape(k)}</Key><LastModified>{_LAST_MODIFIED}</LastModified>'
+                       f'<ETag>{obj["etag"]}</ETag><Type>Normal</Type><Size>{len(obj["data"])}</Size>'
+                       f'<StorageClass>Standard</StorageClass></Contents>')
+        for common_prefix in prefixes:
+            xml.append(f'<CommonPrefixes><Prefix>{escape(common_prefix)}</Prefix></CommonPrefixes>')
+        xml.append('</ListBucketResult>')
+        self._send_xml(''.join(xml))
+
+    def _control(self, path: str, query: Dict[str, str]) -> None:
+        """基准测试使用的控制接口，不模拟延迟和错误"""
+        store = self.server.store
+        action, _, target = path.partition('/')
+        if self.command == 'POST':
+            self._read_body()
+        if action == 'objects' and self.command in ('GET', 'HEAD'):
+            bucket, _, key = target.partition('/')
+            obj = store.get(bucket, key)
+            if obj is None:
+                return self._send_error(404, 'NoSuchKey', 'The specified key does not exist.')
+            self.send_response(200)
+            self.send_header('Content-Type', obj['content_type'])
+            self.send_header('Content-Length', str(len(obj['data'])))
+            self.end_headers()
+            if self.command == 'GET':
+                self.wfile.write(obj['data'])
+            return
+        if action == 'seed' and self.command == 'POST':
+            obj = store.put(query['bucket'], query['key'], os.urandom(int(query['size'])),
+                            query.get('content_type', 'application/octet-stream'))
+            return self._send(200, headers={'ETag': obj['etag']})
+        if action == 'reset' and self.command == 'POST':
+            store.reset()
+            return self._send(204)
+        if action == 'stats':
+            with store.lock:
+                body = json.dumps(store.stats).encode('utf-8')
+            return self._send(200, body, {'Content-Type': 'application/json'})
+        self._send_error(404, 'NoSuchAction', f'Unknown stub action: {path}')
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, config: Optional[StubConfig] = None) -> OssStubServer:
+    """
+    在后台线程中启动服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0表示随机选择
+        config: 模拟的网络条件
+
+    Returns:
+        OssStubServer对象，endpoint属性为访问地址，调用shutdown()停止
+    """
+    server = OssStubServer((host, port), config or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local OSS-compatible stub server for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay added to every request, in seconds')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='per-connection bandwidth in MB/s, 0 = unlimited')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503 SlowDown')
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.bandwidth * 1024 * 1024, args.error_rate)
+    server = OssStubServer((args.host, args.port), config)
+    print(server.endpoint, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
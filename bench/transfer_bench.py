@@ -0,0 +1,351 @@
+"""
+上传/下载工具的基准测试
+
+针对本地OSS兼容服务（bench.oss_stub）依次运行各个工具，统计不同文件大小和批量大小下的吞吐量、
+单次调用延迟的p50/p95/p99以及峰值内存（RSS）。每个场景在独立的子进程中运行，峰值内存只包含该场景，
+OSS服务运行在另一个进程中，不占用工具进程的CPU和内存。
+
+运行方式（在插件根目录下）：
+    python -m bench.transfer_bench
+    python -m bench.transfer_bench --tools get_batch --sizes 1M,16M --batches 10,100 \\
+        --latency 0.02 --bandwidth 20 --param download_mode=async --param concurrency=16
+    python -m bench.transfer_bench --error-rate 0.05 --json result.json
+
+单文件工具（upload、get、public）每个场景调用batch次，每次一个文件；批量工具（multi_upload、get_batch）
+每个场景调用repeat次，每次batch个文件。吞吐量为场景内传输的总字节数除以总耗时。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+# 基准测试使用的存储空间：工具读写的bucket，以及模拟Dify文件存储的bucket
+BENCH_BUCKET = 'bench'
+SOURCE_BUCKET = 'dify-files'
+
+# 工具名称：(模块, 类名, 是否为批量工具, 是否为上传工具)
+TOOLS = {
+    'upload': ('tools.upload_file', 'UploadFileTool', False, True),
+    'multi_upload': ('tools.multi_upload_files', 'MultiUploadFilesTool', True, True),
+    'get': ('tools.get_file_by_url', 'GetFileByUrlTool', False, False),
+    'get_batch': ('tools.get_files_by_urls', 'GetFilesByUrlsTool', True, False),
+    'public': ('tools.get_public_file_by_url', 'GetPublicFileByUrlTool', False, False)
+}
+
+DEFAULT_SIZES = '64K,1M,16M'
+DEFAULT_BATCHES = '1,10,50'
+# 单个场景传输的数据量上限，超过时跳过该场景，避免耗尽本机内存
+DEFAULT_MAX_SCENARIO_BYTES = 1024 * 1024 * 1024
+
+_SIZE_UNITS = {'K': 1024, 'M': 1024 * 1024, 'G': 1024 * 1024 * 1024}
+
+
+def parse_size(value: str) -> int:
+    """解析文件大小，支持K、M、G后缀，例如64K、16M"""
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in _SIZE_UNITS:
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    """将字节数格式化为64K、16M等形式"""
+    for unit in ('G', 'M', 'K'):
+        if size >= _SIZE_UNITS[unit] and size % _SIZE_UNITS[unit] == 0:
+            return f"{size // _SIZE_UNITS[unit]}{unit}"
+    return str(size)
+
+
+def parse_param(value: str) -> tuple:
+    """解析key=value形式的工具参数，数字和布尔值转换为对应类型"""
+    name, _, raw = value.partition('=')
+    if raw.lower() in ('true', 'false'):
+        return name, raw.lower() == 'true'
+    try:
+        return name, int(raw)
+    except ValueError:
+        pass
+    try:
+        return name, float(raw)
+    except ValueError:
+        return name, raw
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+# ---------- 子进程：运行一个场景 ----------
+
+def _peak_rss() -> Optional[int]:
+    """当前进程的峰值内存（字节），无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _stub_stats(endpoint: str) -> Dict[str, int]:
+    """获取OSS服务的请求统计"""
+    with urllib.request.urlopen(f"{endpoint}/_stub/stats") as response:
+        return json.loads(response.read())
+
+
+def _build_parameters(spec: Dict[str, Any], keys: List[str]) -> Dict[str, Any]:
+    """根据场景构建一次调用的工具参数"""
+    from bench.fake_runtime import make_file
+
+    endpoint = spec['endpoint']
+    host = endpoint.split('://', 1)[1]
+    tool = spec['tool']
+    parameters = dict(spec['params'])
+    if tool in ('upload', 'multi_upload'):
+        files = [make_file(f"{endpoint}/_stub/objects/{SOURCE_BUCKET}/{key}", os.path.basename(key), spec['size'])
+                 for key in keys]
+        parameters.setdefault('directory', 'bench-out')
+        if tool == 'upload':
+            parameters['file'] = files[0]
+        else:
+            parameters['files'] = files
+    elif tool == 'public':
+        parameters['file_url'] = f"{endpoint}/{BENCH_BUCKET}/{keys[0]}"
+    else:
+        # 标准OSS URL格式：bucket.endpoint/key，endpoint为本地服务地址
+        urls = [f"http://{BENCH_BUCKET}.{host}/{key}" for key in keys]
+        if tool == 'get':
+            parameters['file_url'] = urls[0]
+        else:
+            parameters['file_urls'] = ';'.join(urls)
+    return parameters
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在当前进程中运行一个场景
+
+    Args:
+        spec: 场景描述，包括tool、endpoint、size、batch、repeat、warmup、params和credentials
+
+    Returns:
+        场景结果，包括各次调用的耗时、传输的字节数、错误数和峰值内存
+    """
+    import importlib
+    from bench.fake_runtime import collect_messages, make_tool
+
+    module_name, class_name, is_batch, is_upload = TOOLS[spec['tool']]
+    tool_class = getattr(importlib.import_module(module_name), class_name)
+    # 与提供商凭据一致，endpoint不带协议前缀
+    tool = make_tool(tool_class, spec['endpoint'].split('://', 1)[1], BENCH_BUCKET, **spec['credentials'])
+    keys = [f"src/{index}.bin" for index in range(spec['batch'])]
+
+    if is_batch:
+        calls = [keys] * spec['repeat']
+    else:
+        calls = [[key] for key in keys]
+
+    # 预热：建立连接池、加载依赖，不计入结果
+    for _ in range(spec['warmup']):
+        collect_messages(tool._invoke(_build_parameters(spec, keys[:1])))
+    baseline_rss = _peak_rss()
+    stats_before = _stub_stats(spec['endpoint'])
+
+    latencies = []
+    total_bytes = 0
+    errors = 0
+    started = time.perf_counter()
+    for call_keys in calls:
+        parameters = _build_parameters(spec, call_keys)
+        call_started = time.perf_counter()
+        result = collect_messages(tool._invoke(parameters))
+        latencies.append(time.perf_counter() - call_started)
+        errors += result['errors']
+        total_bytes += result['uploaded_bytes'] if is_upload else result['blob_bytes']
+    elapsed = time.perf_counter() - started
+    stats_after = _stub_stats(spec['endpoint'])
+
+    return {
+        'latencies': latencies,
+        'elapsed': elapsed,
+        'bytes': total_bytes,
+        'errors': errors,
+        'baseline_rss': baseline_rss,
+        'peak_rss': _peak_rss(),
+        'oss_requests': stats_after['requests'] - stats_before['requests'],
+        'errors_injected': stats_after['errors_injected'] - stats_before['errors_injected']
+    }
+
+
+# ---------- 主进程：启动服务并调度场景 ----------
+
+class StubProcess:
+    """在子进程中运行bench.oss_stub，并通过控制接口准备数据"""
+
+    def __init__(self, latency: float, bandwidth: float, error_rate: float):
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'bench.oss_stub', '--latency', str(latency), '--bandwidth', str(bandwidth),
+             '--error-rate', str(error_rate)],
+            stdout=subprocess.PIPE, text=True, cwd=_root_dir()
+        )
+        self.endpoint = self._process.stdout.readline().strip()
+        if not self.endpoint:
+            raise RuntimeError('OSS stub server failed to start')
+
+    def _control(self, action: str, **query: Any) -> bytes:
+        url = f"{self.endpoint}/_stub/{action}"
+        if query:
+            url = f"{url}?{urlencode(query)}"
+        with urllib.request.urlopen(urllib.request.Request(url, data=b'', method='POST')) as response:
+            return response.read()
+
+    def prepare(self, bucket: str, count: int, size: int) -> None:
+        """清空服务中的数据，生成count个大小为size的对象src/0.bin、src/1.bin..."""
+        self._control('reset')
+        for index in range(count):
+            self._control('seed', bucket=bucket, key=f"src/{index}.bin", size=size)
+
+    def close(self) -> None:
+        self._process.terminate()
+        self._process.wait()
+
+
+def _root_dir() -> str:
+    """插件根目录（bench的上一级目录），子进程在该目录下运行，以便导入tools和bench"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_scenario(stub: StubProcess, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """准备数据后在独立的子进程中运行一个场景，返回汇总结果"""
+    is_upload = TOOLS[spec['tool']][3]
+    stub.prepare(SOURCE_BUCKET if is_upload else BENCH_BUCKET, spec['batch'], spec['size'])
+
+    process = subprocess.run([sys.executable, '-m', 'bench.transfer_bench', '--worker'],
+                             input=json.dumps(spec), capture_output=True, text=True, cwd=_root_dir())
+    if process.returncode != 0:
+        raise RuntimeError(f"Scenario {spec['tool']} failed:\n{process.stderr.strip()}")
+    # 工具或依赖可能向标准输出打印内容，结果在最后一行
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+
+    latencies = result['latencies']
+    elapsed = result['elapsed']
+    mb = 1024 * 1024
+    return {
+        'tool': spec['tool'],
+        'size': spec['size'],
+        'batch': spec['batch'],
+        'calls': len(latencies),
+        'errors': result['errors'],
+        'bytes': result['bytes'],
+        'elapsed_s': round(elapsed, 3),
+        'throughput_mb_s': round(result['bytes'] / mb / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'peak_rss_mb': round(result['peak_rss'] / mb, 1) if result['peak_rss'] else None,
+        'rss_growth_mb': (round((result['peak_rss'] - result['baseline_rss']) / mb, 1)
+                          if result['peak_rss'] and result['baseline_rss'] else None),
+        'oss_requests': result['oss_requests'],
+        'errors_injected': result['errors_injected']
+    }
+
+
+_COLUMNS = [
+    ('tool', 'tool', 12), ('size', 'size', 6), ('batch', 'batch', 6), ('calls', 'calls', 6),
+    ('throughput_mb_s', 'MB/s', 9), ('p50_ms', 'p50 ms', 9), ('p95_ms', 'p95 ms', 9), ('p99_ms', 'p99 ms', 9),
+    ('peak_rss_mb', 'RSS MB', 8), ('rss_growth_mb', '+RSS MB', 8), ('oss_requests', 'reqs', 6),
+    ('errors_injected', '503s', 6), ('errors', 'errors', 6)
+]
+
+
+def _format_row(row: Dict[str, Any]) -> str:
+    cells = []
+    for name, _, width in _COLUMNS:
+        value = row[name]
+        if name == 'size':
+            value = format_size(value)
+        cells.append(str('-' if value is None else value).rjust(width))
+    return ' '.join(cells)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the OSS transfer tools against a local stub server')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--tools', default=','.join(TOOLS), help=f"comma-separated tools: {', '.join(TOOLS)}")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated file sizes, e.g. 64K,1M,16M')
+    parser.add_argument('--batches', default=DEFAULT_BATCHES, help='comma-separated batch sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='invocations per scenario for the batch tools')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed single-file invocations per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='stub delay per request, in seconds')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='stub bandwidth per connection in MB/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub requests failing with 503')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help='tool parameter passed to every tool, e.g. download_mode=async (repeatable)')
+    parser.add_argument('--credential', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra provider credential, e.g. bandwidth_limit=50 (repeatable)')
+    parser.add_argument('--max-scenario-bytes', type=parse_size, default=DEFAULT_MAX_SCENARIO_BYTES,
+                        help='skip scenarios that would transfer more than this, e.g. 512M')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(sys.stdin.read()))))
+        return
+
+    tools = [name.strip() for name in args.tools.split(',') if name.strip()]
+    unknown = [name for name in tools if name not in TOOLS]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)}")
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    batches = [int(batch) for batch in args.batches.split(',')]
+    params = dict(parse_param(value) for value in args.param)
+    credentials = dict(parse_param(value) for value in args.credential)
+
+    stub = StubProcess(args.latency, args.bandwidth, args.error_rate)
+    print(f"OSS stub: {stub.endpoint} (latency {args.latency}s, bandwidth "
+          f"{args.bandwidth or 'unlimited'} MB/s, error rate {args.error_rate})")
+    print(' '.join(title.rjust(width) for _, title, width in _COLUMNS))
+
+    rows = []
+    try:
+        for tool in tools:
+            is_batch = TOOLS[tool][2]
+            for size in sizes:
+                for batch in batches:
+                    if size * batch * (args.repeat if is_batch else 1) > args.max_scenario_bytes:
+                        continue
+                    spec = {
+                        'tool': tool, 'endpoint': stub.endpoint, 'size': size, 'batch': batch,
+                        'repeat': args.repeat, 'warmup': args.warmup, 'params': params,
+                        'credentials': credentials
+                    }
+                    row = run_scenario(stub, spec)
+                    rows.append(row)
+                    print(_format_row(row), flush=True)
+    finally:
+        stub.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'config': {
+                    'latency': args.latency, 'bandwidth': args.bandwidth, 'error_rate': args.error_rate,
+                    'params': params, 'credentials': credentials, 'repeat': args.repeat
+                },
+                'results': rows
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
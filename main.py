@@ -1,6 +1,8 @@
 from dify_plugin import Plugin, DifyPluginEnv
 
-plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
+from tools.deadline import MAX_REQUEST_TIMEOUT
+
+plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=MAX_REQUEST_TIMEOUT))
 
 if __name__ == '__main__':
     plugin.run()
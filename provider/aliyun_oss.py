@@ -1,4 +1,3 @@
-from oss2 import Auth, Bucket
 from oss2.exceptions import OssError
 from typing import Any, Dict
 
@@ -7,6 +6,8 @@ from typing import Any, Dict
 from dify_plugin.interfaces.tool import ToolProvider
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 
+from tools.oss_client import get_bucket
+
 
 class AliyunOssProvider(ToolProvider):
     def _validate_credentials(self, credentials: Dict[str, Any]) -> None:
@@ -28,11 +29,22 @@ class AliyunOssProvider(ToolProvider):
                 if file_value.startswith((' ', '/', '\\')):
                     raise ToolProviderCredentialValidationError("filename不能以空格、/或\\开头")
 
-            # 3. 创建认证对象
+            # 限速配置必须是正数
+            for field in ('bandwidth_limit', 'request_rate_limit'):
+                if credentials.get(field) not in (None, ''):
+                    try:
+                        valid = float(credentials[field]) > 0
+                    except (TypeError, ValueError):
+                        valid = False
+                    if not valid:
+                        raise ToolProviderCredentialValidationError(f"{field} 必须是大于0的数字")
+
+            # 3. 获取OSS客户端（与工具共享连接池，验证通过后的首次工具调用可复用连接）
             # 建议增加对 CName 的支持，防止 endpoint 填写自定义域名时出错，但这里先保持原样
-            auth = Auth(credentials['access_key_id'], credentials['access_key_secret'])
             # connect_timeout 设置连接超时
-            bucket = Bucket(auth, credentials['endpoint'], credentials['bucket'], connect_timeout=10)
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                credentials['endpoint'], credentials['bucket'], connect_timeout=10,
+                                limits=credentials)
 
             # 4. 进行远程校验
             # 使用 list_objects(max_keys=1) 替代 get_bucket_info()
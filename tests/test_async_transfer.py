@@ -0,0 +1,149 @@
+"""
+异步传输核心（AsyncOssClient）的测试
+
+签名按OSS文档独立计算后与客户端生成的请求头比较；收发数据和错误映射通过bench中的本地OSS服务验证。
+本地服务不校验签名，V4签名的请求通过替换地域解析函数发送到本地服务。
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+
+import oss2
+import pytest
+
+from bench.oss_stub import StubConfig, start_server
+from tools import async_transfer
+from tools.async_transfer import AsyncOssClient
+from tools.endpoint_router import endpoint_region
+
+ACCESS_KEY_ID = 'test-access-key-id'
+ACCESS_KEY_SECRET = 'test-access-key-secret'
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def server():
+    server = start_server('127.0.0.1', 0, StubConfig())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(coroutine_func):
+    """在新的事件循环中使用一个客户端执行协程函数"""
+    async def main():
+        async with AsyncOssClient(ACCESS_KEY_ID, ACCESS_KEY_SECRET) as client:
+            return await coroutine_func(client)
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('endpoint, region', [
+    ('oss-cn-hangzhou.aliyuncs.com', 'cn-hangzhou'),
+    ('https://oss-cn-hangzhou-internal.aliyuncs.com', 'cn-hangzhou'),
+    ('https://OSS-AP-SOUTHEAST-1.aliyuncs.com', 'ap-southeast-1'),
+    # 传输加速域名不属于任何地域，不能用于V4签名的地域
+    ('oss-accelerate.aliyuncs.com', None),
+    ('https://oss-accelerate-overseas.aliyuncs.com', None),
+    ('http://127.0.0.1:9000', None),
+    ('https://cdn.example.com', None),
+])
+def test_endpoint_region(endpoint, region):
+    assert endpoint_region(endpoint) == region
+
+
+def test_v1_signature_for_custom_endpoint():
+    async def build(client):
+        return client._build_request('GET', 'http://127.0.0.1:9000', BUCKET, 'dir/a b.png',
+                                     params={'x-oss-process': 'image/resize,w_100'})
+
+    request = run(build)
+    authorization = request.headers['Authorization']
+    assert authorization.startswith(f'OSS {ACCESS_KEY_ID}:')
+
+    # V1：对VERB、Content-MD5、Content-Type、Date和规范化资源（包括x-oss-process子资源）做HMAC-SHA1
+    string_to_sign = '\n'.join([
+        'GET', '', '', request.headers['Date'],
+        f'/{BUCKET}/dir/a b.png?x-oss-process=image/resize,w_100'
+    ])
+    expected = base64.b64encode(hmac.new(ACCESS_KEY_SECRET.encode(), string_to_sign.encode(),
+                                         hashlib.sha1).digest()).decode()
+    assert authorization == f'OSS {ACCESS_KEY_ID}:{expected}'
+    # IP地址的endpoint使用path-style地址
+    assert request.url.host == '127.0.0.1'
+    assert request.url.path == f'/{BUCKET}/dir/a b.png'
+
+
+def test_v1_signature_for_accelerate_endpoint():
+    async def build(client):
+        return client._build_request('GET', 'https://oss-accelerate.aliyuncs.com', BUCKET, 'a.txt')
+
+    request = run(build)
+    assert request.headers['Authorization'].startswith(f'OSS {ACCESS_KEY_ID}:')
+    assert request.url.host == f'{BUCKET}.oss-accelerate.aliyuncs.com'
+
+
+def test_v4_signature_for_region_endpoint():
+    async def build(client):
+        return client._build_request('GET', 'https://oss-cn-hangzhou.aliyuncs.com', BUCKET, 'a.txt')
+
+    request = run(build)
+    authorization = request.headers['Authorization']
+    assert authorization.startswith(f'OSS4-HMAC-SHA256 Credential={ACCESS_KEY_ID}/')
+    assert '/cn-hangzhou/oss/aliyun_v4_request' in authorization
+    assert 'Signature=' in authorization
+    assert request.headers['x-oss-content-sha256'] == 'UNSIGNED-PAYLOAD'
+    assert request.url.host == f'{BUCKET}.oss-cn-hangzhou.aliyuncs.com'
+
+
+@pytest.mark.parametrize('region', [None, 'cn-hangzhou'], ids=['v1', 'v4'])
+def test_round_trip(server, monkeypatch, region):
+    # 本地服务的地址无法解析出地域，指定地域时替换解析函数，使客户端改用V4签名
+    monkeypatch.setattr(async_transfer, 'endpoint_region', lambda endpoint: region)
+    data = b'0123456789' * 1000
+
+    async def round_trip(client):
+        await client.put_object(server.endpoint, BUCKET, 'dir/file.bin', data,
+                                headers={'Content-Type': 'application/octet-stream'})
+        headers = await client.head_object(server.endpoint, BUCKET, 'dir/file.bin')
+        result = await client.get_object_to_spool(server.endpoint, BUCKET, 'dir/file.bin')
+        with result['spool'] as spool:
+            return headers, result, spool.read()
+
+    headers, result, content = run(round_trip)
+    assert int(headers['Content-Length']) == len(data)
+    assert result['file_size'] == len(data)
+    assert result['content_type'] == 'application/octet-stream'
+    assert content == data
+
+
+def test_missing_object_raises_no_such_key(server):
+    async def get_missing(client):
+        await client.get_object_to_spool(server.endpoint, BUCKET, 'missing.txt')
+
+    with pytest.raises(oss2.exceptions.NoSuchKey) as error:
+        run(get_missing)
+    assert error.value.status == 404
+    assert error.value.code == 'NoSuchKey'
+
+
+def test_head_missing_object_raises_not_found(server):
+    async def head_missing(client):
+        await client.head_object(server.endpoint, BUCKET, 'missing.txt')
+
+    # HEAD响应没有响应体，与oss2相同映射为NotFound
+    with pytest.raises(oss2.exceptions.NotFound) as error:
+        run(head_missing)
+    assert error.value.status == 404
+
+
+def test_throttled_request_raises_server_error(server):
+    server.config.error_rate = 1.0
+
+    async def get_object(client):
+        await client.get_object_to_spool(server.endpoint, BUCKET, 'file.txt')
+
+    with pytest.raises(oss2.exceptions.ServerError) as error:
+        run(get_object)
+    assert error.value.status == 503
+    assert error.value.code == 'SlowDown'
@@ -0,0 +1,132 @@
+"""
+去重上传的测试
+
+通过bench中的本地OSS服务调用上传和删除工具，验证已知对象索引在对象被删除或移走后失效。
+"""
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+from bench.fake_runtime import make_file, make_tool
+from bench.oss_stub import StubConfig, start_server
+from tools.copy_file import CopyFileTool
+from tools.dedup import upload_if_absent
+from tools.delete_files import DeleteFilesTool
+from tools.upload_file import UploadFileTool
+
+BUCKET = 'test-bucket'
+SOURCE_BUCKET = 'test-source'
+CONTENT = b'dedup-content' * 100
+
+
+@pytest.fixture
+def server():
+    server = start_server('127.0.0.1', 0, StubConfig())
+    server.store.put(SOURCE_BUCKET, 'a.bin', CONTENT, 'application/octet-stream')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make(server, tool_class):
+    return make_tool(tool_class, server.endpoint.split('://', 1)[1], BUCKET)
+
+
+def upload(server, **parameters):
+    """以去重模式上传同一内容，返回(是否跳过上传, 对象键)"""
+    file = make_file(f'{server.endpoint}/_stub/objects/{SOURCE_BUCKET}/a.bin', 'a.bin', len(CONTENT))
+    messages = list(make(server, UploadFileTool)._invoke({'file': file, 'directory': 'dedup', 'dedup': True,
+                                                          **parameters}))
+    file_info = next(message.message.json_object for message in messages
+                     if hasattr(message.message, 'json_object'))['files'][0]
+    return file_info['deduplicated'], urlparse(file_info['file_url']).path.lstrip('/')
+
+
+def test_upload_after_delete_uploads_again(server):
+    deduplicated, object_key = upload(server)
+    assert not deduplicated
+    assert upload(server) == (True, object_key)
+
+    list(make(server, DeleteFilesTool)._invoke({'targets': object_key}))
+    assert server.store.get(BUCKET, object_key) is None
+
+    # 删除后本地索引失效，重新上传而不是返回已不存在的对象
+    assert upload(server) == (False, object_key)
+    assert server.store.get(BUCKET, object_key)['data'] == CONTENT
+
+
+def test_upload_after_move_uploads_again(server):
+    _, object_key = upload(server)
+
+    list(make(server, CopyFileTool)._invoke({'source_url': object_key, 'directory': 'moved',
+                                             'delete_source': True}))
+    assert server.store.get(BUCKET, object_key) is None
+
+    assert upload(server) == (False, object_key)
+    assert server.store.get(BUCKET, object_key)['data'] == CONTENT
+
+
+def test_dedup_keeps_directory_mode(server):
+    deduplicated, object_key = upload(server, directory_mode='yyyy_mm_dd_combined')
+    assert not deduplicated
+    assert object_key.startswith(f"dedup/{datetime.now().strftime('%Y%m%d')}/")
+    assert object_key.endswith('.bin')
+
+
+def fake_bucket(existing=()):
+    """只提供去重检查所需属性的Bucket替身"""
+    return SimpleNamespace(endpoint='http://oss-test.aliyuncs.com', bucket_name=BUCKET,
+                           object_exists=lambda key: key in existing)
+
+
+def test_concurrent_uploads_of_different_objects_do_not_wait():
+    bucket = fake_bucket()
+    slow_started = threading.Event()
+    release = threading.Event()
+
+    def slow_upload():
+        slow_started.set()
+        assert release.wait(5)
+
+    slow = threading.Thread(target=upload_if_absent, args=(bucket, 'concurrent/slow.bin', slow_upload))
+    slow.start()
+    try:
+        assert slow_started.wait(5)
+        # 其他对象的上传不等待正在进行的上传
+        others = threading.Thread(target=lambda: [upload_if_absent(bucket, f'concurrent/{i}.bin', lambda: None)
+                                                  for i in range(500)])
+        others.start()
+        others.join(5)
+        assert not others.is_alive()
+    finally:
+        release.set()
+        slow.join()
+
+
+def test_concurrent_uploads_of_same_object_upload_once():
+    bucket = fake_bucket()
+    started = threading.Event()
+    release = threading.Event()
+    uploads = []
+    results = []
+
+    def upload_object():
+        uploads.append(True)
+        started.set()
+        assert release.wait(5)
+
+    threads = [threading.Thread(target=lambda: results.append(
+        upload_if_absent(bucket, 'concurrent/same.bin', upload_object))) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(uploads) == 1
+    assert sorted(results) == [False, False, False, True]
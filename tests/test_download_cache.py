@@ -0,0 +1,74 @@
+"""
+下载缓存的测试
+
+通过bench中的本地OSS服务验证对象不存在的缓存记录在上传或复制该对象后失效。
+"""
+import oss2
+import pytest
+
+from bench.fake_runtime import make_file, make_tool
+from bench.oss_stub import StubConfig, start_server
+from tools import download_cache
+from tools.copy_file import CopyFileTool
+from tools.download_cache import DownloadCache
+from tools.oss_client import get_bucket
+from tools.upload_file import UploadFileTool
+
+BUCKET = 'test-bucket'
+SOURCE_BUCKET = 'test-source'
+CONTENT = b'cache-content' * 100
+
+
+@pytest.fixture
+def server():
+    server = start_server('127.0.0.1', 0, StubConfig())
+    server.store.put(SOURCE_BUCKET, 'a.bin', CONTENT, 'application/octet-stream')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = DownloadCache(root=str(tmp_path))
+    monkeypatch.setattr(download_cache, '_cache', cache)
+    return cache
+
+
+def make(server, tool_class):
+    return make_tool(tool_class, server.endpoint.split('://', 1)[1], BUCKET)
+
+
+def fetch(server, cache, object_key):
+    """通过缓存读取对象内容"""
+    bucket = get_bucket('test-access-key-id', 'test-access-key-secret', server.endpoint, BUCKET)
+    result = cache.fetch(bucket, object_key)
+    with result['file'] as f:
+        return f.read()
+
+
+def remember_missing(server, cache, object_key):
+    """读取不存在的对象，使缓存记录该对象不存在"""
+    with pytest.raises(oss2.exceptions.NotFound):
+        fetch(server, cache, object_key)
+    with pytest.raises(ValueError):
+        fetch(server, cache, object_key)
+    assert cache.stats()['negative_hits'] == 1
+
+
+def test_upload_clears_missing_entry(server, cache):
+    remember_missing(server, cache, 'uploads/a.bin')
+
+    file = make_file(f'{server.endpoint}/_stub/objects/{SOURCE_BUCKET}/a.bin', 'a.bin', len(CONTENT))
+    list(make(server, UploadFileTool)._invoke({'file': file, 'directory': 'uploads'}))
+
+    assert fetch(server, cache, 'uploads/a.bin') == CONTENT
+
+
+def test_copy_clears_missing_entry(server, cache):
+    server.store.put(BUCKET, 'source/a.bin', CONTENT, 'application/octet-stream')
+    remember_missing(server, cache, 'copies/a.bin')
+
+    list(make(server, CopyFileTool)._invoke({'source_url': 'source/a.bin', 'directory': 'copies'}))
+
+    assert fetch(server, cache, 'copies/a.bin') == CONTENT
@@ -0,0 +1,67 @@
+"""
+批量下载工具的测试
+
+通过bench中的本地OSS服务调用工具，验证输出失败的文件不计入下载结果，以及异步模式的域名路由不在事件循环中执行。
+"""
+import asyncio
+
+import pytest
+
+from bench.fake_runtime import collect_messages, make_tool
+from bench.oss_stub import StubConfig, start_server
+from tools import get_files_by_urls
+from tools.archive import ArchiveWriter
+from tools.get_files_by_urls import GetFilesByUrlsTool
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def server():
+    server = start_server('127.0.0.1', 0, StubConfig())
+    server.store.put(BUCKET, 'a.txt', b'a' * 1000, 'text/plain')
+    server.store.put(BUCKET, 'b.txt', b'b' * 3000, 'text/plain')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_failed_archive_entry_is_not_counted(server, monkeypatch):
+    add = ArchiveWriter.add
+
+    def failing_add(self, filename, *args, **kwargs):
+        if filename == 'b.txt':
+            raise OSError("No space left on device")
+        return add(self, filename, *args, **kwargs)
+
+    monkeypatch.setattr(ArchiveWriter, 'add', failing_add)
+    tool = make_tool(GetFilesByUrlsTool, server.endpoint.split('://', 1)[1], BUCKET)
+    base = f'http://localhost:{server.server_address[1]}'
+
+    output = collect_messages(tool._invoke({'file_urls': f'{base}/a.txt;{base}/b.txt', 'output_mode': 'zip'}))
+
+    assert output['errors'] == 1
+    summary = next(text for text in output['texts'] if text.startswith('Batch download completed'))
+    assert 'Successfully downloaded: 1 files' in summary
+    assert '(1 files, ' in summary
+
+
+def test_async_download_routes_outside_event_loop(server, monkeypatch):
+    routed = []
+
+    def route_endpoint(endpoint, routing):
+        # 路由探测会阻塞，不能在事件循环中执行
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        routed.append(endpoint)
+        return endpoint
+
+    monkeypatch.setattr(get_files_by_urls, 'route_endpoint', route_endpoint)
+    tool = make_tool(GetFilesByUrlsTool, server.endpoint.split('://', 1)[1], BUCKET)
+    base = f'http://localhost:{server.server_address[1]}'
+
+    output = collect_messages(tool._invoke({'file_urls': f'{base}/a.txt;{base}/b.txt', 'download_mode': 'async'}))
+
+    assert output['errors'] == 0
+    assert output['blobs'] == 2
+    assert len(routed) == 2
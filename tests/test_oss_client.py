@@ -0,0 +1,56 @@
+"""
+共享Bucket客户端的测试
+
+通过bench中的本地OSS服务验证启用服务端限速时只有对象数据的上传和下载请求带x-oss-traffic-limit请求头。
+"""
+import oss2
+import pytest
+
+from bench.oss_stub import StubConfig, start_server
+from tools.oss_client import get_bucket
+
+BUCKET = 'test-traffic-bucket'
+LIMITS = {'bandwidth_limit': 100, 'server_traffic_limit': True}
+
+
+@pytest.fixture
+def server():
+    server = start_server('127.0.0.1', 0, StubConfig())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def requests_sent(monkeypatch):
+    """记录每个请求的方法、参数和是否带x-oss-traffic-limit请求头"""
+    sent = []
+    do = oss2.Bucket._do
+
+    def record(self, method, bucket_name, key, **kwargs):
+        headers = oss2.http.CaseInsensitiveDict(kwargs.get('headers') or {})
+        sent.append((method, sorted(kwargs.get('params') or {}), oss2.headers.OSS_TRAFFIC_LIMIT in headers))
+        return do(self, method, bucket_name, key, **kwargs)
+
+    monkeypatch.setattr(oss2.Bucket, '_do', record)
+    return sent
+
+
+def test_traffic_limit_only_on_object_data_requests(server, requests_sent):
+    bucket = get_bucket('test-access-key-id', 'test-access-key-secret', server.endpoint, BUCKET, limits=LIMITS)
+
+    bucket.put_object('a.bin', b'a' * 1000)
+    bucket.get_object('a.bin').read()
+    upload_id = bucket.init_multipart_upload('b.bin').upload_id
+    part = bucket.upload_part('b.bin', upload_id, 1, b'b' * 1000)
+    bucket.list_parts('b.bin', upload_id)
+    bucket.complete_multipart_upload('b.bin', upload_id, [oss2.models.PartInfo(1, part.etag)])
+
+    assert requests_sent == [
+        ('PUT', [], True),
+        ('GET', [], True),
+        ('POST', ['uploads'], False),
+        ('PUT', ['partNumber', 'uploadId'], True),
+        ('GET', ['max-parts', 'part-number-marker', 'uploadId'], False),
+        ('POST', ['uploadId'], False),
+    ]
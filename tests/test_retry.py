@@ -0,0 +1,61 @@
+"""
+重试和熔断的测试
+
+验证只有收到服务端响应的不可重试错误才说明域名可用，其他不可重试错误不改变熔断状态。
+"""
+import itertools
+
+import oss2
+import pytest
+import requests
+
+from tools.deadline import DeadlineExceeded
+from tools.retry import BREAKER_FAILURE_THRESHOLD, CircuitOpenError, call_with_retry, get_circuit_breaker
+
+_endpoints = itertools.count()
+
+
+@pytest.fixture
+def endpoint():
+    """每个测试使用独立的熔断器"""
+    return f'http://breaker-{next(_endpoints)}.test'
+
+
+def fail_with(error):
+    def request():
+        raise error
+    return request
+
+
+def fail_until_threshold(endpoint):
+    """连续失败到熔断阈值的前一次"""
+    for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            call_with_retry(fail_with(requests.exceptions.ConnectionError()), endpoint, max_attempts=1)
+
+
+@pytest.mark.parametrize('error', [DeadlineExceeded('deadline reached'), ValueError('invalid input')],
+                         ids=['deadline', 'local'])
+def test_error_without_response_keeps_failure_count(endpoint, error):
+    fail_until_threshold(endpoint)
+    with pytest.raises(type(error)):
+        call_with_retry(fail_with(error), endpoint, max_attempts=1)
+
+    # 之前的失败没有被清零，再失败一次即熔断
+    with pytest.raises(requests.exceptions.ConnectionError):
+        call_with_retry(fail_with(requests.exceptions.ConnectionError()), endpoint, max_attempts=1)
+    assert not get_circuit_breaker(endpoint).allow()
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda: None, endpoint)
+
+
+def test_client_error_response_resets_failure_count(endpoint):
+    fail_until_threshold(endpoint)
+    not_found = oss2.exceptions.NotFound(404, {}, b'', {})
+    with pytest.raises(oss2.exceptions.NotFound):
+        call_with_retry(fail_with(not_found), endpoint, max_attempts=1)
+
+    # 服务端返回了404，说明域名可用，失败计数重新开始
+    with pytest.raises(requests.exceptions.ConnectionError):
+        call_with_retry(fail_with(requests.exceptions.ConnectionError()), endpoint, max_attempts=1)
+    assert get_circuit_breaker(endpoint).allow()
@@ -1,9 +1,17 @@
 from .upload_file import UploadFileTool
 from .multi_upload_files import MultiUploadFilesTool
 from .get_file_by_url import GetFileByUrlTool
+from .copy_file import CopyFileTool
+from .delete_files import DeleteFilesTool
+from .list_files import ListFilesTool
+from .get_files_meta import GetFilesMetaTool
 
 __all__ = [
     "UploadFileTool",
     "MultiUploadFilesTool",
-    "GetFileByUrlTool"
+    "GetFileByUrlTool",
+    "CopyFileTool",
+    "DeleteFilesTool",
+    "ListFilesTool",
+    "GetFilesMetaTool"
 ]
\ No newline at end of file
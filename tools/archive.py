@@ -0,0 +1,121 @@
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from typing import Any, BinaryIO, Dict, Tuple
+
+from .blob_stream import iter_stream_chunks
+
+# 支持的归档格式：扩展名和文件类型
+ARCHIVE_FORMATS = {
+    'zip': ('.zip', 'application/zip'),
+    'tar_gz': ('.tar.gz', 'application/gzip')
+}
+
+# 已经压缩过的文件类型，写入ZIP时直接存储，不再压缩
+_COMPRESSED_TYPE_PREFIXES = ('image/', 'video/', 'audio/')
+_COMPRESSED_TYPES = {
+    'application/zip', 'application/gzip', 'application/x-gzip', 'application/x-7z-compressed',
+    'application/x-rar-compressed', 'application/x-bzip2', 'application/x-xz', 'application/pdf'
+}
+
+
+class ArchiveWriter:
+    """
+    将下载的文件逐个写入临时归档文件
+
+    每个文件写入后即可释放其内容，内存中只保留一个读取缓冲区和压缩器的窗口，
+    归档文件本身保存在磁盘上，完成后通过分块blob消息输出。
+    """
+
+    def __init__(self, archive_format: str):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {archive_format}")
+        self.archive_format = archive_format
+        self.extension, self.content_type = ARCHIVE_FORMATS[archive_format]
+        self.entry_count = 0
+        self._names = set()
+        self._file = tempfile.TemporaryFile()
+        if archive_format == 'zip':
+            self._archive = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._archive = tarfile.open(fileobj=self._file, mode='w:gz')
+
+    def add(self, filename: str, stream: BinaryIO, size: int, content_type: str = '') -> str:
+        """
+        写入一个文件
+
+        Args:
+            filename: 文件名，与已写入的文件重名时自动添加序号
+            stream: 文件内容，提供read(size)方法，需包含size字节
+            size: 文件大小（字节）
+            content_type: 文件类型，已压缩的类型在ZIP中直接存储
+
+        Returns:
+            归档中实际使用的文件名
+        """
+        name = self._unique_name(filename)
+        if self.archive_format == 'zip':
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED if _is_compressed(content_type) else zipfile.ZIP_DEFLATED
+            with self._archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as entry:
+                for chunk in iter_stream_chunks(stream):
+                    entry.write(chunk)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = int(time.time())
+            self._archive.addfile(info, stream)
+        self.entry_count += 1
+        return name
+
+    def close(self) -> Tuple[BinaryIO, int]:
+        """
+        完成归档
+
+        Returns:
+            (已定位到开头的归档临时文件, 归档大小)，临时文件关闭后自动删除
+        """
+        self._archive.close()
+        size = self._file.tell()
+        self._file.seek(0)
+        return self._file, size
+
+    def metadata(self, archive_name: str, size: int) -> Dict[str, Any]:
+        """构建归档文件的blob消息元数据，与单个文件的元数据格式一致"""
+        return {
+            'filename': archive_name,
+            'content_type': self.content_type,
+            'size': size,
+            'mime_type': self.content_type,
+            'extension': self.extension
+        }
+
+    def discard(self) -> None:
+        """放弃归档并删除临时文件"""
+        try:
+            self._archive.close()
+        except Exception:
+            pass
+        self._file.close()
+
+    def _unique_name(self, filename: str) -> str:
+        """生成归档内唯一的文件名，重名时添加_1、_2等序号"""
+        name = filename or 'file'
+        base_name, extension = os.path.splitext(name)
+        index = 1
+        while name in self._names:
+            name = f"{base_name}_{index}{extension}"
+            index += 1
+        self._names.add(name)
+        return name
+
+
+def _is_compressed(content_type: str) -> bool:
+    """判断文件类型是否已经压缩"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('image/svg+xml', 'image/bmp'):
+        return False
+    return content_type.startswith(_COMPRESSED_TYPE_PREFIXES) or content_type in _COMPRESSED_TYPES
+
@@ -0,0 +1,252 @@
+import asyncio
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generator, Optional, Sequence, Tuple
+
+import httpx
+import oss2
+from oss2.api import _UrlMaker, _normalize_endpoint
+
+from .blob_stream import STREAM_READ_SIZE
+from .endpoint_router import endpoint_region
+from .rate_limiter import get_rate_limiter
+from .deadline import call_timeout
+
+# 异步模式下默认及允许设置的最大同时请求数量，请求只占用协程和连接，不占用线程
+DEFAULT_ASYNC_CONCURRENCY = 64
+MAX_ASYNC_CONCURRENCY = 256
+# 异步客户端连接池大小
+ASYNC_MAX_CONNECTIONS = 256
+# 连接和读取超时时间（秒）
+ASYNC_CONNECT_TIMEOUT = 10.0
+ASYNC_READ_TIMEOUT = 60.0
+
+# 签名版本：v1（HMAC-SHA1）或v4（HMAC-SHA256，需要地域）
+SIGNATURE_V1 = 'v1'
+SIGNATURE_V4 = 'v4'
+
+
+class _ErrorResponse:
+    """适配oss2.exceptions.make_exception所需的响应接口"""
+
+    def __init__(self, response: httpx.Response, body: bytes):
+        self.status = response.status_code
+        self.headers = oss2.http.CaseInsensitiveDict(response.headers)
+        self.request_id = response.headers.get('x-oss-request-id', '')
+        self._body = body
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._body[:amt] if amt is not None else self._body
+
+
+class AsyncOssClient:
+    """
+    基于asyncio和httpx的OSS异步客户端
+
+    使用oss2的签名实现（V1或V4）为请求签名，通过httpx.AsyncClient发送。所有请求共享一个连接池，
+    同一线程中可以同时进行大量请求，每个请求只占用一个协程。错误响应转换为与oss2相同的异常类型。
+    请求和传输的字节与同步客户端共用进程内的限速器，等待令牌时只挂起当前协程。
+    """
+
+    def __init__(self, access_key_id: str, access_key_secret: str,
+                 max_connections: int = ASYNC_MAX_CONNECTIONS):
+        self._access_key_id = access_key_id
+        self._access_key_secret = access_key_secret
+        self._auths: Dict[str, Any] = {}
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(ASYNC_READ_TIMEOUT, connect=ASYNC_CONNECT_TIMEOUT)
+        )
+
+    async def __aenter__(self) -> 'AsyncOssClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        await self._client.aclose()
+
+    def _auth(self, version: str) -> Any:
+        """获取指定签名版本的签名器"""
+        auth = self._auths.get(version)
+        if auth is None:
+            if version == SIGNATURE_V4:
+                auth = oss2.AuthV4(self._access_key_id, self._access_key_secret)
+            else:
+                auth = oss2.Auth(self._access_key_id, self._access_key_secret)
+            self._auths[version] = auth
+        return auth
+
+    def _build_request(self, method: str, endpoint: str, bucket_name: str, key: str,
+                       params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                       content: Optional[bytes] = None) -> httpx.Request:
+        """构建并签名请求，能从域名解析出地域时使用V4签名，否则（包括传输加速域名）使用V1签名"""
+        region = endpoint_region(endpoint)
+        version = SIGNATURE_V4 if region else SIGNATURE_V1
+        url = _UrlMaker(_normalize_endpoint(endpoint), False, False)(bucket_name, key)
+
+        req = oss2.http.Request(method, url, params=dict(params or {}), headers=dict(headers or {}),
+                                region=region, product='oss')
+        self._auth(version)._sign_request(req, bucket_name, key)
+
+        # oss2用None表示不发送的请求头
+        request_headers = {name: value for name, value in req.headers.items() if value is not None}
+        # 在截止时间范围内调用时，超时时间不超过剩余时间
+        timeout = httpx.Timeout(call_timeout(ASYNC_READ_TIMEOUT), connect=call_timeout(ASYNC_CONNECT_TIMEOUT))
+        return self._client.build_request(method, url, params=req.params, headers=request_headers,
+                                          content=content, timeout=timeout)
+
+    async def request(self, method: str, endpoint: str, bucket_name: str, key: str,
+                      params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                      content: Optional[bytes] = None, stream: bool = False) -> httpx.Response:
+        """
+        发送签名请求
+
+        Args:
+            method: HTTP方法
+            endpoint: OSS访问域名，可以带协议前缀
+            bucket_name: 存储空间名称
+            key: 对象键
+            params: 查询参数（包括x-oss-process等子资源）
+            headers: 请求头
+            content: 请求体
+            stream: 为True时不读取响应体，调用方读取完成后需关闭响应
+
+        Returns:
+            httpx.Response对象
+
+        Raises:
+            oss2.exceptions.OssError: 响应状态码不是2xx时，与oss2相同的异常类型
+        """
+        limiter = get_rate_limiter()
+        if limiter.enabled():
+            await _sleep(limiter.reserve_request(bucket_name))
+            traffic_limit = limiter.traffic_limit(bucket_name)
+            if traffic_limit and key and method in ('GET', 'PUT'):
+                # 请求头需要在签名前设置
+                headers = dict(headers or {}, **{oss2.headers.OSS_TRAFFIC_LIMIT: str(traffic_limit)})
+            if content:
+                # 请求体一次性发送，发送前按大小预留带宽
+                await _sleep(limiter.reserve_bytes(bucket_name, len(content)))
+
+        request = self._build_request(method, endpoint, bucket_name, key, params, headers, content)
+        response = await self._client.send(request, stream=stream)
+        if response.status_code // 100 != 2:
+            body = await response.aread()
+            await response.aclose()
+            raise oss2.exceptions.make_exception(_ErrorResponse(response, body))
+        return response
+
+    async def head_object(self, endpoint: str, bucket_name: str, key: str) -> httpx.Headers:
+        """获取对象元数据，返回响应头"""
+        response = await self.request('HEAD', endpoint, bucket_name, key)
+        return response.headers
+
+    async def put_object(self, endpoint: str, bucket_name: str, key: str, data: bytes,
+                         headers: Optional[Dict[str, str]] = None) -> httpx.Headers:
+        """上传对象，返回响应头"""
+        response = await self.request('PUT', endpoint, bucket_name, key, headers=headers, content=data)
+        return response.headers
+
+    async def get_object_to_spool(self, endpoint: str, bucket_name: str, key: str,
+                                  params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        下载对象并分块写入临时文件，内存中只保留一个读取缓冲区
+
+        Returns:
+            包含spool（已定位到开头的临时文件）、content_type和file_size的字典
+        """
+        response = await self.request('GET', endpoint, bucket_name, key, params=params, stream=True)
+        limiter = get_rate_limiter()
+        limited = limiter.enabled()
+        spool = tempfile.TemporaryFile()
+        size = 0
+        try:
+            async for chunk in response.aiter_bytes(STREAM_READ_SIZE):
+                if limited:
+                    await _sleep(limiter.reserve_bytes(bucket_name, len(chunk)))
+                spool.write(chunk)
+                size += len(chunk)
+            spool.seek(0)
+        except BaseException:
+            # 包括下载被取消的情况
+            spool.close()
+            raise
+        finally:
+            await response.aclose()
+        return {
+            'spool': spool,
+            'content_type': response.headers.get('Content-Type', 'application/octet-stream'),
+            'file_size': size
+        }
+
+
+async def _sleep(seconds: float) -> None:
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+async def _gather_as_completed(func: Callable[[int, Any], Awaitable[Any]], items: Sequence[Any],
+                               concurrency: int) -> AsyncIterator[Tuple[int, Any]]:
+    """以有限的并发数执行协程任务，按完成顺序产出(索引, 结果)"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, item: Any) -> Tuple[int, Any]:
+        async with semaphore:
+            return index, await func(index, item)
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # 调用方提前结束迭代时取消未完成的任务，并等待取消完成
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def iter_async(func: Callable[[int, Any], Awaitable[Any]], items: Sequence[Any], concurrency: int,
+               ordered: bool = True,
+               close: Optional[Callable[[], Awaitable[None]]] = None) -> Generator[Tuple[int, Any], None, None]:
+    """
+    在当前线程的私有事件循环中并发执行协程任务，以普通生成器的方式逐个产出结果
+
+    工具的_invoke生成器可以直接迭代该生成器：每个结果产出时事件循环暂停，
+    消息输出后继续运行，不需要额外的线程。
+
+    Args:
+        func: 协程任务函数，接收(索引, 元素)，异常需由任务函数自行处理
+        items: 待处理的元素序列
+        concurrency: 同时进行的任务数量
+        ordered: True按输入顺序产出，False按完成顺序产出
+        close: 结束时在事件循环中执行的清理协程函数，例如AsyncOssClient.aclose
+
+    Returns:
+        (索引, 结果)元组的生成器
+    """
+    loop = asyncio.new_event_loop()
+    results = _gather_as_completed(func, items, concurrency)
+    try:
+        pending: Dict[int, Any] = {}
+        next_index = 0
+        while True:
+            try:
+                index, result = loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+            if not ordered:
+                yield index, result
+                continue
+            # 按输入顺序产出，提前完成的结果暂存
+            pending[index] = result
+            while next_index in pending:
+                yield next_index, pending.pop(next_index)
+                next_index += 1
+    finally:
+        loop.run_until_complete(results.aclose())
+        if close is not None:
+            loop.run_until_complete(close())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
@@ -0,0 +1,116 @@
+import tempfile
+import uuid
+from typing import Any, BinaryIO, Dict, Generator, Iterable, Iterator, Optional, Tuple
+
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Dify按8KB的块接收文件数据，与SDK内部拆分blob消息时使用的块大小一致
+BLOB_CHUNK_SIZE = 8192
+# 从OSS响应或临时文件读取时每次读取的字节数
+STREAM_READ_SIZE = 1024 * 1024
+
+
+def iter_stream_chunks(stream: Any, read_size: int = STREAM_READ_SIZE) -> Iterator[bytes]:
+    """
+    从可读对象（OSS响应、文件等）中按块读取数据
+
+    Args:
+        stream: 提供read(size)方法的对象
+        read_size: 每次读取的字节数
+
+    Returns:
+        bytes数据块迭代器
+    """
+    # oss2的read(size)每次都会新建一个iter_content迭代器，分块传输（没有Content-Length，例如图片处理结果）的响应
+    # 在迭代器被丢弃时会丢失当前HTTP块中尚未读取的数据，这种情况下直接从底层的requests响应连续迭代
+    response = _chunked_oss_response(stream)
+    if response is not None:
+        for chunk in response.iter_content(read_size):
+            if chunk:
+                yield chunk
+        return
+
+    while True:
+        chunk = stream.read(read_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _chunked_oss_response(stream: Any) -> Any:
+    """返回分块传输的oss2 GetObjectResult底层的requests响应，其他对象返回None"""
+    if getattr(stream, 'content_length', 0) is not None:
+        return None
+    return getattr(getattr(stream, 'resp', None), 'response', None)
+
+
+def spool_stream(stream: Any, read_size: int = STREAM_READ_SIZE) -> Tuple[BinaryIO, int]:
+    """
+    将数据流写入临时文件，内存中只保留一个读取缓冲区
+
+    Args:
+        stream: 提供read(size)方法的对象
+        read_size: 每次读取的字节数
+
+    Returns:
+        (已定位到开头的临时文件, 写入的字节数)，临时文件关闭后自动删除
+    """
+    spool = tempfile.TemporaryFile()
+    size = 0
+    try:
+        for chunk in iter_stream_chunks(stream, read_size):
+            spool.write(chunk)
+            size += len(chunk)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool, size
+
+
+def create_blob_chunk_messages(chunks: Iterable[bytes], total_length: Optional[int],
+                               meta: Optional[Dict[str, Any]] = None) -> Generator[ToolInvokeMessage, None, int]:
+    """
+    将数据块转换为流式blob消息，插件内存中不需要保存完整文件
+
+    Args:
+        chunks: bytes数据块迭代器，块大小不限
+        total_length: 文件总字节数，分块传输等无法预先获知大小时为None，数据块消息中按0发送，
+            结束标记中为实际发送的字节数
+        meta: 文件元数据，与create_blob_message的meta一致
+
+    Returns:
+        BLOB_CHUNK类型消息的生成器，最后一条消息的end为True；生成器的返回值为实际发送的字节数
+    """
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    sent = 0
+    for chunk in chunks:
+        sent += len(chunk)
+        for start in range(0, len(chunk), BLOB_CHUNK_SIZE):
+            yield ToolInvokeMessage(
+                type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+                message=ToolInvokeMessage.BlobChunkMessage(
+                    id=blob_id,
+                    sequence=sequence,
+                    total_length=total_length or 0,
+                    blob=chunk[start:start + BLOB_CHUNK_SIZE],
+                    end=False
+                ),
+                meta=meta
+            )
+            sequence += 1
+
+    # 结束标记
+    yield ToolInvokeMessage(
+        type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+        message=ToolInvokeMessage.BlobChunkMessage(
+            id=blob_id,
+            sequence=sequence,
+            total_length=sent if total_length is None else total_length,
+            blob=b'',
+            end=True
+        ),
+        meta=meta
+    )
+    return sent
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from typing import Any, Callable, Generator, List, Optional, Sequence, Tuple
+
+from .deadline import NOT_ATTEMPTED, NOT_FINISHED, Deadline, current_deadline, deadline_scope
+
+# 默认并发数与允许的最大并发数
+DEFAULT_CONCURRENCY = 5
+MAX_CONCURRENCY = 16
+
+
+def normalize_concurrency(value: Any, default: int = DEFAULT_CONCURRENCY, maximum: int = MAX_CONCURRENCY) -> int:
+    """
+    规范化并发数参数
+
+    Args:
+        value: 用户传入的并发数，可能为空、字符串或浮点数
+        default: 参数为空或非法时使用的默认值
+        maximum: 允许的最大并发数
+
+    Returns:
+        介于1和maximum之间的整数并发数
+    """
+    try:
+        concurrency = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        concurrency = default
+    return max(1, min(concurrency, maximum))
+
+
+def iter_concurrently(func: Callable[[int, Any], Any], items: Sequence[Any], max_workers: int,
+                      ordered: bool = True,
+                      deadline: Optional[Deadline] = None) -> Generator[Tuple[int, Any], None, None]:
+    """
+    使用有界线程池并发执行任务，逐个产出结果
+
+    Args:
+        func: 任务函数，接收(索引, 元素)，异常需由任务函数自行处理
+        items: 待处理的元素序列
+        max_workers: 线程池大小
+        ordered: True按输入顺序产出，False按完成顺序产出
+        deadline: 截止时间。剩余时间不足时尚未开始的任务不再执行，结果为NOT_ATTEMPTED；
+            截止时间到达时仍在执行的任务不再等待，结果为NOT_FINISHED。
+            为空时任务全部执行，但仍在调用方所在的截止时间范围（deadline_scope）内执行
+
+    Returns:
+        (索引, 结果)元组的生成器
+    """
+    if not items:
+        return
+
+    # 线程池中的任务沿用调用方的截止时间范围
+    scope = deadline if deadline is not None else current_deadline()
+
+    def run(index: int, item: Any) -> Any:
+        if deadline is not None and not deadline.can_finish():
+            return NOT_ATTEMPTED
+        with deadline_scope(scope):
+            return func(index, item)
+
+    # 只有一个任务或并发数为1时直接串行执行，避免创建线程池
+    if max_workers <= 1 or len(items) == 1:
+        for index, item in enumerate(items):
+            yield index, run(index, item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        futures = {executor.submit(run, index, item): index for index, item in enumerate(items)}
+
+        if ordered:
+            # 按输入顺序等待，已完成的结果暂存在future中
+            for future, index in sorted(futures.items(), key=lambda pair: pair[1]):
+                yield index, _wait_result(future, deadline)
+        else:
+            try:
+                for future in as_completed(futures, timeout=deadline.remaining() if deadline else None):
+                    yield futures[future], future.result()
+                    del futures[future]
+            except TimeoutError:
+                for future, index in sorted(futures.items(), key=lambda pair: pair[1]):
+                    yield index, _wait_result(future, deadline)
+    finally:
+        # 有截止时间时不等待仍在执行的任务，这些任务的请求会在超时后自行结束
+        executor.shutdown(wait=deadline is None, cancel_futures=True)
+
+
+def _wait_result(future: Any, deadline: Optional[Deadline]) -> Any:
+    """等待任务结果，截止时间到达时返回NOT_FINISHED"""
+    if deadline is None:
+        return future.result()
+    try:
+        return future.result(timeout=deadline.remaining())
+    except TimeoutError:
+        # 已取消的任务没有开始执行
+        return NOT_ATTEMPTED if future.cancel() else NOT_FINISHED
+
+
+def run_concurrently(func: Callable[[int, Any], Any], items: Sequence[Any], max_workers: int,
+                     deadline: Optional[Deadline] = None) -> List[Any]:
+    """
+    使用有界线程池并发执行任务，按输入顺序返回全部结果
+
+    Args:
+        func: 任务函数，接收(索引, 元素)
+        items: 待处理的元素序列
+        max_workers: 线程池大小
+        deadline: 截止时间，含义与iter_concurrently相同
+
+    Returns:
+        与items顺序一致的结果列表
+    """
+    return [result for _, result in iter_concurrently(func, items, max_workers, ordered=True, deadline=deadline)]
@@ -0,0 +1,206 @@
+import os
+from datetime import datetime
+from collections.abc import Generator
+from typing import Any
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .oss_client import get_bucket
+from .utils import generate_object_key, resolve_oss_location, split_endpoint
+from .object_index import get_object_index
+from .dedup import get_known_objects
+from .download_cache import get_download_cache
+from .multipart import DEFAULT_MULTIPART_THRESHOLD, DEFAULT_PART_SIZE, copy_object, mb_to_bytes
+from .retry import call_with_retry
+from .deadline import Deadline, deadline_scope
+
+
+class CopyFileTool(Tool):
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        try:
+            # 从runtime credentials获取认证信息
+            credentials = {
+                'endpoint': self.runtime.credentials.get('endpoint'),
+                'bucket': self.runtime.credentials.get('bucket'),
+                'access_key_id': self.runtime.credentials.get('access_key_id'),
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
+            }
+
+            # 验证工具参数中的认证信息
+            self._validate_credentials(credentials)
+
+            # 执行服务端复制操作，单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                result = self._copy_file(tool_parameters, credentials)
+
+            file_size_bytes = result['file_size_bytes']
+            file_size_mb = round(file_size_bytes / (1024 * 1024), 2) if file_size_bytes > 0 else 0
+
+            # 构建文件信息对象，与上传工具保持一致
+            file_info = {
+                "filename": result['filename'],
+                "object_key": result['object_key'],
+                "file_url": result['file_url'],
+                "source_url": result['source_url'],
+                "file_size_bytes": file_size_bytes,
+                "file_size_mb": file_size_mb,
+                "copy_method": result['copy_method'],
+                "source_deleted": result['source_deleted'],
+                "status": "success"
+            }
+
+            yield self.create_json_message({
+                "status": "completed",
+                "operation": "move" if result['source_deleted'] else "copy",
+                "files": [file_info]
+            })
+
+            # 构建文本响应
+            operation = "Move" if result['source_deleted'] else "Copy"
+            text_message = f"{operation} completed\n\n"
+            text_message += f"- File name: {file_info['filename']}\n"
+            text_message += f"  File size: {file_info['file_size_mb']} MB ({file_info['file_size_bytes']} bytes)\n"
+            text_message += f"  Source URL: {file_info['source_url']}\n"
+            text_message += f"  File URL: {file_info['file_url']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息
+            yield self.create_text_message(f"Failed to copy file: {str(e)}")
+            # 同时抛出异常，与上传工具的行为保持一致
+            raise ValueError(f"Failed to copy file: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _copy_file(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        try:
+            # 获取源文件URL、目标目录和其他参数
+            source_url = parameters.get('source_url')
+            directory = parameters.get('directory')
+            directory_mode = parameters.get('directory_mode', 'no_subdirectory')
+            filename = parameters.get('filename')
+            filename_mode = parameters.get('filename_mode', 'filename')
+            delete_source = bool(parameters.get('delete_source', False))
+            signed = parameters.get('signed', False)
+            signed_expired = parameters.get('sign_expired', 3600)
+            # 分片复制阈值和分片大小（参数单位为MB）
+            multipart_threshold = mb_to_bytes(parameters.get('multipart_threshold'), DEFAULT_MULTIPART_THRESHOLD)
+            part_size = mb_to_bytes(parameters.get('part_size'), DEFAULT_PART_SIZE)
+
+            # 验证必填参数
+            if not source_url:
+                raise ValueError("Missing required parameter: source_url")
+
+            if not directory:
+                raise ValueError("Missing required parameter: directory")
+
+            # 对directory进行前后去空格处理
+            directory = directory.strip()
+            # 验证directory规则：禁止以空格、/或\开头
+            if directory.startswith(' ') or directory.startswith('/') or directory.startswith('\\'):
+                raise ValueError("Directory cannot start with space, / or \\ ")
+
+            # 如果用户指定了filename，对其进行前后去空格处理
+            if filename:
+                filename = filename.strip()
+                # 验证filename规则：禁止以空格、/或\开头
+                if filename.startswith(' ') or filename.startswith('/') or filename.startswith('\\'):
+                    raise ValueError("Filename cannot start with space, / or \\ ")
+
+            # 解析源文件URL获取bucket、endpoint和object_key
+            source_endpoint, source_bucket_name, source_key = resolve_oss_location(
+                source_url, credentials['endpoint'], credentials['bucket'])
+            if not source_key:
+                raise ValueError("Source URL does not contain an object key")
+
+            # 获取源和目标Bucket客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+            source_bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                       source_endpoint, source_bucket_name,
+                                       routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                credentials['endpoint'], credentials['bucket'],
+                                routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
+
+            # 获取源文件大小、类型和ETag，不传输文件内容
+            source_meta = call_with_retry(lambda: source_bucket.head_object(source_key), source_bucket.endpoint)
+
+            # 生成目标文件名，未指定时沿用源文件名
+            source_base_name, source_extension = os.path.splitext(os.path.basename(source_key))
+            if filename:
+                base_name, extension = os.path.splitext(filename)
+                if not extension:
+                    extension = source_extension.lower()
+            else:
+                base_name, extension = source_base_name, source_extension.lower()
+
+            # 根据filename_mode处理文件名
+            if filename_mode == 'filename_timestamp':
+                # 使用年月日时分秒毫秒格式的时间戳
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]  # 去掉最后三位得到毫秒
+                filename = f"{base_name}_{timestamp}{extension}"
+            else:
+                filename = f"{base_name}{extension}"
+
+            # 根据目录模式生成完整的文件路径
+            object_key = generate_object_key(directory, directory_mode, filename)
+
+            same_object = source_bucket_name == credentials['bucket'] and source_key == object_key
+            if same_object and delete_source:
+                raise ValueError("Source and destination are the same object")
+
+            # 服务端复制：小文件使用CopyObject，大文件并发UploadPartCopy
+            try:
+                copy_method = copy_object(
+                    bucket, source_bucket_name, source_key, object_key,
+                    source_meta.content_length, source_etag=source_meta.etag,
+                    multipart_threshold=multipart_threshold, part_size=part_size,
+                    headers={'Content-Type': source_meta.content_type} if source_meta.content_type else None
+                )
+            except Exception as e:
+                raise ValueError(f"Failed to copy object: {str(e)}")
+
+            # 清除包含该对象的列举缓存和下载缓存，之后的列举和下载可以立即看到变化
+            get_object_index().invalidate(credentials['bucket'], object_key)
+            get_download_cache().invalidate(credentials['bucket'], object_key)
+
+            # 移动操作：复制成功后删除源文件
+            source_deleted = False
+            if delete_source:
+                try:
+                    call_with_retry(lambda: source_bucket.delete_object(source_key), source_bucket.endpoint)
+                    source_deleted = True
+                    get_object_index().invalidate(source_bucket_name, source_key)
+                    get_known_objects().invalidate(source_bucket_name, source_key)
+                    get_download_cache().invalidate(source_bucket_name, source_key)
+                except Exception as e:
+                    raise ValueError(f"File copied to {object_key} but failed to delete source: {str(e)}")
+
+            # 构建文件URL，配置的endpoint可能已带协议前缀，先统一为一个协议再拼接或签名
+            protocol, host = split_endpoint(credentials['endpoint'], credentials.get('use_https', True))
+            if not signed:
+                file_url = f"{protocol}://{credentials['bucket']}.{host}/{object_key}"
+            else:
+                # 签名URL始终使用配置的公网域名，不暴露内网或加速域名
+                public_bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                           f"{protocol}://{host}", credentials['bucket'],
+                                           limits=self.runtime.credentials)
+                file_url = public_bucket.sign_url("GET", object_key, expires=signed_expired)
+
+            return {
+                "file_url": file_url,
+                "source_url": source_url,
+                "filename": filename,
+                "object_key": object_key,
+                "file_size_bytes": source_meta.content_length,
+                "copy_method": copy_method,
+                "source_deleted": source_deleted
+            }
+        except Exception as e:
+            raise ValueError(f"Failed to copy file: {str(e)}")
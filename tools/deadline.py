@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+def _read_timeout(value: Optional[str], default: int) -> int:
+    """解析环境变量中的超时时间，为空或非法时使用默认值"""
+    try:
+        timeout = int(float(value)) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+    return timeout if timeout > 0 else default
+
+
+# 插件运行时允许单次工具调用执行的最长时间（秒），main.py使用同一个值配置插件，可通过同名环境变量调整
+MAX_REQUEST_TIMEOUT = _read_timeout(os.getenv('MAX_REQUEST_TIMEOUT'), 120)
+# 为输出已完成的结果和未执行列表预留的时间（秒）
+DEADLINE_RESERVE = 10
+# 剩余时间少于该值（秒）时不再开始新的传输
+MIN_START_BUDGET = 2
+# 单次请求的最短超时时间（秒）
+MIN_CALL_TIMEOUT = 1
+
+# 截止时间到达时尚未开始的任务结果
+NOT_ATTEMPTED = object()
+# 截止时间到达时仍在执行、不再等待的任务结果
+NOT_FINISHED = object()
+
+
+class DeadlineExceeded(Exception):
+    """工具调用的截止时间已到，请求未发送"""
+
+
+class Deadline:
+    """
+    单次工具调用的截止时间
+
+    截止时间比插件运行时的MAX_REQUEST_TIMEOUT提前DEADLINE_RESERVE秒，预留的时间用于输出已完成的结果。
+    同时统计本次调用中已完成传输的平均速度，用于判断剩余时间是否足够传输一个已知大小的文件。
+    """
+
+    def __init__(self, timeout: float = MAX_REQUEST_TIMEOUT, reserve: float = DEADLINE_RESERVE):
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + max(timeout - reserve, 0)
+        self._transferred_bytes = 0
+        self._transfer_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已过期时为0"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """截止时间是否已到"""
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        """截止时间已到时抛出DeadlineExceeded"""
+        if self.expired():
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def call_timeout(self, default: Optional[float]) -> float:
+        """根据剩余时间计算单次请求的超时时间，不超过默认值"""
+        remaining = max(self.remaining(), MIN_CALL_TIMEOUT)
+        return remaining if default is None else min(default, remaining)
+
+    def record_transfer(self, size: int, seconds: float) -> None:
+        """记录一次已完成的传输，用于估算后续传输需要的时间"""
+        with self._lock:
+            self._transferred_bytes += size
+            self._transfer_seconds += seconds
+
+    def can_finish(self, size: Optional[int] = None) -> bool:
+        """
+        判断剩余时间是否足够开始并完成一次传输
+
+        Args:
+            size: 待传输的字节数，为空或尚无传输记录时只检查剩余时间是否不少于MIN_START_BUDGET
+
+        Returns:
+            是否应当开始传输
+        """
+        remaining = self.remaining()
+        if remaining < MIN_START_BUDGET:
+            return False
+        with self._lock:
+            transferred, seconds = self._transferred_bytes, self._transfer_seconds
+        if not size or not transferred or seconds <= 0:
+            return True
+        # 按本次调用中已完成传输的平均速度估算
+        return size * seconds / transferred < remaining
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar('oss_plugin_deadline', default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    在当前线程（或协程）中设置截止时间，范围内的OSS和HTTP请求按剩余时间设置超时，过期后不再发送
+
+    Args:
+        deadline: 截止时间，为None时不限制
+    """
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """获取当前范围内的截止时间"""
+    return _current.get()
+
+
+def call_timeout(default: Optional[float]) -> Optional[float]:
+    """根据当前范围内的截止时间计算单次请求的超时时间，没有截止时间时返回默认值"""
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    return deadline.call_timeout(default)
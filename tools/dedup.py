@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+
+import oss2
+
+from .retry import call_with_retry
+from .singleflight import SingleFlight
+
+# 已知存在对象的本地索引有效期（秒），过期后重新通过HEAD确认
+KNOWN_OBJECT_TTL = 600
+# 本地索引最多保存的对象数量
+KNOWN_OBJECT_MAX_ENTRIES = 10000
+
+
+class KnownObjectIndex:
+    """记录最近确认存在于OSS中的内容地址对象，带过期时间和容量上限"""
+
+    def __init__(self, ttl: float = KNOWN_OBJECT_TTL, max_entries: int = KNOWN_OBJECT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contains(self, key: Tuple[str, str, str]) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, key: Tuple[str, str, str]) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket_name: str, object_key: str) -> None:
+        """
+        清除已删除或移走的对象，之后的上传会重新通过HEAD确认
+
+        Args:
+            bucket_name: 存储空间名称
+            object_key: 对象键
+        """
+        with self._lock:
+            # 同一对象可能经由不同的endpoint（公网、内网或加速域名）记录
+            for key in [key for key in self._entries if key[1] == bucket_name and key[2] == object_key]:
+                del self._entries[key]
+
+
+_known_objects = KnownObjectIndex()
+# 按对象合并并发的去重上传，不同对象的上传互不等待
+_upload_flight = SingleFlight()
+
+
+def get_known_objects() -> KnownObjectIndex:
+    """获取进程内共享的已知存在对象索引"""
+    return _known_objects
+
+
+def upload_if_absent(bucket: oss2.Bucket, object_key: str, upload: Callable[[], Any]) -> bool:
+    """
+    内容地址对象不存在时才上传
+
+    先查本地索引，未命中时再用HEAD确认对象是否存在。同一对象的并发调用合并为一次检查和上传，
+    其他调用等待其完成后视为已存在，因此同一批次或并发调用中的重复内容只会产生一次PUT。
+
+    Args:
+        bucket: OSS Bucket对象
+        object_key: 由内容哈希生成的对象键
+        upload: 实际执行上传的回调
+
+    Returns:
+        True表示执行了上传，False表示对象已存在而跳过上传
+    """
+    index_key = (bucket.endpoint, bucket.bucket_name, object_key)
+    if _known_objects.contains(index_key):
+        return False
+
+    # 只有实际执行检查的调用会记录是否上传，合并到已有请求的调用返回False
+    uploaded = []
+
+    def check_and_upload():
+        # 上一个合并请求可能刚刚上传了相同内容
+        if _known_objects.contains(index_key):
+            return
+        # HEAD请求可以安全重试，暂时性错误时重新检查，不会直接导致上传失败
+        if not call_with_retry(lambda: bucket.object_exists(object_key), bucket.endpoint):
+            upload()
+            uploaded.append(True)
+        _known_objects.add(index_key)
+
+    _upload_flight.do(index_key, check_and_upload)
+    return bool(uploaded)
@@ -0,0 +1,208 @@
+from collections.abc import Generator
+from typing import Any, Dict, List
+
+import oss2
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .oss_client import get_bucket
+from .utils import resolve_oss_location
+from .object_index import get_object_index
+from .dedup import get_known_objects
+from .download_cache import get_download_cache
+from .concurrency import normalize_concurrency, run_concurrently
+from .retry import call_with_retry
+from .deadline import Deadline, deadline_scope
+
+# 单次batch_delete_objects请求允许的最大对象数量（OSS限制）
+BATCH_DELETE_LIMIT = 1000
+# 按前缀删除时默认及允许设置的最大对象数量，前缀匹配的对象超过该数量时不删除任何对象
+DEFAULT_PREFIX_DELETE_LIMIT = 1000
+MAX_PREFIX_DELETE_LIMIT = 100000
+# 试运行时文本消息中列出的对象数量，完整列表在JSON结果中
+DRY_RUN_PREVIEW_COUNT = 20
+
+
+class DeleteFilesTool(Tool):
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        try:
+            # 从runtime credentials获取认证信息
+            credentials = {
+                'endpoint': self.runtime.credentials.get('endpoint'),
+                'bucket': self.runtime.credentials.get('bucket'),
+                'access_key_id': self.runtime.credentials.get('access_key_id'),
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
+            }
+
+            # 验证工具参数中的认证信息
+            self._validate_credentials(credentials)
+
+            # 执行批量删除操作，单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                results = self._delete_files(tool_parameters, credentials)
+
+            # 试运行只返回将被删除的对象，不执行删除
+            if tool_parameters.get('dry_run'):
+                yield self.create_json_message({
+                    "status": "dry_run",
+                    "matched_count": len(results),
+                    "files": results
+                })
+                text_message = f"Dry run completed, nothing was deleted\nFiles to delete: {len(results)}\n"
+                for result in results[:DRY_RUN_PREVIEW_COUNT]:
+                    text_message += f"- {result['bucket']}/{result['key']}\n"
+                if len(results) > DRY_RUN_PREVIEW_COUNT:
+                    text_message += f"... and {len(results) - DRY_RUN_PREVIEW_COUNT} more (see the JSON result)\n"
+                yield self.create_text_message(text_message)
+                return
+
+            # 统计成功和失败的文件数量
+            deleted_count = len([r for r in results if r['status'] == 'deleted'])
+            error_count = len(results) - deleted_count
+
+            # 构建JSON响应，每个对象只保留bucket、对象键和状态
+            json_response = {
+                "status": "completed",
+                "deleted_count": deleted_count,
+                "error_count": error_count,
+                "files": results
+            }
+
+            yield self.create_json_message(json_response)
+
+            # 构建文本响应，成功的文件只输出数量，失败的文件逐个列出原因
+            text_message = f"Batch delete completed\nDeleted: {deleted_count} files\nFailed: {error_count} files\n"
+
+            if error_count > 0:
+                text_message += "\nFailed files:\n"
+                for result in results:
+                    if result['status'] == 'error':
+                        text_message += f"- {result['bucket']}/{result['key']}\n"
+                        text_message += f"  Error: {result['error']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息
+            yield self.create_text_message(f"Failed to delete files: {str(e)}")
+            # 同时抛出异常，与上传工具的行为保持一致
+            raise ValueError(f"Failed to delete files: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _delete_files(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> List[Dict]:
+        try:
+            # 获取待删除的URL或对象键（使用分号分隔）、前缀和并发数
+            targets = parameters.get('targets') or ''
+            raw_prefix = parameters.get('prefix') or ''
+            prefix = raw_prefix.strip()
+            concurrency = normalize_concurrency(parameters.get('concurrency'))
+            max_objects = self._parse_max_objects(parameters.get('max_objects'))
+
+            # 只包含空白字符的前缀不能当作未设置处理，更不能当作空前缀匹配整个Bucket
+            if raw_prefix and not prefix:
+                raise ValueError("Prefix cannot be blank")
+
+            items = [item.strip() for item in targets.split(';') if item.strip()]
+            if not items and not prefix:
+                raise ValueError("Missing required parameter: targets or prefix")
+
+            # 验证prefix规则：禁止以/或\开头，避免误删整个Bucket
+            if prefix and (prefix.startswith('/') or prefix.startswith('\\')):
+                raise ValueError("Prefix cannot start with / or \\ ")
+
+            # 按(endpoint, bucket)对待删除的对象分组，同一Bucket的对象合并到批量请求中
+            groups: Dict[tuple, List[str]] = {}
+            for item in items:
+                endpoint, bucket_name, object_key = resolve_oss_location(item, credentials['endpoint'],
+                                                                         credentials['bucket'])
+                if not object_key:
+                    raise ValueError(f"No object key found in: {item}")
+                keys = groups.setdefault((endpoint, bucket_name), [])
+                if object_key not in keys:
+                    keys.append(object_key)
+
+            # 按前缀列举配置Bucket中的对象，一并删除；匹配的对象超过上限时不删除任何对象
+            if prefix:
+                bucket = self._get_bucket(credentials, credentials['endpoint'], credentials['bucket'])
+                keys = groups.setdefault((self._normalize_endpoint(credentials['endpoint']), credentials['bucket']), [])
+                known = set(keys)
+                matched = 0
+                for obj in oss2.ObjectIteratorV2(bucket, prefix=prefix):
+                    matched += 1
+                    if matched > max_objects:
+                        raise ValueError(f"Prefix '{prefix}' matches more than {max_objects} files, nothing was deleted. "
+                                         f"Use a more specific prefix or increase max_objects")
+                    if obj.key not in known:
+                        known.add(obj.key)
+                        keys.append(obj.key)
+
+            if parameters.get('dry_run'):
+                return [{"bucket": bucket_name, "key": key, "status": "matched"}
+                        for (_, bucket_name), keys in groups.items() for key in keys]
+
+            # 每个Bucket的对象按1000个一批拆分，多个批次并发执行
+            batches = []
+            for (endpoint, bucket_name), keys in groups.items():
+                for start in range(0, len(keys), BATCH_DELETE_LIMIT):
+                    batches.append((endpoint, bucket_name, keys[start:start + BATCH_DELETE_LIMIT]))
+
+            batch_results = run_concurrently(
+                lambda _, batch: self._delete_batch(credentials, *batch), batches, concurrency)
+
+            return [result for results in batch_results for result in results]
+        except Exception as e:
+            raise ValueError(f"Failed to delete files: {str(e)}")
+
+    def _delete_batch(self, credentials: dict[str, Any], endpoint: str, bucket_name: str,
+                      keys: List[str]) -> List[Dict]:
+        """在线程池中删除一批对象，返回每个对象的删除结果"""
+        try:
+            bucket = self._get_bucket(credentials, endpoint, bucket_name)
+            # 删除不存在的对象同样返回成功，批量删除可以安全重试
+            deleted = set(call_with_retry(lambda: bucket.batch_delete_objects(keys), bucket.endpoint).deleted_keys)
+        except Exception as e:
+            # 整个批次失败时，批次内的所有对象都记录为失败
+            return [{"bucket": bucket_name, "key": key, "status": "error", "error": str(e)} for key in keys]
+
+        results = []
+        for key in keys:
+            if key in deleted:
+                # 清除包含该对象的列举缓存、下载缓存和去重上传的已知对象记录
+                get_object_index().invalidate(bucket_name, key)
+                get_known_objects().invalidate(bucket_name, key)
+                get_download_cache().invalidate(bucket_name, key)
+                results.append({"bucket": bucket_name, "key": key, "status": "deleted"})
+            else:
+                results.append({"bucket": bucket_name, "key": key, "status": "error",
+                                "error": "Object was not reported as deleted"})
+        return results
+
+    def _parse_max_objects(self, value: Any) -> int:
+        """解析按前缀删除时允许的最大对象数量"""
+        if value in (None, ''):
+            return DEFAULT_PREFIX_DELETE_LIMIT
+        try:
+            max_objects = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid max_objects: {value}")
+        if not 1 <= max_objects <= MAX_PREFIX_DELETE_LIMIT:
+            raise ValueError(f"max_objects must be between 1 and {MAX_PREFIX_DELETE_LIMIT}")
+        return max_objects
+
+    def _normalize_endpoint(self, endpoint: str) -> str:
+        """补全endpoint的协议前缀"""
+        if not endpoint.startswith(('http://', 'https://')):
+            endpoint = f"http://{endpoint}"
+        return endpoint
+
+    def _get_bucket(self, credentials: dict[str, Any], endpoint: str, bucket_name: str) -> oss2.Bucket:
+        """获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）"""
+        return get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                          self._normalize_endpoint(endpoint), bucket_name,
+                          routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
@@ -0,0 +1,202 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import oss2
+
+from .blob_stream import iter_stream_chunks
+from .multipart import CHECKPOINT_ROOT
+from .retry import call_with_retry
+
+# 缓存文件保存目录
+CACHE_DIR = os.path.join(CHECKPOINT_ROOT, 'download_cache')
+# 缓存占用的最大磁盘空间（字节），超出后淘汰最久未使用的对象
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 单个对象超过该大小时不写入缓存
+CACHE_MAX_ENTRY_BYTES = 64 * 1024 * 1024
+# 对象不存在（404）的结果缓存时间（秒）
+NEGATIVE_CACHE_TTL = 30
+
+
+class DownloadCache:
+    """
+    按(Endpoint, Bucket, 对象键)缓存下载内容的本地磁盘LRU缓存
+
+    缓存中保存ETag、Content-Type和文件内容。每次读取都先用If-None-Match发起条件请求，
+    对象未变化时只需一次304响应，对象已变化时下载新内容并替换缓存。
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES, negative_ttl: float = NEGATIVE_CACHE_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._missing: Dict[Tuple[str, str, str], float] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._stats = {'hits': 0, 'misses': 0, 'revalidations': 0, 'negative_hits': 0}
+
+    def _ensure_root(self) -> None:
+        """创建缓存目录；索引只保存在内存中，因此清除上次进程遗留的缓存文件"""
+        if not self._initialized:
+            shutil.rmtree(self.root, ignore_errors=True)
+            os.makedirs(self.root, exist_ok=True)
+            self._initialized = True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计
+
+        Returns:
+            包含hits（使用缓存内容）、misses（下载完整内容）、revalidations（发起的条件请求）、
+            negative_hits（命中不存在对象缓存）、entries和bytes的字典
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._total_bytes)
+
+    def fetch(self, bucket: oss2.Bucket, object_key: str) -> Dict[str, Any]:
+        """
+        通过缓存获取对象内容
+
+        Args:
+            bucket: OSS Bucket对象
+            object_key: 对象键
+
+        Returns:
+            包含以下键的字典：
+            - file: 已打开的文件内容，调用方读取后需关闭
+            - content_type: 文件类型
+            - file_size: 文件大小（字节）
+            - cache_status: hit（对象未变化，使用缓存内容）或miss（下载了完整内容）
+        """
+        key = (bucket.endpoint, bucket.bucket_name, object_key)
+
+        with self._lock:
+            self._ensure_root()
+            expires_at = self._missing.get(key)
+            if expires_at is not None:
+                if expires_at > time.monotonic():
+                    self._stats['negative_hits'] += 1
+                    raise ValueError(f"Object does not exist: {object_key}")
+                del self._missing[key]
+            entry = self._entries.get(key)
+
+        # 1. 有缓存时发起条件请求，对象未变化时OSS返回304
+        headers = {'If-None-Match': f'"{entry["etag"]}"'} if entry else None
+        try:
+            result = call_with_retry(lambda: bucket.get_object(object_key, headers=headers), bucket.endpoint)
+        except oss2.exceptions.NotModified:
+            with self._lock:
+                self._stats['revalidations'] += 1
+                # 等待响应期间缓存可能已被替换或淘汰
+                current = self._entries.get(key)
+                if current is not None:
+                    try:
+                        cached_file = open(current['path'], 'rb')
+                    except OSError:
+                        cached_file = None
+                    if cached_file is not None:
+                        self._entries.move_to_end(key)
+                        self._stats['hits'] += 1
+                        return {
+                            'file': cached_file,
+                            'content_type': current['content_type'],
+                            'file_size': current['size'],
+                            'cache_status': 'hit'
+                        }
+            # 缓存内容已不可用，重新下载完整内容
+            result = call_with_retry(lambda: bucket.get_object(object_key), bucket.endpoint)
+        except oss2.exceptions.NotFound:
+            with self._lock:
+                self._missing[key] = time.monotonic() + self.negative_ttl
+            raise
+
+        with self._lock:
+            if entry:
+                self._stats['revalidations'] += 1
+            self._stats['misses'] += 1
+
+        # 2. 下载完整内容写入缓存文件，再以只读方式打开返回
+        content_type = result.headers.get('Content-Type', 'application/octet-stream')
+        fd, path = tempfile.mkstemp(dir=self.root)
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter_stream_chunks(result):
+                    f.write(chunk)
+                    size += len(chunk)
+            cached_file = open(path, 'rb')
+        except Exception:
+            os.remove(path)
+            raise
+
+        if size <= self.max_entry_bytes:
+            self._store(key, {'path': path, 'etag': result.etag, 'content_type': content_type, 'size': size})
+        else:
+            # 过大的对象不缓存，已打开的文件在关闭前仍可读取
+            os.remove(path)
+
+        return {
+            'file': cached_file,
+            'content_type': content_type,
+            'file_size': size,
+            'cache_status': 'miss'
+        }
+
+    def invalidate(self, bucket_name: str, object_key: str) -> None:
+        """
+        清除对象的缓存内容和不存在记录，对象被上传、覆盖或删除后调用
+
+        Args:
+            bucket_name: 存储空间名称
+            object_key: 对象键
+        """
+        with self._lock:
+            # 同一对象可能经由不同的endpoint（公网、内网或加速域名）缓存
+            for key in [key for key in self._missing if key[1] == bucket_name and key[2] == object_key]:
+                del self._missing[key]
+            for key in [key for key in self._entries if key[1] == bucket_name and key[2] == object_key]:
+                self._remove_entry(self._entries.pop(key))
+
+    def _store(self, key: Tuple[str, str, str], entry: Dict[str, Any]) -> None:
+        """写入缓存索引，替换旧内容并淘汰超出容量的对象"""
+        with self._lock:
+            self._missing.pop(key, None)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._remove_entry(old)
+            self._entries[key] = entry
+            self._total_bytes += entry['size']
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._remove_entry(evicted)
+
+    def _remove_entry(self, entry: Dict[str, Any]) -> None:
+        """删除缓存文件（调用方需持有锁），正在读取该文件的调用不受影响"""
+        self._total_bytes -= entry['size']
+        try:
+            os.remove(entry['path'])
+        except OSError:
+            pass
+
+
+_cache = DownloadCache()
+
+
+def get_download_cache() -> DownloadCache:
+    """获取进程内共享的下载缓存"""
+    return _cache
+
+
+def format_cache_stats(stats: Dict[str, int]) -> str:
+    """将缓存统计格式化为输出消息中的一行"""
+    return (f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['revalidations']} revalidations, {stats['negative_hits']} negative hits")
+
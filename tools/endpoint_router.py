@@ -0,0 +1,132 @@
+import re
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from .concurrency import run_concurrently
+
+# 路由模式：public（始终使用配置的公网域名）、auto（探测内网与公网域名，选择延迟最低的可达域名）、
+# internal（优先使用内网域名）、accelerate（优先使用传输加速域名）
+ROUTING_PUBLIC = 'public'
+ROUTING_AUTO = 'auto'
+ROUTING_INTERNAL = 'internal'
+ROUTING_ACCELERATE = 'accelerate'
+ROUTING_MODES = (ROUTING_PUBLIC, ROUTING_AUTO, ROUTING_INTERNAL, ROUTING_ACCELERATE)
+
+# 探测单个候选域名的TCP连接超时时间（秒）
+PROBE_TIMEOUT = 1.0
+# 探测结果的缓存时间（秒），过期后重新探测，以便网络变化后自动切换
+ROUTE_TTL = 600
+
+# 传输加速域名（全局统一）
+ACCELERATE_HOST = 'oss-accelerate.aliyuncs.com'
+# 不属于任何地域的全局域名前缀（全球加速和海外加速）
+_GLOBAL_HOST_PREFIX = 'oss-accelerate'
+
+# 地域公网/内网域名，例如oss-cn-hangzhou.aliyuncs.com、oss-cn-hangzhou-internal.aliyuncs.com
+_REGION_HOST_PATTERN = re.compile(r'^oss-([a-z0-9-]+?)(-internal)?\.aliyuncs\.com$')
+
+_routes: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
+_routes_lock = threading.Lock()
+
+
+def normalize_routing(value: Optional[str]) -> str:
+    """规范化路由模式，为空或非法时使用public"""
+    value = (value or '').strip().lower()
+    return value if value in ROUTING_MODES else ROUTING_PUBLIC
+
+
+def endpoint_region(endpoint: str) -> Optional[str]:
+    """
+    从OSS地域域名中解析地域，例如oss-cn-hangzhou.aliyuncs.com解析为cn-hangzhou
+
+    Args:
+        endpoint: OSS域名，可以带协议前缀
+
+    Returns:
+        地域；传输加速等全局域名、自定义域名和IP无法确定地域，返回None
+    """
+    _, host, _ = _split_endpoint(endpoint)
+    if host.startswith(_GLOBAL_HOST_PREFIX):
+        return None
+    match = _REGION_HOST_PATTERN.match(host)
+    return match.group(1) if match else None
+
+
+def route_endpoint(endpoint: str, routing: Optional[str]) -> str:
+    """
+    根据路由模式选择实际传输数据使用的OSS域名
+
+    只处理阿里云OSS的地域域名，自定义域名、IP等保持不变。候选域名通过TCP连接探测，
+    按地域缓存延迟最低的可达域名；候选域名都不可达时回退到原域名。
+
+    Args:
+        endpoint: 配置的或从URL中解析出的域名，可以带协议前缀
+        routing: 路由模式
+
+    Returns:
+        实际使用的域名，保留原有的协议前缀
+    """
+    routing = normalize_routing(routing)
+    if routing == ROUTING_PUBLIC:
+        return endpoint
+
+    region = endpoint_region(endpoint)
+    if region is None:
+        return endpoint
+
+    scheme, _, port = _split_endpoint(endpoint)
+    public_host = f"oss-{region}.aliyuncs.com"
+    cache_key = (scheme, region, routing)
+    now = time.monotonic()
+    with _routes_lock:
+        cached = _routes.get(cache_key)
+        if cached is not None and cached[1] > now:
+            return _join_endpoint(endpoint, scheme, cached[0])
+
+    # 候选域名按优先级排列，公网域名始终作为最后的回退
+    if routing == ROUTING_ACCELERATE:
+        candidates = [ACCELERATE_HOST, public_host]
+    else:
+        candidates = [f"oss-{region}-internal.aliyuncs.com", public_host]
+
+    latencies = run_concurrently(lambda _, candidate: _probe(candidate, port), candidates, len(candidates))
+    reachable = [(latency, index) for index, latency in enumerate(latencies) if latency is not None]
+    if not reachable:
+        # 全部不可达时不缓存，保持原域名，下次调用重新探测
+        return endpoint
+
+    if routing == ROUTING_AUTO:
+        chosen = candidates[min(reachable)[1]]
+    else:
+        chosen = candidates[min(index for _, index in reachable)]
+
+    with _routes_lock:
+        _routes[cache_key] = (chosen, now + ROUTE_TTL)
+    return _join_endpoint(endpoint, scheme, chosen)
+
+
+def _split_endpoint(endpoint: str) -> Tuple[str, str, int]:
+    """拆分域名中的协议、主机名和端口"""
+    parsed = urlparse(endpoint if '://' in endpoint else f"http://{endpoint}")
+    scheme = parsed.scheme or 'http'
+    port = parsed.port or (443 if scheme == 'https' else 80)
+    return scheme, (parsed.hostname or '').lower(), port
+
+
+def _join_endpoint(endpoint: str, scheme: str, host: str) -> str:
+    """用选中的主机名替换原域名，保留原有的协议前缀写法"""
+    return f"{scheme}://{host}" if '://' in endpoint else host
+
+
+def _probe(host: str, port: int) -> Optional[float]:
+    """测量与候选域名建立TCP连接的耗时（秒），不可达时返回None"""
+    started = time.monotonic()
+    try:
+        with socket.create_connection((host, port), timeout=PROBE_TIMEOUT):
+            return time.monotonic() - started
+    except OSError:
+        return None
+
@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Iterator
+
+import httpx
+from dify_plugin.file.file import File
+
+# 计算本地文件校验值时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+# 流式读取文件时每个数据块的字节数
+STREAM_CHUNK_SIZE = 1024 * 1024
+# 流式下载Dify文件的超时时间（秒）：连接超时与两次读取之间的最大间隔
+STREAM_CONNECT_TIMEOUT = 10
+STREAM_READ_TIMEOUT = 60
+
+
+def materialize_file(file: Any, with_sha256: bool = False) -> Dict[str, Any]:
+    """
+    一次性获取待上传文件的内容，并在同一遍读取中计算大小和校验值
+
+    Dify的File对象每次访问blob都可能重新从文件存储下载，普通文件对象读取两次也会产生两份内存拷贝，
+    因此上传工具只通过该函数获取一次数据，之后的大小统计和上传都复用同一份内容。
+
+    Args:
+        file: Dify File对象、普通文件对象或本地文件路径
+        with_sha256: 是否同时计算SHA-256（去重上传时用作内容地址）
+
+    Returns:
+        包含以下键的字典：
+        - data: 文件内容（bytes），本地文件路径时为路径本身，避免读入内存
+        - is_path: data是否为本地文件路径
+        - size: 文件大小（字节）
+        - md5: 内容的MD5十六进制字符串
+        - content_md5: 内容MD5的Base64编码，可直接用作Content-MD5请求头
+        - sha256: 内容的SHA-256十六进制字符串，仅在with_sha256为True时存在
+    """
+    if isinstance(file, File):
+        # 只访问一次blob，避免重复下载
+        data = file.blob
+    elif hasattr(file, 'read'):
+        # 重置文件指针到开头后只读取一次
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        data = file.read()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+    elif isinstance(file, (str, bytes, os.PathLike)) and os.path.isfile(file):
+        # 本地文件流式计算校验值，上传时直接使用文件路径
+        digest = hashlib.md5()
+        sha256 = hashlib.sha256() if with_sha256 else None
+        size = 0
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                if sha256 is not None:
+                    sha256.update(chunk)
+                size += len(chunk)
+        return _build_source(file, size, digest, sha256, is_path=True)
+    else:
+        raise ValueError(f"Unsupported file type: {type(file)}. Expected file-like object or path.")
+
+    sha256 = hashlib.sha256(data) if with_sha256 else None
+    return _build_source(data, len(data), hashlib.md5(data), sha256)
+
+
+def _build_source(data: Any, size: int, digest: Any, sha256: Any = None, is_path: bool = False) -> Dict[str, Any]:
+    """组装文件内容及其校验信息"""
+    source = {
+        'data': data,
+        'is_path': is_path,
+        'size': size,
+        'md5': digest.hexdigest(),
+        'content_md5': base64.b64encode(digest.digest()).decode('ascii')
+    }
+    if sha256 is not None:
+        source['sha256'] = sha256.hexdigest()
+    return source
+
+
+@contextmanager
+def open_file_stream(file: Any, chunk_size: int = STREAM_CHUNK_SIZE) -> Generator[Iterator[bytes], None, None]:
+    """
+    以数据块的形式流式读取待上传文件，不把整个文件读入内存
+
+    Dify的File对象直接从其URL分块下载，普通文件对象和本地文件按块读取。
+
+    Args:
+        file: Dify File对象、普通文件对象或本地文件路径
+        chunk_size: 每个数据块的字节数
+
+    Returns:
+        上下文管理器，产出bytes数据块的迭代器
+    """
+    if isinstance(file, File):
+        timeout = httpx.Timeout(STREAM_READ_TIMEOUT, connect=STREAM_CONNECT_TIMEOUT)
+        try:
+            with httpx.stream('GET', file.url, timeout=timeout) as response:
+                response.raise_for_status()
+                yield response.iter_bytes(chunk_size)
+        except httpx.UnsupportedProtocol as e:
+            raise ValueError(
+                f"Invalid file URL '{file.url}': {e}. "
+                "Ensure the `FILES_URL` environment variable is set in your .env file"
+            ) from e
+    elif hasattr(file, 'read'):
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        yield _read_chunks(file, chunk_size)
+    elif isinstance(file, (str, bytes, os.PathLike)) and os.path.isfile(file):
+        with open(file, 'rb') as f:
+            yield _read_chunks(f, chunk_size)
+    else:
+        raise ValueError(f"Unsupported file type: {type(file)}. Expected file-like object or path.")
+
+
+def _read_chunks(reader: Any, chunk_size: int) -> Iterator[bytes]:
+    """从文件对象中按块读取数据，直到读完为止"""
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
@@ -1,6 +1,5 @@
 import os
 import re
-from urllib.parse import urlparse, unquote
 from typing import Any, Dict, Optional, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 
@@ -8,7 +7,16 @@ import oss2
 from oss2 import Auth, Bucket
 
 from dify_plugin.interfaces.tool import Tool, ToolProvider
-from .utils import get_extension_from_content_type
+from .utils import get_extension_from_content_type, resolve_oss_location
+from .oss_client import get_bucket
+from .blob_stream import create_blob_chunk_messages, iter_stream_chunks
+from .image_process import apply_image_process_result, normalize_image_process
+from .singleflight import get_download_flight, object_flight_key
+from .download_cache import format_cache_stats, get_download_cache
+from .ranged_download import (DEFAULT_RANGE_PART_SIZE, STANDARD_RANGE_HEADERS, download_object_ranged,
+                              finish_ranged_download, parse_byte_range)
+from .retry import call_with_retry
+from .deadline import Deadline, deadline_scope
 
 
 
@@ -19,8 +27,12 @@ class GetFileByUrlTool(Tool):
             # 验证工具参数中的认证信息
             self._validate_credentials()
             
-            # 执行文件获取操作
-            result = self._get_file_by_url(tool_parameters)
+            # 下载模式：buffered（完整读取后返回）、streaming（分块流式返回）或parallel（大文件分段并发下载）
+            download_mode = tool_parameters.get('download_mode') or 'buffered'
+            
+            # 执行文件获取操作，单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                result = self._get_file_by_url(tool_parameters, download_mode=download_mode)
             
             # 提取文件扩展名
             _, extension = os.path.splitext(result['filename'])
@@ -43,15 +55,40 @@ class GetFileByUrlTool(Tool):
                 file_metadata['display_as_image'] = True
                 file_metadata['type'] = 'image'
             
-            # 使用create_blob_message返回文件内容
-            yield self.create_blob_message(
-                result['file_content'],
-                file_metadata
-            )
+            if 'path' in result:
+                # 分段并发下载完成后，从本地文件分块输出，然后清理本地文件和断点信息
+                try:
+                    with open(result['path'], 'rb') as f:
+                        result['file_size'] = yield from create_blob_chunk_messages(
+                            iter_stream_chunks(f),
+                            result['file_size'],
+                            file_metadata
+                        )
+                finally:
+                    finish_ranged_download(result['bucket'], result['object_key'], result['path'])
+            elif 'stream' in result:
+                # 流式模式：边从OSS读取边输出数据块，内存中只保留一个读取缓冲区
+                # 分块传输（例如图片处理结果）时响应没有Content-Length，文件大小以实际输出的字节数为准
+                try:
+                    result['file_size'] = yield from create_blob_chunk_messages(
+                        iter_stream_chunks(result['stream']),
+                        result['file_size'],
+                        file_metadata
+                    )
+                finally:
+                    result['stream'].close()
+            else:
+                # 使用create_blob_message返回文件内容
+                yield self.create_blob_message(
+                    result['file_content'],
+                    file_metadata
+                )
             
             # 在text中输出成功消息、文件大小和类型，文件大小以MB为单位 - 英文消息
-            file_size_mb = result['file_size'] / (1024 * 1024) if result['file_size'] > 0 else 0
+            file_size_mb = result['file_size'] / (1024 * 1024) if result['file_size'] else 0
             success_message = f"File downloaded successfully: {result['filename']}\nFile size: {file_size_mb:.2f} MB\nFile type: {result['content_type']}"
+            if 'cache_status' in result:
+                success_message += f"\nCache status: {result['cache_status']}\n{format_cache_stats(get_download_cache().stats())}"
             yield self.create_text_message(success_message)
         except Exception as e:
             # 失败时在text中输出错误信息 - 英文消息
@@ -64,7 +101,7 @@ class GetFileByUrlTool(Tool):
             if not self.runtime.credentials.get(field):
                 raise ValueError(f"Missing required credential: {field}")
     
-    def _get_file_by_url(self, parameters: dict[str, Any]) -> dict:
+    def _get_file_by_url(self, parameters: dict[str, Any], download_mode: str = 'buffered') -> dict:
         try:
             # 获取文件URL
             file_url = parameters.get('file_url')
@@ -77,68 +114,132 @@ class GetFileByUrlTool(Tool):
                 'endpoint': self.runtime.credentials.get('endpoint'),
                 'bucket': self.runtime.credentials.get('bucket'),
                 'access_key_id': self.runtime.credentials.get('access_key_id'),
-                'access_key_secret': self.runtime.credentials.get('access_key_secret')
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
             }
             
             # 解析URL获取bucket、endpoint和object_key
-            bucket, endpoint, object_key = self._parse_oss_url(file_url)
-            
-            # 如果URL中的bucket与凭证中的bucket不一致，使用URL中的bucket
-            if bucket and bucket != credentials['bucket']:
-                bucket_name = bucket
-            else:
-                bucket_name = credentials['bucket']
+            endpoint_url, bucket_name, object_key = resolve_oss_location(file_url, credentials['endpoint'],
+                                                                         credentials['bucket'])
             
-            # 创建OSS客户端，处理endpoint协议
-            endpoint_url = endpoint if endpoint else credentials['endpoint']
-            if not endpoint_url.startswith(('http://', 'https://')):
-                endpoint_url = f"http://{endpoint_url}"
-            auth = oss2.Auth(credentials['access_key_id'], credentials['access_key_secret'])
-            bucket = oss2.Bucket(auth, endpoint_url, bucket_name)
-            
-            # 获取文件内容
-            result = bucket.get_object(object_key)
-            file_content = result.read()
-            
-            # 获取文件大小
-            file_size = len(file_content)
-            
-            # 获取文件类型
-            content_type = result.headers.get('Content-Type', 'application/octet-stream')
+            # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                endpoint_url, bucket_name, routing=credentials['endpoint_routing'],
+                                limits=self.runtime.credentials)
             
             # 获取文件名
             filename = os.path.basename(object_key)
             
-            # 返回结果字典
-            return {
-                'file_content': file_content,
-                'filename': filename,
-                'content_type': content_type,
-                'file_size': file_size
-            }
+            # 只下载指定的字节区间
+            byte_range = parse_byte_range(parameters.get('byte_range'))
+            
+            # 图片处理：由OSS在服务端缩放、裁剪或转换格式，只传输处理后的数据
+            image_process = normalize_image_process(parameters.get('image_process'))
+            if image_process and byte_range is not None:
+                raise ValueError("byte_range cannot be used together with image_process")
+            
+            # 缓冲模式的结果只包含不可变的文件内容，相同对象的并发下载合并为一次请求并共享结果
+            fetch = lambda: self._fetch_file(bucket, object_key, filename, parameters, download_mode,
+                                             byte_range, image_process)
+            if download_mode == 'buffered':
+                flight_key = object_flight_key(credentials['access_key_id'], bucket, object_key,
+                                               byte_range, image_process)
+                return get_download_flight().do(flight_key, fetch)
+            return fetch()
         except Exception as e:
             error_message = f"Failed to retrieve file: {str(e)}"
             raise ValueError(error_message)
     
-    def _parse_oss_url(self, url: str) -> tuple:
-        """
-        解析OSS URL，支持标准格式和自定义域名格式
-        标准格式: https://bucket.endpoint/object_key
-        自定义域名格式: https://custom-domain/object_key
-        """
-        parsed_url = urlparse(url)
+    def _fetch_file(self, bucket: Any, object_key: str, filename: str, parameters: dict[str, Any],
+                    download_mode: str, byte_range: Optional[tuple], image_process: Optional[str]) -> dict:
+        """按下载模式获取文件内容或响应流"""
+        if image_process:
+            return self._get_processed_image(bucket, object_key, filename, image_process, download_mode)
+        
+        # 并发模式下先HEAD获取对象大小，超过一个分段的对象拆分为多个字节区间并发下载
+        if download_mode == 'parallel' and byte_range is None:
+            object_meta = call_with_retry(lambda: bucket.head_object(object_key), bucket.endpoint)
+            if object_meta.content_length > DEFAULT_RANGE_PART_SIZE:
+                path = download_object_ranged(bucket, object_key, object_meta)
+                return {
+                    'path': path,
+                    'bucket': bucket,
+                    'object_key': object_key,
+                    'filename': filename,
+                    'content_type': object_meta.content_type or 'application/octet-stream',
+                    'file_size': object_meta.content_length
+                }
+        
+        # 使用本地缓存时通过条件请求校验ETag，对象未变化时直接使用缓存内容（不适用于字节区间和并发分段下载）
+        if parameters.get('use_cache') and byte_range is None and download_mode != 'parallel':
+            cached = get_download_cache().fetch(bucket, object_key)
+            result = {
+                'filename': filename,
+                'content_type': cached['content_type'],
+                'file_size': cached['file_size'],
+                'cache_status': cached['cache_status']
+            }
+            if download_mode == 'streaming':
+                result['stream'] = cached['file']
+            else:
+                with cached['file'] as f:
+                    result['file_content'] = f.read()
+            return result
+        
+        # 获取文件，暂时性错误时重试（只重试建立响应的过程，响应流读取中断时不会重新请求）
+        if byte_range is not None:
+            result = call_with_retry(
+                lambda: bucket.get_object(object_key, byte_range=byte_range, headers=STANDARD_RANGE_HEADERS),
+                bucket.endpoint)
+        else:
+            result = call_with_retry(lambda: bucket.get_object(object_key), bucket.endpoint)
+        
+        # 获取文件类型
+        content_type = result.headers.get('Content-Type', 'application/octet-stream')
+        
+        # 流式模式直接返回响应流，由调用方分块读取
+        if download_mode in ('streaming', 'parallel'):
+            return {
+                'stream': result,
+                'filename': filename,
+                'content_type': content_type,
+                'file_size': result.content_length
+            }
         
-        # 处理URL编码
-        object_key = unquote(parsed_url.path.lstrip('/'))
+        # 获取文件内容
+        file_content = result.read()
         
-        # 如果是标准OSS URL格式 (bucket.endpoint)
-        if parsed_url.hostname and '.' in parsed_url.hostname:
-            parts = parsed_url.hostname.split('.', 1)
-            if len(parts) == 2:
-                bucket_name = parts[0]
-                endpoint =  f"{parsed_url.scheme}://{parts[1]}"
-                return (bucket_name, endpoint, object_key)
+        # 获取文件大小
+        file_size = len(file_content)
+        
+        # 返回结果字典
+        return {
+            'file_content': file_content,
+            'filename': filename,
+            'content_type': content_type,
+            'file_size': file_size
+        }
+    
+    def _get_processed_image(self, bucket: Any, object_key: str, filename: str, image_process: str,
+                             download_mode: str) -> dict:
+        """通过x-oss-process获取处理后的图片，文件名和类型跟随目标格式"""
+        result = call_with_retry(lambda: bucket.get_object(object_key, process=image_process), bucket.endpoint)
+        filename, content_type = apply_image_process_result(
+            filename, result.headers.get('Content-Type', 'application/octet-stream'), image_process)
+        
+        # 处理后的大小无法预先获知，并发分段模式同样按流式返回
+        if download_mode in ('streaming', 'parallel'):
+            return {
+                'stream': result,
+                'filename': filename,
+                'content_type': content_type,
+                'file_size': result.content_length
+            }
         
-        # 对于自定义域名格式，需要额外的endpoint或bucket验证
-        # 此处仅返回None作为bucket和endpoint，由调用方处理
-        return None, None, object_key
+        file_content = result.read()
+        return {
+            'file_content': file_content,
+            'filename': filename,
+            'content_type': content_type,
+            'file_size': len(file_content)
+        }
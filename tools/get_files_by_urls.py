@@ -1,6 +1,8 @@
+import asyncio
 import os
 import re
-from urllib.parse import urlparse, unquote
+import time
+from datetime import datetime
 from typing import Any, Dict, Optional, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 
@@ -8,11 +10,27 @@ import oss2
 from oss2 import Auth, Bucket
 
 from dify_plugin.interfaces.tool import Tool, ToolProvider
-from .utils import get_extension_from_content_type
+from .utils import get_extension_from_content_type, resolve_oss_location
+from .oss_client import get_bucket
+from .concurrency import iter_concurrently, normalize_concurrency, run_concurrently
+from .multipart import mb_to_bytes
+from .image_process import apply_image_process_result, normalize_image_process
+from .singleflight import get_download_flight, object_flight_key
+from .blob_stream import create_blob_chunk_messages, iter_stream_chunks, spool_stream
+from .download_cache import format_cache_stats, get_download_cache
+from .archive import ARCHIVE_FORMATS, ArchiveWriter
+from .async_transfer import DEFAULT_ASYNC_CONCURRENCY, MAX_ASYNC_CONCURRENCY, AsyncOssClient, iter_async
+from .endpoint_router import route_endpoint
+from .rate_limiter import get_rate_limiter
+from .retry import async_call_with_retry, call_with_retry
+from .deadline import NOT_ATTEMPTED, NOT_FINISHED, Deadline, DeadlineExceeded, current_deadline, deadline_scope
 
 
 class GetFilesByUrlsTool(Tool):
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        # 本次调用的截止时间，到期前输出已完成的文件，未开始的URL列入未执行列表
+        deadline = Deadline()
+        archive = None
         try:
             # 验证工具参数中的认证信息
             self._validate_credentials()
@@ -29,56 +47,286 @@ class GetFilesByUrlsTool(Tool):
             if not urls:
                 raise ValueError("No valid URLs provided")
             
-            # 批量下载文件
+            # 并发下载数量及结果输出顺序（input：按输入顺序；completion：按完成顺序）
+            concurrency = normalize_concurrency(tool_parameters.get('concurrency'))
+            output_order = tool_parameters.get('output_order') or 'input'
+            # 下载模式：buffered（完整读取后返回）、streaming（先写入临时文件，再分块流式返回）
+            # 或async（在当前线程的事件循环中异步并发下载，结果与streaming模式相同）
+            download_mode = tool_parameters.get('download_mode') or 'buffered'
+            use_async = download_mode == 'async'
+            # 异步模式的并发数单独设置：请求不占用线程，可以远高于线程池的并发数
+            async_concurrency = normalize_concurrency(tool_parameters.get('async_concurrency'),
+                                                      DEFAULT_ASYNC_CONCURRENCY, MAX_ASYNC_CONCURRENCY)
+            streaming = download_mode in ('streaming', 'async')
+            # 是否使用本地缓存（异步模式不使用缓存）
+            use_cache = bool(tool_parameters.get('use_cache')) and not use_async
+            # 单个文件大小上限（为0表示不限制）及下载调度顺序（input：按输入顺序；smallest_first：小文件优先）
+            max_file_size = mb_to_bytes(tool_parameters.get('max_file_size'), 0)
+            schedule = tool_parameters.get('schedule') or 'input'
+            # 图片处理参数，对每个文件通过x-oss-process在服务端处理
+            image_process = normalize_image_process(tool_parameters.get('image_process'))
+            # 输出方式：files（逐个输出文件）、zip或tar_gz（所有文件写入一个归档文件后输出）
+            output_mode = tool_parameters.get('output_mode') or 'files'
+            if output_mode != 'files' and output_mode not in ARCHIVE_FORMATS:
+                raise ValueError(f"Unsupported output mode: {output_mode}")
+            
+            # 批量下载文件，只保留摘要所需的元数据，不保留文件内容
             downloaded_files = []
             total_size = 0
+            # 截止时间前没有开始下载的URL
+            not_attempted = []
+            # 归档模式下与之前的URL指向同一对象、未再次写入归档的URL数量
+            duplicate_count = 0
+            
+            # 同一对象的多个URL（包括不同写法）只下载一次，重复的URL共享下载结果
+            flight_keys = [self._flight_key(url, image_process) for url in urls]
+            duplicates = {}
+            first_index = {}
+            pending = []
+            for index, flight_key in enumerate(flight_keys):
+                if flight_key is not None and flight_key in first_index:
+                    duplicates.setdefault(first_index[flight_key], []).append(index)
+                else:
+                    if flight_key is not None:
+                        first_index[flight_key] = index
+                    pending.append(index)
+            
+            # 需要按大小过滤或调度时，先并发HEAD所有URL获取文件大小，超出限制的文件不会开始下载
+            sizes = {}
+            if max_file_size or schedule == 'smallest_first':
+                probes = dict(zip(pending, run_concurrently(
+                    lambda _, index: self._probe_url(urls[index]), pending, concurrency, deadline=deadline)))
+                accepted = []
+                for index in pending:
+                    if probes[index] is NOT_ATTEMPTED or probes[index] is NOT_FINISHED:
+                        not_attempted.extend([index] + duplicates.get(index, []))
+                        continue
+                    file_size, error = probes[index]
+                    if error is None and max_file_size and file_size > max_file_size:
+                        error = ValueError(f"File size {file_size} bytes exceeds the limit of {max_file_size} bytes")
+                    if error is not None:
+                        for target in [index] + duplicates.get(index, []):
+                            yield self.create_text_message(f"Failed to download file from {urls[target]}: {str(error)}")
+                    else:
+                        accepted.append(index)
+                pending = accepted
+                # 已知文件大小时，按本次调用已完成下载的速度估算剩余时间是否足够
+                sizes = {index: probes[index][0] for index in pending}
+                if schedule == 'smallest_first':
+                    # 小文件优先下载，大文件不会阻塞其后的小文件，超时前能返回尽可能多的结果
+                    pending.sort(key=lambda index: probes[index][0])
             
-            for url in urls:
+            if output_mode in ARCHIVE_FORMATS:
+                # 归档模式下每个文件先流式写入临时文件，写入归档后立即删除，内存占用与文件数量和大小无关
+                archive = ArchiveWriter(output_mode)
+                streaming = True
+            
+            if use_async:
+                # 异步模式：所有下载在一个事件循环中进行，并发请求不占用额外线程
+                downloads = self._iter_async_downloads(urls, pending, image_process, async_concurrency,
+                                                       ordered=(output_order != 'completion'), deadline=deadline)
+            else:
+                downloads = iter_concurrently(
+                    lambda _, index: self._download_url(index, urls[index], streaming, use_cache, image_process,
+                                                        flight_keys[index], sizes.get(index)),
+                    pending, concurrency, ordered=(output_order != 'completion'), deadline=deadline)
+            
+            for position, outcome in downloads:
+                index = pending[position]
+                if outcome is NOT_ATTEMPTED:
+                    not_attempted.extend([index] + duplicates.get(index, []))
+                    continue
+                if outcome is NOT_FINISHED:
+                    outcome = (None, DeadlineExceeded("Download did not finish before the request deadline"))
+                result, error = outcome
                 try:
-                    result = self._get_file_by_url(url)
-                    downloaded_files.append(result)
-                    total_size += result['file_size']
-                    
-                    # 提取文件扩展名
-                    _, extension = os.path.splitext(result['filename'])
-                    if not extension:
-                        # 如果没有扩展名，根据content_type使用utils函数推断
-                        extension = get_extension_from_content_type(result['content_type'])
-                    
-                    # 构建文件元数据
-                    file_metadata = {
-                        'filename': result['filename'],
-                        'content_type': result['content_type'],
-                        'size': result['file_size'],
-                        'mime_type': result['content_type'],
-                        'extension': extension
-                    }
-                    
-                    # 如果是图片类型，添加特定标志
-                    if result['content_type'].startswith('image/'):
-                        file_metadata['is_image'] = True
-                        file_metadata['display_as_image'] = True
-                        file_metadata['type'] = 'image'
-                    
-                    # 返回文件内容
-                    yield self.create_blob_message(
-                        result['file_content'],
-                        file_metadata
-                    )
-                    
-                except Exception as e:
-                    # 单个文件下载失败时，记录错误但继续处理其他文件
-                    yield self.create_text_message(f"Failed to download file from {url}: {str(e)}")
+                    # 重复的URL紧跟在首次出现的URL之后输出相同的文件
+                    for target in [index] + duplicates.get(index, []):
+                        url = urls[target]
+                        try:
+                            if error is not None:
+                                raise error
+                            if archive is not None and target != index:
+                                # 归档中同一对象只存储一次，重复的URL单独计数，不计入下载文件数量和总大小
+                                duplicate_count += 1
+                                continue
+                            # 提取文件扩展名
+                            _, extension = os.path.splitext(result['filename'])
+                            if not extension:
+                                # 如果没有扩展名，根据content_type使用utils函数推断
+                                extension = get_extension_from_content_type(result['content_type'])
+                            
+                            # 构建文件元数据
+                            file_metadata = {
+                                'filename': result['filename'],
+                                'content_type': result['content_type'],
+                                'size': result['file_size'],
+                                'mime_type': result['content_type'],
+                                'extension': extension
+                            }
+                            
+                            # 如果是图片类型，添加特定标志
+                            if result['content_type'].startswith('image/'):
+                                file_metadata['is_image'] = True
+                                file_metadata['display_as_image'] = True
+                                file_metadata['type'] = 'image'
+                            
+                            if archive is not None:
+                                # 归档模式：同一对象只写入一次，重复的URL在前面已跳过
+                                result['spool'].seek(0)
+                                archive.add(result['filename'], result['spool'], result['file_size'],
+                                            result['content_type'])
+                            elif 'spool' in result:
+                                # 流式模式：从临时文件分块输出，重复的URL从头重新读取同一个临时文件
+                                result['spool'].seek(0)
+                                yield from create_blob_chunk_messages(
+                                    iter_stream_chunks(result['spool']),
+                                    result['file_size'],
+                                    file_metadata
+                                )
+                            else:
+                                # 返回文件内容
+                                yield self.create_blob_message(
+                                    result['file_content'],
+                                    file_metadata
+                                )
+                            
+                            # 写入归档或输出成功后才计入下载文件数量和总大小
+                            downloaded_files.append({
+                                'filename': result['filename'],
+                                'content_type': result['content_type'],
+                                'file_size': result['file_size']
+                            })
+                            total_size += result['file_size']
+                        except Exception as e:
+                            # 单个文件下载失败时，记录错误但继续处理其他文件
+                            yield self.create_text_message(f"Failed to download file from {url}: {str(e)}")
+                finally:
+                    # 输出完成后删除临时文件
+                    if result is not None and 'spool' in result:
+                        result['spool'].close()
+                    result = None
+            
+            # 归档模式：所有文件写入完成后，以一个分块blob输出归档文件
+            archive_summary = None
+            if archive is not None:
+                if archive.entry_count:
+                    archive_file, archive_size = archive.close()
+                    archive_name = f"oss_files_{datetime.now().strftime('%Y%m%d%H%M%S')}{archive.extension}"
+                    with archive_file:
+                        yield from create_blob_chunk_messages(
+                            iter_stream_chunks(archive_file),
+                            archive_size,
+                            archive.metadata(archive_name, archive_size)
+                        )
+                    archive_summary = f"Archive: {archive_name} ({archive.entry_count} files, {archive_size / (1024 * 1024):.2f} MB)"
+                else:
+                    archive.discard()
+                archive = None
             
             # 输出批量下载结果摘要
             total_size_mb = total_size / (1024 * 1024) if total_size > 0 else 0
             success_count = len(downloaded_files)
             summary_message = f"Batch download completed:\nSuccessfully downloaded: {success_count} files\nTotal size: {total_size_mb:.2f} MB"
+            if archive_summary:
+                summary_message += f"\n{archive_summary}"
+            if duplicate_count:
+                summary_message += f"\nDuplicate URLs: {duplicate_count} (same file, stored once in the archive)"
+            if use_cache:
+                summary_message += f"\n{format_cache_stats(get_download_cache().stats())}"
+            if not_attempted:
+                summary_message += f"\nNot attempted: {len(not_attempted)} files (request deadline reached)"
+                for target in sorted(not_attempted):
+                    summary_message += f"\n- {urls[target]}"
             yield self.create_text_message(summary_message)
             
         except Exception as e:
+            if archive is not None:
+                archive.discard()
             yield self.create_text_message(f"Batch download failed: {str(e)}")
     
+    def _download_url(self, index: int, url: str, spool: bool = False, use_cache: bool = False,
+                      image_process: Optional[str] = None, flight_key: Optional[tuple] = None,
+                      expected_size: Optional[int] = None) -> Any:
+        """在线程池中下载单个URL，返回(结果, 异常)以便按原有方式逐个输出错误信息，剩余时间不足时返回NOT_ATTEMPTED"""
+        deadline = current_deadline()
+        if deadline is not None and not deadline.can_finish(expected_size):
+            return NOT_ATTEMPTED
+        try:
+            download = lambda: self._get_file_by_url(url, spool=spool, use_cache=use_cache,
+                                                     image_process=image_process)
+            started = time.monotonic()
+            # 非流式模式的结果只包含不可变的文件内容，可以与其他并发调用中相同对象的下载共享
+            if flight_key is not None and not spool:
+                result = get_download_flight().do(flight_key, download)
+            else:
+                result = download()
+            if deadline is not None:
+                deadline.record_transfer(result['file_size'], time.monotonic() - started)
+            return result, None
+        except Exception as e:
+            return None, e
+    
+    def _iter_async_downloads(self, urls: list, pending: list, image_process: Optional[str], concurrency: int,
+                              ordered: bool, deadline: Optional[Deadline] = None) -> Generator[tuple, None, None]:
+        """通过异步传输核心并发下载，产出与_download_url相同格式的(位置, (结果, 异常))"""
+        client = AsyncOssClient(self.runtime.credentials.get('access_key_id'),
+                                self.runtime.credentials.get('access_key_secret'))
+        params = {'x-oss-process': image_process} if image_process else None
+        
+        # 事件循环开始前解析URL并选择域名，路由探测的阻塞连接不会占用事件循环
+        locations = {}
+        for index in pending:
+            try:
+                endpoint, bucket_name, object_key = self._resolve_location(urls[index])
+                endpoint = route_endpoint(endpoint, self.runtime.credentials.get('endpoint_routing'))
+                get_rate_limiter().configure(bucket_name, self.runtime.credentials)
+                locations[index] = (endpoint, bucket_name, object_key)
+            except Exception as e:
+                locations[index] = e
+        
+        async def download(_, index):
+            if deadline is not None and not deadline.can_finish():
+                return NOT_ATTEMPTED
+            try:
+                if isinstance(locations[index], Exception):
+                    raise locations[index]
+                endpoint, bucket_name, object_key = locations[index]
+                with deadline_scope(deadline):
+                    started = time.monotonic()
+                    # 截止时间到达时取消仍在进行的下载
+                    result = await asyncio.wait_for(async_call_with_retry(
+                        lambda: client.get_object_to_spool(endpoint, bucket_name, object_key, params=params),
+                        endpoint), timeout=deadline.remaining() if deadline is not None else None)
+                    if deadline is not None:
+                        deadline.record_transfer(result['file_size'], time.monotonic() - started)
+                # 图片转换格式后文件名和类型跟随目标格式
+                result['filename'], result['content_type'] = apply_image_process_result(
+                    os.path.basename(object_key), result['content_type'], image_process)
+                return result, None
+            except asyncio.TimeoutError:
+                return NOT_FINISHED
+            except Exception as e:
+                return None, ValueError(f"Failed to retrieve file: {str(e)}")
+        
+        return iter_async(download, pending, concurrency, ordered=ordered, close=client.aclose)
+    
+    def _flight_key(self, url: str, image_process: Optional[str]) -> Optional[tuple]:
+        """根据URL解析出的对象生成合并键，URL无法解析时返回None"""
+        try:
+            bucket, object_key = self._resolve_object(url)
+        except Exception:
+            return None
+        return object_flight_key(self.runtime.credentials.get('access_key_id'), bucket, object_key, image_process)
+    
+    def _probe_url(self, url: str) -> tuple:
+        """通过HEAD请求获取文件大小，返回(文件大小, 异常)"""
+        try:
+            bucket, object_key = self._resolve_object(url)
+            return call_with_retry(lambda: bucket.head_object(object_key), bucket.endpoint).content_length, None
+        except Exception as e:
+            return None, ValueError(f"Failed to retrieve file metadata: {str(e)}")
+    
     def _validate_credentials(self) -> None:
         # 验证必填字段是否存在
         required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
@@ -86,48 +334,55 @@ class GetFilesByUrlsTool(Tool):
             if not self.runtime.credentials.get(field):
                 raise ValueError(f"Missing required credential: {field}")
     
-    def _get_file_by_url(self, file_url: str) -> dict:
+    def _get_file_by_url(self, file_url: str, spool: bool = False, use_cache: bool = False,
+                         image_process: Optional[str] = None) -> dict:
         try:
-            if not file_url:
-                raise ValueError("File URL cannot be empty")
-            
-            # 获取认证参数
-            credentials = {
-                'endpoint': self.runtime.credentials.get('endpoint'),
-                'bucket': self.runtime.credentials.get('bucket'),
-                'access_key_id': self.runtime.credentials.get('access_key_id'),
-                'access_key_secret': self.runtime.credentials.get('access_key_secret')
-            }
+            # 解析URL并获取OSS客户端
+            bucket, object_key = self._resolve_object(file_url)
             
-            # 解析URL获取bucket、endpoint和object_key
-            bucket, endpoint, object_key = self._parse_oss_url(file_url)
+            # 获取文件名
+            filename = os.path.basename(object_key)
             
-            # 如果URL中的bucket与凭证中的bucket不一致，使用URL中的bucket
-            if bucket and bucket != credentials['bucket']:
-                bucket_name = bucket
-            else:
-                bucket_name = credentials['bucket']
+            # 使用本地缓存时通过条件请求校验ETag，对象未变化时直接使用缓存内容（处理后的图片不缓存）
+            if use_cache and not image_process:
+                cached = get_download_cache().fetch(bucket, object_key)
+                result = {
+                    'filename': filename,
+                    'content_type': cached['content_type'],
+                    'file_size': cached['file_size']
+                }
+                if spool:
+                    # 缓存文件本身即可作为临时文件分块输出
+                    result['spool'] = cached['file']
+                else:
+                    with cached['file'] as f:
+                        result['file_content'] = f.read()
+                return result
+            
+            # 获取文件，设置了图片处理参数时只传输OSS处理后的数据
+            result = call_with_retry(lambda: bucket.get_object(object_key, process=image_process),
+                                     bucket.endpoint)
             
-            # 创建OSS客户端，处理endpoint协议
-            endpoint_url = endpoint if endpoint else credentials['endpoint']
-            if not endpoint_url.startswith(('http://', 'https://')):
-                endpoint_url = f"http://{endpoint_url}"
-            auth = oss2.Auth(credentials['access_key_id'], credentials['access_key_secret'])
-            bucket = oss2.Bucket(auth, endpoint_url, bucket_name)
+            # 获取文件类型，图片转换格式后文件名和类型跟随目标格式
+            content_type = result.headers.get('Content-Type', 'application/octet-stream')
+            filename, content_type = apply_image_process_result(filename, content_type, image_process)
+            
+            # 流式模式将文件分块写入临时文件，避免在内存中保存完整内容
+            if spool:
+                spool_file, file_size = spool_stream(result)
+                return {
+                    'spool': spool_file,
+                    'filename': filename,
+                    'content_type': content_type,
+                    'file_size': file_size
+                }
             
             # 获取文件内容
-            result = bucket.get_object(object_key)
             file_content = result.read()
             
             # 获取文件大小
             file_size = len(file_content)
             
-            # 获取文件类型
-            content_type = result.headers.get('Content-Type', 'application/octet-stream')
-            
-            # 获取文件名
-            filename = os.path.basename(object_key)
-            
             # 返回结果字典
             return {
                 'file_content': file_content,
@@ -139,25 +394,22 @@ class GetFilesByUrlsTool(Tool):
             error_message = f"Failed to retrieve file: {str(e)}"
             raise ValueError(error_message)
     
-    def _parse_oss_url(self, url: str) -> tuple:
-        """
-        解析OSS URL，支持标准格式和自定义域名格式
-        标准格式: https://bucket.endpoint/object_key
-        自定义域名格式: https://custom-domain/object_key
-        """
-        parsed_url = urlparse(url)
+    def _resolve_object(self, file_url: str) -> tuple:
+        """解析文件URL，返回(OSS Bucket对象, 对象键)"""
+        endpoint_url, bucket_name, object_key = self._resolve_location(file_url)
         
-        # 处理URL编码
-        object_key = unquote(parsed_url.path.lstrip('/'))
+        # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+        bucket = get_bucket(self.runtime.credentials.get('access_key_id'),
+                            self.runtime.credentials.get('access_key_secret'),
+                            endpoint_url, bucket_name, routing=self.runtime.credentials.get('endpoint_routing'),
+                            limits=self.runtime.credentials)
         
-        # 如果是标准OSS URL格式 (bucket.endpoint)
-        if parsed_url.hostname and '.' in parsed_url.hostname:
-            parts = parsed_url.hostname.split('.', 1)
-            if len(parts) == 2:
-                bucket_name = parts[0]
-                endpoint = f"{parsed_url.scheme}://{parts[1]}"
-                return (bucket_name, endpoint, object_key)
+        return bucket, object_key
+    
+    def _resolve_location(self, file_url: str) -> tuple:
+        """解析文件URL，返回(带协议前缀的endpoint, bucket名称, 对象键)"""
+        if not file_url:
+            raise ValueError("File URL cannot be empty")
         
-        # 对于自定义域名格式，需要额外的endpoint或bucket验证
-        # 此处仅返回None作为bucket和endpoint，由调用方处理
-        return None, None, object_key
\ No newline at end of file
+        return resolve_oss_location(file_url, self.runtime.credentials.get('endpoint'),
+                                    self.runtime.credentials.get('bucket'))
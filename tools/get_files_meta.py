@@ -0,0 +1,146 @@
+from collections.abc import Generator
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import oss2
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .oss_client import get_bucket
+from .utils import resolve_oss_location
+from .concurrency import normalize_concurrency, run_concurrently
+from .retry import call_with_retry
+from .deadline import Deadline, deadline_scope
+
+
+class GetFilesMetaTool(Tool):
+    # 单次调用最多查询的文件数量
+    MAX_FILES = 1000
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        try:
+            # 从runtime credentials获取认证信息
+            credentials = {
+                'endpoint': self.runtime.credentials.get('endpoint'),
+                'bucket': self.runtime.credentials.get('bucket'),
+                'access_key_id': self.runtime.credentials.get('access_key_id'),
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
+            }
+
+            # 验证工具参数中的认证信息
+            self._validate_credentials(credentials)
+
+            # 获取文件URL或对象键（使用分号分隔）
+            targets = tool_parameters.get('targets') or ''
+            items = [item.strip() for item in targets.split(';') if item.strip()]
+            if not items:
+                raise ValueError("Missing required parameter: targets")
+            if len(items) > self.MAX_FILES:
+                raise ValueError(f"Too many files, at most {self.MAX_FILES} files are supported")
+
+            # 并发数及元数据级别（full：HEAD获取完整元数据；basic：GetObjectMeta只获取大小、ETag和修改时间）
+            concurrency = normalize_concurrency(tool_parameters.get('concurrency'))
+            basic = tool_parameters.get('metadata_level') == 'basic'
+
+            # 并发查询元数据，只传输响应头，不传输文件内容；单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                results = run_concurrently(
+                    lambda _, item: self._get_file_meta(item, credentials, basic), items, concurrency)
+
+            success_count = len([r for r in results if r['status'] == 'success'])
+            not_found_count = len([r for r in results if r['status'] == 'not_found'])
+            error_count = len(results) - success_count - not_found_count
+
+            yield self.create_json_message({
+                "status": "completed",
+                "success_count": success_count,
+                "not_found_count": not_found_count,
+                "error_count": error_count,
+                "files": results
+            })
+
+            # 构建文本响应
+            text_message = f"Metadata query completed\nFound: {success_count} files\nNot found: {not_found_count} files\nFailed: {error_count} files\n\n"
+            for result in results:
+                text_message += f"- {result['target']}\n"
+                if result['status'] == 'success':
+                    size_mb = round(result['size'] / (1024 * 1024), 2) if result['size'] else 0
+                    text_message += f"  File size: {size_mb} MB ({result['size']} bytes)\n"
+                    if 'content_type' in result:
+                        text_message += f"  File type: {result['content_type']}\n"
+                    text_message += f"  ETag: {result['etag']}\n"
+                    text_message += f"  Last modified: {result['last_modified']}\n"
+                elif result['status'] == 'not_found':
+                    text_message += "  Not found\n"
+                else:
+                    text_message += f"  Error: {result['error']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息
+            yield self.create_text_message(f"Failed to get file metadata: {str(e)}")
+            # 同时抛出异常，与上传工具的行为保持一致
+            raise ValueError(f"Failed to get file metadata: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _get_file_meta(self, target: str, credentials: dict[str, Any], basic: bool) -> Dict[str, Any]:
+        """在线程池中查询单个文件的元数据，失败时返回错误信息而不是抛出异常"""
+        result = {"target": target}
+        try:
+            bucket, object_key = self._resolve_object(target, credentials)
+            result.update({"bucket": bucket.bucket_name, "key": object_key})
+
+            if basic:
+                meta = call_with_retry(lambda: bucket.get_object_meta(object_key), bucket.endpoint)
+            else:
+                meta = call_with_retry(lambda: bucket.head_object(object_key), bucket.endpoint)
+
+            result.update({
+                "status": "success",
+                "size": meta.content_length,
+                "etag": meta.etag,
+                "last_modified": self._format_time(meta.last_modified)
+            })
+            if not basic:
+                # 完整元数据包含文件类型、存储类型和自定义元数据（x-oss-meta-*）
+                result.update({
+                    "content_type": meta.content_type,
+                    "storage_class": meta.headers.get('x-oss-storage-class'),
+                    "object_type": meta.object_type,
+                    "metadata": {
+                        name[len('x-oss-meta-'):]: value for name, value in meta.headers.items()
+                        if name.lower().startswith('x-oss-meta-')
+                    }
+                })
+        except oss2.exceptions.NotFound:
+            result.update({"status": "not_found"})
+        except Exception as e:
+            result.update({"status": "error", "error": str(e)})
+        return result
+
+    def _format_time(self, timestamp: Optional[int]) -> Optional[str]:
+        """将Unix时间戳格式化为UTC时间字符串"""
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def _resolve_object(self, target: str, credentials: dict[str, Any]) -> tuple:
+        """解析URL或对象键，返回(OSS Bucket对象, 对象键)"""
+        endpoint_url, bucket_name, object_key = resolve_oss_location(target, credentials['endpoint'],
+                                                                     credentials['bucket'])
+        if not object_key:
+            raise ValueError("No object key found")
+
+        # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+        bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                            endpoint_url, bucket_name, routing=credentials['endpoint_routing'],
+                            limits=self.runtime.credentials)
+
+        return bucket, object_key
@@ -1,12 +1,15 @@
 import os
 import re
 from urllib.parse import urlparse, unquote
-from typing import Any, Dict, Optional, Generator
+from typing import Any, Dict, Generator
 from dify_plugin.entities.tool import ToolInvokeMessage
 import requests
 
-from dify_plugin.interfaces.tool import Tool, ToolProvider
+from dify_plugin.interfaces.tool import Tool
 from .utils import get_extension_from_content_type
+from .multipart import mb_to_bytes
+from .http_client import DEFAULT_MAX_DOWNLOAD_BYTES, download
+from .deadline import Deadline, deadline_scope
 
 
 class GetPublicFileByUrlTool(Tool):
@@ -18,8 +21,13 @@ class GetPublicFileByUrlTool(Tool):
             if not file_url:
                 raise ValueError("Missing required parameter: file_url")
             
-            # 下载公开文件
-            result = self._get_public_file_by_url(file_url)
+            # 允许下载的最大文件大小（MB）及是否并发下载字节区间
+            max_bytes = mb_to_bytes(tool_parameters.get('max_file_size'), DEFAULT_MAX_DOWNLOAD_BYTES)
+            parallel_ranges = bool(tool_parameters.get('parallel_ranges'))
+            
+            # 下载公开文件，单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                result = self._get_public_file_by_url(file_url, max_bytes=max_bytes, parallel_ranges=parallel_ranges)
             
             # 提取文件扩展名
             _, extension = os.path.splitext(result['filename'])
@@ -56,7 +64,8 @@ class GetPublicFileByUrlTool(Tool):
             # 失败时在text中输出错误信息
             yield self.create_text_message(f"Failed to download public file: {str(e)}")
     
-    def _get_public_file_by_url(self, file_url: str) -> dict:
+    def _get_public_file_by_url(self, file_url: str, max_bytes: int = DEFAULT_MAX_DOWNLOAD_BYTES,
+                                parallel_ranges: bool = False) -> dict:
         try:
             if not file_url:
                 raise ValueError("File URL cannot be empty")
@@ -71,18 +80,18 @@ class GetPublicFileByUrlTool(Tool):
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            # 发送HTTP请求获取文件
-            response = requests.get(file_url, headers=headers, timeout=30)
-            response.raise_for_status()  # 检查HTTP错误
+            # 通过共享连接池流式下载文件，超过大小限制时立即中止
+            response = download(file_url, headers=headers, max_bytes=max_bytes, parallel_ranges=parallel_ranges)
+            response_headers = response['headers']
             
             # 获取文件内容
-            file_content = response.content
+            file_content = response['content']
             
             # 获取文件大小
             file_size = len(file_content)
             
             # 获取文件类型，优先从Content-Type头获取
-            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            content_type = response_headers.get('Content-Type', 'application/octet-stream')
             
             # 如果Content-Type包含字符集信息，只保留MIME类型
             if ';' in content_type:
@@ -93,7 +102,7 @@ class GetPublicFileByUrlTool(Tool):
             
             # 如果URL中没有文件名，尝试从Content-Disposition头获取
             if not filename:
-                content_disposition = response.headers.get('Content-Disposition', '')
+                content_disposition = response_headers.get('Content-Disposition', '')
                 if 'filename=' in content_disposition:
                     filename_match = re.search(r'filename[*]?=["\']?([^"\';\s]+)', content_disposition)
                     if filename_match:
@@ -0,0 +1,188 @@
+import io
+import re
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .concurrency import run_concurrently
+from .retry import call_with_retry
+from .deadline import call_timeout
+
+# 连接池中缓存的主机数量及每个主机保持的最大连接数
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+# 连接超时与两次读取之间的最大间隔（秒）
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+# 流式读取响应时每次读取的字节数
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 默认允许下载的最大文件大小（字节），防止超大文件耗尽插件内存
+DEFAULT_MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+# 并发Range下载时每个字节区间的大小及并发连接数
+RANGE_PART_SIZE = 8 * 1024 * 1024
+RANGE_CONCURRENCY = 4
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    获取进程内共享的HTTP会话，所有请求复用同一个连接池并保持长连接
+
+    Returns:
+        requests.Session对象
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # 连接池层不重试，所有重试由call_with_retry统一处理，避免两层重试叠加
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                                  max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def download(url: str, headers: Optional[Dict[str, str]] = None,
+             max_bytes: int = DEFAULT_MAX_DOWNLOAD_BYTES, parallel_ranges: bool = False) -> Dict[str, Any]:
+    """
+    流式下载URL内容，超过大小限制时立即中止
+
+    先根据Content-Length判断，再在读取过程中累计字节数，超出限制时不会继续读取。
+    服务端支持Range请求且文件较大时，可以拆分为多个字节区间并发下载。
+
+    Args:
+        url: 文件URL
+        headers: 请求头
+        max_bytes: 允许下载的最大字节数
+        parallel_ranges: 是否在服务端支持时并发下载字节区间
+
+    Returns:
+        包含content（文件内容）、headers（响应头）和ranged（是否使用了并发Range下载）的字典
+    """
+    # GET请求可以安全重试，连接错误、超时和5xx、429响应时重新下载，同一主机连续失败时熔断
+    return call_with_retry(lambda: _download(url, headers, max_bytes, parallel_ranges), url)
+
+
+def _download(url: str, headers: Optional[Dict[str, str]], max_bytes: int, parallel_ranges: bool) -> Dict[str, Any]:
+    """执行一次下载"""
+    session = get_session()
+    # 在截止时间范围内调用时，超时时间不超过剩余时间
+    timeout = (call_timeout(CONNECT_TIMEOUT), call_timeout(READ_TIMEOUT))
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+
+        content_length = _get_content_length(response)
+        if content_length is not None and content_length > max_bytes:
+            raise ValueError(f"File size {content_length} bytes exceeds the limit of {max_bytes} bytes")
+
+        # 服务端声明支持Range且文件大于一个区间时，改为并发下载，当前响应暂不读取
+        if parallel_ranges and content_length is not None and content_length > RANGE_PART_SIZE \
+                and response.headers.get('Accept-Ranges', '').lower() == 'bytes' \
+                and 'Content-Encoding' not in response.headers:
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            try:
+                content = _download_ranges(session, url, headers, content_length, validator)
+                return {'content': content, 'headers': response.headers, 'ranged': True}
+            except _RangeNotHonored:
+                # 服务端忽略了Range（或If-Range校验失败）返回完整文件，改为读取当前的完整响应
+                pass
+
+        buffer = _new_buffer(content_length)
+        received = 0
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ValueError(f"File size exceeds the limit of {max_bytes} bytes")
+            buffer.write(chunk)
+        return {'content': _buffer_content(buffer, received), 'headers': response.headers, 'ranged': False}
+
+
+class _RangeNotHonored(ValueError):
+    """区间请求返回了200和完整文件"""
+
+
+def _new_buffer(size: Optional[int]) -> io.BytesIO:
+    """
+    创建下载缓冲区，已知大小时预先分配
+
+    内容写入BytesIO后通过getvalue()取出：缓冲区没有被共享时getvalue()直接返回内部的bytes对象，
+    不会像拼接数据块或bytes(bytearray)那样再产生一份完整拷贝，峰值内存约等于文件大小。
+    """
+    buffer = io.BytesIO()
+    if size:
+        buffer.seek(size - 1)
+        buffer.write(b'\0')
+        buffer.seek(0)
+    return buffer
+
+
+def _buffer_content(buffer: io.BytesIO, size: int) -> bytes:
+    """取出缓冲区中的前size字节"""
+    # 实际收到的数据少于预先分配的大小时截断，截断后getvalue()仍然不复制数据
+    buffer.truncate(size)
+    content = buffer.getvalue()
+    buffer.close()
+    return content
+
+
+def _get_content_length(response: requests.Response) -> Optional[int]:
+    """读取Content-Length，压缩传输时解压后的大小未知，返回None"""
+    if 'Content-Encoding' in response.headers:
+        return None
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def _download_ranges(session: requests.Session, url: str, headers: Optional[Dict[str, str]],
+                     size: int, validator: Optional[str]) -> bytes:
+    """
+    按字节区间并发下载，写入预先分配的缓冲区
+
+    Raises:
+        _RangeNotHonored: 服务端忽略了Range请求头（或If-Range校验失败）返回200
+    """
+    buffer = _new_buffer(size)
+    buffer_lock = threading.Lock()
+    ranges = [(start, min(start + RANGE_PART_SIZE, size) - 1) for start in range(0, size, RANGE_PART_SIZE)]
+
+    def fetch(_: int, byte_range: tuple) -> None:
+        start, end = byte_range
+        range_headers = dict(headers or {}, Range=f"bytes={start}-{end}")
+        # If-Range保证文件在下载期间发生变化时不会拼接出不同版本的内容
+        if validator:
+            range_headers['If-Range'] = validator
+        timeout = (call_timeout(CONNECT_TIMEOUT), call_timeout(READ_TIMEOUT))
+        with session.get(url, headers=range_headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code == 200:
+                raise _RangeNotHonored("Server ignored the range request")
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code != 206 or not re.match(rf"bytes {start}-{end}/", content_range):
+                raise ValueError("Server did not honor the range request, the file may have changed during download")
+            offset = start
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                if offset + len(chunk) > end + 1:
+                    raise ValueError("Server returned more data than requested")
+                with buffer_lock:
+                    buffer.seek(offset)
+                    buffer.write(chunk)
+                offset += len(chunk)
+            if offset != end + 1:
+                raise ValueError(f"Incomplete range {start}-{end}: received {offset - start} bytes")
+
+    try:
+        run_concurrently(fetch, ranges, RANGE_CONCURRENCY)
+    except Exception:
+        # 异常的traceback会引用缓冲区，立即释放，避免回退到完整下载时同时占用两份内存
+        buffer.close()
+        raise
+    return _buffer_content(buffer, size)
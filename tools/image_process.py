@@ -0,0 +1,74 @@
+import os
+import re
+from typing import Any, Optional, Tuple
+
+# 图片处理参数允许的字符：操作名、参数及分隔符
+IMAGE_PROCESS_PATTERN = re.compile(r'^image(/[a-z\-]+(,[A-Za-z0-9_\-.]+)*)+$')
+
+# 转换格式后的文件类型
+IMAGE_FORMAT_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'bmp': 'image/bmp',
+    'gif': 'image/gif',
+    'tiff': 'image/tiff',
+    'heic': 'image/heic',
+    'avif': 'image/avif',
+}
+
+
+def normalize_image_process(value: Any) -> Optional[str]:
+    """
+    规范化图片处理参数，用作OSS的x-oss-process
+
+    Args:
+        value: 例如"resize,w_512/format,webp/quality,q_80"，可以带"image/"前缀
+
+    Returns:
+        以"image/"开头的处理参数，参数为空时返回None
+    """
+    if value in (None, ''):
+        return None
+
+    process = str(value).strip().strip('/')
+    if not process.startswith('image/'):
+        process = f"image/{process}"
+    if not IMAGE_PROCESS_PATTERN.match(process):
+        raise ValueError(f"Invalid image_process: {value}. Expected format like resize,w_512/format,webp/quality,q_80")
+    return process
+
+
+def get_target_format(process: Optional[str]) -> Optional[str]:
+    """从处理参数中获取format操作指定的目标格式，未转换格式时返回None"""
+    if not process:
+        return None
+    target = None
+    for action in process.split('/')[1:]:
+        name, _, args = action.partition(',')
+        if name == 'format' and args:
+            target = args.split(',')[0].lower()
+    return target
+
+
+def apply_image_process_result(filename: str, content_type: str, process: Optional[str]) -> Tuple[str, str]:
+    """
+    根据图片处理的目标格式调整文件名扩展名和文件类型
+
+    Args:
+        filename: 原始文件名
+        content_type: 响应中的文件类型
+        process: 规范化后的处理参数
+
+    Returns:
+        (文件名, 文件类型)
+    """
+    target = get_target_format(process)
+    if not target:
+        return filename, content_type
+
+    content_type = IMAGE_FORMAT_CONTENT_TYPES.get(target, content_type)
+    name, _ = os.path.splitext(filename)
+    extension = 'jpg' if target == 'jpeg' else target
+    return f"{name}.{extension}", content_type
@@ -0,0 +1,169 @@
+import os
+from collections.abc import Generator
+from typing import Any, Dict, List
+
+import oss2
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .oss_client import get_bucket
+from .utils import split_endpoint
+from .object_index import LIST_PAGE_SIZE, get_object_index, iter_listing_pages
+from .deadline import Deadline, deadline_scope
+
+
+class ListFilesTool(Tool):
+    # 默认及允许的最大返回条目数量
+    DEFAULT_MAX_RESULTS = 1000
+    MAX_RESULTS = 100000
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        try:
+            # 从runtime credentials获取认证信息
+            credentials = {
+                'endpoint': self.runtime.credentials.get('endpoint'),
+                'bucket': self.runtime.credentials.get('bucket'),
+                'access_key_id': self.runtime.credentials.get('access_key_id'),
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
+            }
+
+            # 验证工具参数中的认证信息
+            self._validate_credentials(credentials)
+
+            # 获取列举参数
+            prefix = (tool_parameters.get('prefix') or '').strip()
+            delimiter = tool_parameters.get('delimiter') or ''
+            start_after = (tool_parameters.get('start_after') or '').strip()
+            filename = (tool_parameters.get('filename') or '').strip()
+            max_results = self._normalize_max_results(tool_parameters.get('max_results'))
+            use_cache = bool(tool_parameters.get('use_cache'))
+
+            # 验证prefix规则：禁止以/或\开头
+            if prefix.startswith('/') or prefix.startswith('\\'):
+                raise ValueError("Prefix cannot start with / or \\ ")
+
+            # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                credentials['endpoint'], credentials['bucket'],
+                                routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
+
+            # 单次请求的超时时间不超过本次调用的剩余时间；列举请求在获取每一页时发送，
+            # 只在获取页面期间进入截止时间范围，输出消息时不占用调用方的上下文
+            deadline = Deadline()
+            with deadline_scope(deadline):
+                source, pages = self._open_listing(bucket, prefix, delimiter, start_after, filename,
+                                                   max_results, use_cache)
+
+            # 每获取一页结果立即输出，不等待全部列举完成
+            file_count = 0
+            directory_count = 0
+            page_number = 0
+            last_key = None
+            while True:
+                with deadline_scope(deadline):
+                    page = next(pages, None)
+                if page is None:
+                    break
+                page = page[:max_results - file_count - directory_count]
+                if not page:
+                    # 按文件名查找时当前页可能没有匹配的文件，继续列举下一页
+                    continue
+                page_number += 1
+                files = []
+                for entry in page:
+                    entry = dict(entry)
+                    if entry['type'] == 'file':
+                        file_count += 1
+                        entry['file_url'] = self._build_file_url(credentials, entry['key'])
+                    else:
+                        directory_count += 1
+                    files.append(entry)
+                last_key = page[-1]['key']
+                yield self.create_json_message({
+                    "status": "listing",
+                    "page": page_number,
+                    "files": files
+                })
+                if file_count + directory_count >= max_results:
+                    break
+
+            if page_number == 0:
+                yield self.create_json_message({"status": "listing", "page": 1, "files": []})
+
+            # 构建文本响应
+            text_message = "Listing completed\n"
+            text_message += f"Bucket: {credentials['bucket']}\n"
+            text_message += f"Prefix: {prefix or '(none)'}\n"
+            text_message += f"Files: {file_count}\n"
+            text_message += f"Directories: {directory_count}\n"
+            text_message += f"Source: {source}\n"
+            if file_count + directory_count >= max_results and last_key:
+                text_message += f"Reached max results, more files may be available with start_after: {last_key}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息
+            yield self.create_text_message(f"Failed to list files: {str(e)}")
+            # 同时抛出异常，与上传工具的行为保持一致
+            raise ValueError(f"Failed to list files: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _normalize_max_results(self, value: Any) -> int:
+        """规范化最大返回条目数量"""
+        try:
+            max_results = int(value) if value not in (None, '') else self.DEFAULT_MAX_RESULTS
+        except (TypeError, ValueError):
+            max_results = self.DEFAULT_MAX_RESULTS
+        return max(1, min(max_results, self.MAX_RESULTS))
+
+    def _open_listing(self, bucket: oss2.Bucket, prefix: str, delimiter: str, start_after: str,
+                      filename: str, max_results: int, use_cache: bool) -> tuple:
+        """
+        选择列举方式
+
+        Returns:
+            (结果来源描述, 条目列表的生成器)
+        """
+        if use_cache:
+            # 使用索引缓存：命中时不请求OSS，未命中时完整列举一次并缓存
+            listing = get_object_index().get(bucket, prefix, delimiter)
+            if listing is not None:
+                if filename:
+                    entries = listing['names'].get(filename, [])
+                else:
+                    entries = listing['entries']
+                if start_after:
+                    entries = [entry for entry in entries if entry['key'] > start_after]
+                source = "index cache (hit)" if listing['cached'] else "OSS (index cache refreshed)"
+                return source, self._paginate(entries)
+
+        if filename:
+            # 按文件名查找时需要检查前缀下的全部对象，返回数量限制作用于匹配结果
+            pages = (self._match_filename(page, filename)
+                     for page in iter_listing_pages(bucket, prefix=prefix, delimiter=delimiter,
+                                                    start_after=start_after))
+        else:
+            pages = iter_listing_pages(bucket, prefix=prefix, delimiter=delimiter,
+                                       start_after=start_after, limit=max_results)
+        return "OSS", pages
+
+    def _match_filename(self, page: List[Dict[str, Any]], filename: str) -> List[Dict[str, Any]]:
+        """筛选文件名与指定名称相同的文件"""
+        return [entry for entry in page if entry['type'] == 'file' and os.path.basename(entry['key']) == filename]
+
+    def _paginate(self, entries: List[Dict[str, Any]]) -> Generator[List[Dict[str, Any]], None, None]:
+        """将缓存中的条目按列举请求相同的页大小输出"""
+        for start in range(0, len(entries), LIST_PAGE_SIZE):
+            yield entries[start:start + LIST_PAGE_SIZE]
+
+    def _build_file_url(self, credentials: dict[str, Any], object_key: str) -> str:
+        """构建文件URL，与上传工具返回的URL格式一致"""
+        protocol, host = split_endpoint(credentials['endpoint'], credentials.get('use_https', True))
+        return f"{protocol}://{credentials['bucket']}.{host}/{object_key}"
@@ -2,37 +2,49 @@ import time
 import os
 from datetime import datetime
 from collections.abc import Generator
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import oss2
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from dify_plugin.file.file import File
-from .utils import get_file_type, get_file_extension
+from .utils import generate_object_key, get_file_type, get_file_extension, split_endpoint
+from .file_source import materialize_file, open_file_stream
+from .dedup import upload_if_absent
+from .oss_client import get_bucket
+from .object_index import get_object_index
+from .download_cache import get_download_cache
+from .multipart import DEFAULT_MULTIPART_THRESHOLD, DEFAULT_PART_SIZE, mb_to_bytes, upload_object, upload_stream
+from .concurrency import normalize_concurrency, run_concurrently
+from .deadline import NOT_ATTEMPTED, NOT_FINISHED, Deadline, current_deadline
 
 class MultiUploadFilesTool(Tool):
-    # 最大支持的文件数量
-    MAX_FILES = 10
+    # 最大支持的文件数量（并发上传后单次调用可处理更大的批次）
+    MAX_FILES = 50
     
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
+        # 本次调用的截止时间，到期前返回已完成的结果，未开始的文件列入未执行列表
+        deadline = Deadline()
         try:
             # 从runtime credentials获取认证信息
             credentials = {
                 'endpoint': self.runtime.credentials.get('endpoint'),
                 'bucket': self.runtime.credentials.get('bucket'),
                 'access_key_id': self.runtime.credentials.get('access_key_id'),
-                'access_key_secret': self.runtime.credentials.get('access_key_secret')
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
             }
             
             # 验证工具参数中的认证信息
             self._validate_credentials(credentials)
             
             # 执行多文件上传操作
-            results = self._upload_files(tool_parameters, credentials)
+            results = self._upload_files(tool_parameters, credentials, deadline)
             
-            # 统计成功和失败的文件数量
+            # 统计成功、失败和因截止时间未执行的文件数量
             success_count = len([r for r in results if r.get("status") == "success"])
             error_count = len([r for r in results if r.get("status") == "error"])
+            not_attempted_count = len([r for r in results if r.get("status") == "not_attempted"])
+            in_progress_count = len([r for r in results if r.get("status") == "in_progress"])
             
             # 构建文件详细信息列表
             files_info = []
@@ -51,6 +63,13 @@ class MultiUploadFilesTool(Tool):
                         "file_size_mb": file_size_mb,
                         "status": "success"
                     })
+                    if tool_parameters.get('dedup'):
+                        files_info[-1]["deduplicated"] = result.get("deduplicated", False)
+                elif result.get("status") in ("not_attempted", "in_progress"):
+                    files_info.append({
+                        "filename": result.get("filename", ""),
+                        "status": result["status"]
+                    })
                 else:
                     files_info.append({
                         "filename": result.get("filename", ""),
@@ -60,16 +79,23 @@ class MultiUploadFilesTool(Tool):
             
             # 构建JSON响应
             json_response = {
-                "status": "completed",
+                "status": "partial" if not_attempted_count > 0 or in_progress_count > 0 else "completed",
                 "success_count": success_count,
                 "error_count": error_count,
+                "not_attempted_count": not_attempted_count,
+                "in_progress_count": in_progress_count,
                 "files": files_info
             }
             
             yield self.create_json_message(json_response)
             
             # 构建文本响应
-            text_message = f"Batch upload completed\nSuccess: {success_count} files\nFailed: {error_count} files\n\n"
+            text_message = f"Batch upload completed\nSuccess: {success_count} files\nFailed: {error_count} files\n"
+            if not_attempted_count > 0:
+                text_message += f"Not attempted: {not_attempted_count} files (request deadline reached)\n"
+            if in_progress_count > 0:
+                text_message += f"Still in progress: {in_progress_count} files (outcome unknown)\n"
+            text_message += "\n"
             
             if success_count > 0:
                 text_message += "Successful files:\n"
@@ -87,6 +113,18 @@ class MultiUploadFilesTool(Tool):
                         text_message += f"- File name: {file_info['filename']}\n"
                         text_message += f"  Error: {file_info['error']}\n"
             
+            if not_attempted_count > 0:
+                text_message += "\nNot attempted files:\n"
+                for file_info in files_info:
+                    if file_info["status"] == "not_attempted":
+                        text_message += f"- File name: {file_info['filename']}\n"
+            
+            if in_progress_count > 0:
+                text_message += "\nStill in progress when the request deadline was reached (outcome unknown):\n"
+                for file_info in files_info:
+                    if file_info["status"] == "in_progress":
+                        text_message += f"- File name: {file_info['filename']}\n"
+            
             yield self.create_text_message(text_message)
         except Exception as e:
             # 在text中输出失败信息
@@ -101,7 +139,8 @@ class MultiUploadFilesTool(Tool):
             if field not in credentials or not credentials[field]:
                 raise ValueError(f"Missing required credential: {field}")
     
-    def _upload_files(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> List[Dict]:
+    def _upload_files(self, parameters: dict[str, Any], credentials: dict[str, Any],
+                      deadline: Optional[Deadline] = None) -> List[Dict]:
         try:
             # 获取文件数组、目录和其他参数
             files = parameters.get('files', [])
@@ -110,6 +149,15 @@ class MultiUploadFilesTool(Tool):
             filename_mode = parameters.get('filename_mode', 'filename')
             signed = parameters.get('signed',False)
             signed_expired = parameters.get('sign_expired',3600)
+            # 并发上传的线程数
+            concurrency = normalize_concurrency(parameters.get('concurrency'))
+            # 分片上传阈值和分片大小（参数单位为MB）
+            multipart_threshold = mb_to_bytes(parameters.get('multipart_threshold'), DEFAULT_MULTIPART_THRESHOLD)
+            part_size = mb_to_bytes(parameters.get('part_size'), DEFAULT_PART_SIZE)
+            # 上传模式：buffered（缓冲后上传）或streaming（流式上传）
+            upload_mode = parameters.get('upload_mode') or 'buffered'
+            # 是否启用基于内容哈希的去重上传
+            dedup = bool(parameters.get('dedup', False))
 
             # 验证必填参数
             if not files:
@@ -134,171 +182,195 @@ class MultiUploadFilesTool(Tool):
                 if field not in credentials or not credentials[field]:
                     raise ValueError(f"Missing required authentication parameter: {field}")
             
-            # 创建OSS客户端
-            auth = oss2.Auth(credentials['access_key_id'], credentials['access_key_secret'])
-            bucket = oss2.Bucket(auth, credentials['endpoint'], credentials['bucket'])
+            # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                credentials['endpoint'], credentials['bucket'],
+                                routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
             
-            # 上传每个文件
-            results = []
-            for i, file in enumerate(files):
-                try:
-                    # 获取文件大小（字节）
-                    file_size_bytes = 0
-                    
-                    # 尝试获取文件大小
-                    if isinstance(file, File) and hasattr(file, 'blob'):
-                        file_size_bytes = len(file.blob)
-                    elif hasattr(file, 'read'):
-                        # 保存当前文件指针位置
-                        if hasattr(file, 'tell'):
-                            current_pos = file.tell()
-                        else:
-                            current_pos = None
-                        
-                        # 读取文件内容获取大小
-                        content = file.read()
-                        file_size_bytes = len(content)
-                        
-                        # 重置文件指针
-                        if hasattr(file, 'seek') and current_pos is not None:
-                            file.seek(current_pos)
-                    elif isinstance(file, (str, bytes, os.PathLike)) and os.path.exists(file):
-                        file_size_bytes = os.path.getsize(file)
-                    
-                    # 获取文件类型
-                    file_type = get_file_type(file)
-                    
-                    # 生成文件名
-                    source_file_name = "unknown"
-                    
-                    # 使用上传文件的原始文件名
-                    # 如果有多个文件，添加索引以避免文件名冲突
-                    base_name = "upload"
-                    if len(files) > 1:
-                        base_name = f"{base_name}_{i+1}"
-                    
-                    extension = ".dat"  # 默认扩展名
-                    
-                    # 尝试从文件对象获取原始文件名和扩展名 - 加强版
-                    # 1. 处理dify_plugin的File对象
-                    if hasattr(file, 'name') and file.name:
-                        original_filename = file.name
-                        source_file_name = original_filename
-                        file_base_name, file_extension = os.path.splitext(original_filename)
-                        if file_extension:
-                            extension = file_extension
-                            base_name = file_base_name
-                    
-                    # 2. 尝试从file.filename获取（常见于某些Web框架）
-                    elif hasattr(file, 'filename') and file.filename:
-                        original_filename = file.filename
-                        source_file_name = original_filename
-                        file_base_name, file_extension = os.path.splitext(original_filename)
-                        if file_extension:
-                            extension = file_extension
-                            base_name = file_base_name
-                    
-                    # 3. 尝试从文件内容类型推断扩展名
-                    if hasattr(file, 'content_type') and file.content_type:
-                        extension = get_file_extension(file)
-                    
-                    # 4. 额外的检查：确保扩展名是小写的，并且包含点号
-                    if extension and not extension.startswith('.'):
-                        extension = '.' + extension
-                    extension = extension.lower()
-                    
-                    # 根据filename_mode处理文件名
-                    if filename_mode == 'filename_timestamp':
-                        # 使用年月日时分秒毫秒格式的时间戳
-                        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]  # 去掉最后三位得到毫秒
-                        current_filename = f"{base_name}_{timestamp}{extension}"
-                    else:
-                        # 使用原始文件名作为默认文件名
-                        current_filename = f"{base_name}{extension}"
-                    
-                    # 根据目录模式生成完整的文件路径
-                    object_key = self._generate_object_key(directory, directory_mode, current_filename)
-                    
-                    # 上传文件 - 统一处理文件对象或文件路径
-                    try:
-                        # 处理dify_plugin的File对象
-                        if isinstance(file, File):
-                            # 获取文件内容
-                            file_content = file.blob
-                            # 上传文件内容
-                            bucket.put_object(object_key, file_content)
-                        # 尝试作为普通文件对象处理
-                        elif hasattr(file, 'read'):
-                            # 重置文件指针到开头
-                            if hasattr(file, 'seek'):
-                                file.seek(0)
-                            # 读取文件内容
-                            file_content = file.read()
-                            # 上传文件内容
-                            bucket.put_object(object_key, file_content)
-                        else:
-                            # 尝试作为文件路径处理
-                            if isinstance(file, (str, bytes, os.PathLike)):
-                                bucket.put_object_from_file(object_key, file)
-                            else:
-                                # 如果是File对象但没有read方法，尝试获取其内容
-                                raise ValueError(f"Unsupported file type: {type(file)}. Expected file-like object or path.")
-                    except Exception as e:
-                        raise ValueError(f"Failed to upload file {i+1}: {str(e)}")
-                    
-                    # 构建文件URL
-                    if not signed:
-                        protocol = 'https' if credentials.get('use_https', True) else 'http'
-                        file_url = f"{protocol}://{credentials['bucket']}.{credentials['endpoint']}/{object_key}"
-                    else:
-                        file_url = bucket.sign_url("GET", object_key, expires=signed_expired)
-                        if credentials.get('use_https', True):
-                            file_url = file_url.replace("http", "https")
-                    
-                    results.append({
-                        "status": "success",
-                        "file_url": file_url,
-                        "filename": current_filename,
-                        "object_key": object_key,
-                        "file_type": file_type,
-                        "file_size_bytes": file_size_bytes,
-                        "message": "File uploaded successfully",
-                        "SourceFileName": source_file_name
-                    })
-                except Exception as e:
-                    # 如果单个文件上传失败，记录错误并继续上传其他文件
-                    results.append({
-                        "status": "error",
-                        "error": str(e),
-                        "file_index": i,
-                        "filename": f"file_{i+1}"
-                    })
+            # 上传选项，供每个并发任务共享
+            upload_options = {
+                'directory': directory,
+                'directory_mode': directory_mode,
+                'filename_mode': filename_mode,
+                'signed': signed,
+                'signed_expired': signed_expired,
+                'multipart_threshold': multipart_threshold,
+                'part_size': part_size,
+                'upload_mode': upload_mode,
+                'dedup': dedup,
+                'total_files': len(files)
+            }
             
+            # 使用有界线程池并发上传，结果按输入顺序返回；截止时间前来不及开始或完成的文件不再等待
+            results = run_concurrently(
+                lambda i, file: self._upload_single_file(i, file, bucket, credentials, upload_options),
+                files,
+                concurrency,
+                deadline=deadline
+            )
+            for i, result in enumerate(results):
+                if result is NOT_ATTEMPTED:
+                    results[i] = self._deadline_result(i, files[i], "not_attempted")
+                elif result is NOT_FINISHED:
+                    # 上传仍在后台进行，对象最终可能写入成功，因此不计为失败
+                    results[i] = self._deadline_result(i, files[i], "in_progress")
             return results
         except Exception as e:
             raise ValueError(f"Failed to upload files: {str(e)}")
     
-    def _generate_object_key(self, directory: str, directory_mode: str, filename: str) -> str:
-        """根据目录模式生成完整的对象键"""
-        # 确保目录名不以斜杠开头或结尾
-        directory = directory.strip('/')
-        
-        # 基础路径就是一级目录
-        base_path = directory
-        
-        # 根据目录模式添加日期相关的子目录
-        if directory_mode == 'yyyy_mm_dd_hierarchy':
-            # 年月日层级子目录模式 (一级目录/2025/09/10/目标文件)
-            now = datetime.now()
-            base_path = os.path.join(directory, str(now.year), f"{now.month:02d}", f"{now.day:02d}")
-        elif directory_mode == 'yyyy_mm_dd_combined':
-            # 年月日一体子目录模式 (一级目录/20250910/目标文件)
-            now = datetime.now()
-            base_path = os.path.join(directory, now.strftime('%Y%m%d'))
-        # 如果是no_subdirectory模式，则不添加额外的子目录
-        
-        # 组合完整的对象键
-        object_key = os.path.join(base_path, filename)
-        
-        # 将操作系统路径分隔符替换为OSS使用的斜杠
-        return object_key.replace('\\', '/')
\ No newline at end of file
+    def _deadline_result(self, i: int, file: Any, status: str) -> Dict:
+        """
+        截止时间到达时没有结果的文件
+
+        Args:
+            i: 文件索引
+            file: 文件对象
+            status: not_attempted（没有开始上传）或in_progress（仍在上传，结果未知）
+        """
+        return {
+            "status": status,
+            "file_index": i,
+            "filename": getattr(file, 'filename', None) or getattr(file, 'name', None) or f"file_{i+1}"
+        }
+    
+    def _upload_single_file(self, i: int, file: Any, bucket: oss2.Bucket, credentials: dict[str, Any],
+                            upload_options: dict[str, Any]) -> Dict:
+        """上传单个文件，失败时返回错误结果而不是抛出异常"""
+        directory = upload_options['directory']
+        directory_mode = upload_options['directory_mode']
+        filename_mode = upload_options['filename_mode']
+        signed = upload_options['signed']
+        signed_expired = upload_options['signed_expired']
+        multipart_threshold = upload_options['multipart_threshold']
+        part_size = upload_options['part_size']
+        upload_mode = upload_options['upload_mode']
+        dedup = upload_options['dedup']
+        files_count = upload_options['total_files']
+        try:
+            # 获取文件类型
+            file_type = get_file_type(file)
+            
+            # 生成文件名
+            source_file_name = "unknown"
+            
+            # 使用上传文件的原始文件名
+            # 如果有多个文件，添加索引以避免文件名冲突
+            base_name = "upload"
+            if files_count > 1:
+                base_name = f"{base_name}_{i+1}"
+            
+            extension = ".dat"  # 默认扩展名
+            
+            # 尝试从文件对象获取原始文件名和扩展名 - 加强版
+            # 1. 处理dify_plugin的File对象
+            if hasattr(file, 'name') and file.name:
+                original_filename = file.name
+                source_file_name = original_filename
+                file_base_name, file_extension = os.path.splitext(original_filename)
+                if file_extension:
+                    extension = file_extension
+                    base_name = file_base_name
+            
+            # 2. 尝试从file.filename获取（常见于某些Web框架）
+            elif hasattr(file, 'filename') and file.filename:
+                original_filename = file.filename
+                source_file_name = original_filename
+                file_base_name, file_extension = os.path.splitext(original_filename)
+                if file_extension:
+                    extension = file_extension
+                    base_name = file_base_name
+            
+            # 3. 尝试从文件内容类型推断扩展名
+            if hasattr(file, 'content_type') and file.content_type:
+                extension = get_file_extension(file)
+            
+            # 4. 额外的检查：确保扩展名是小写的，并且包含点号
+            if extension and not extension.startswith('.'):
+                extension = '.' + extension
+            extension = extension.lower()
+            
+            # 根据filename_mode处理文件名
+            if filename_mode == 'filename_timestamp':
+                # 使用年月日时分秒毫秒格式的时间戳
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]  # 去掉最后三位得到毫秒
+                current_filename = f"{base_name}_{timestamp}{extension}"
+            else:
+                # 使用原始文件名作为默认文件名
+                current_filename = f"{base_name}{extension}"
+            
+            # 根据目录模式生成完整的文件路径
+            object_key = generate_object_key(directory, directory_mode, current_filename)
+            
+            # 已知文件大小时，按本次调用已完成传输的速度估算，剩余时间不够上传完成时不再开始
+            deadline = current_deadline()
+            file_size = getattr(file, 'size', None)
+            if deadline is not None and not deadline.can_finish(file_size if isinstance(file_size, int) else None):
+                return self._deadline_result(i, file, "not_attempted")
+            
+            # 上传文件
+            deduplicated = False
+            started = time.monotonic()
+            try:
+                if dedup:
+                    # 去重模式：以内容SHA-256替换文件名（保留扩展名和目录结构），对象已存在时跳过上传
+                    source = materialize_file(file, with_sha256=True)
+                    _, extension = os.path.splitext(current_filename)
+                    current_filename = f"{source['sha256']}{extension.lower()}"
+                    object_key = generate_object_key(directory, directory_mode, current_filename)
+                    deduplicated = not upload_if_absent(
+                        bucket, object_key,
+                        lambda: upload_object(bucket, object_key, source,
+                                              multipart_threshold=multipart_threshold, part_size=part_size)
+                    )
+                elif upload_mode == 'streaming':
+                    # 流式模式：边读取边上传，内存占用只与分片大小有关
+                    with open_file_stream(file) as chunks:
+                        source = upload_stream(bucket, object_key, chunks, part_size=part_size)
+                else:
+                    # 缓冲模式：一次性获取文件内容，同时得到文件大小和校验值，上传时复用同一份数据
+                    source = materialize_file(file)
+                    upload_object(bucket, object_key, source,
+                                  multipart_threshold=multipart_threshold, part_size=part_size)
+            except Exception as e:
+                raise ValueError(f"Failed to upload file {i+1}: {str(e)}")
+            
+            if deadline is not None and not deduplicated:
+                deadline.record_transfer(source['size'], time.monotonic() - started)
+
+            # 清除包含该对象的列举缓存和下载缓存，之后的列举和下载可以立即看到变化
+            get_object_index().invalidate(credentials['bucket'], object_key)
+            get_download_cache().invalidate(credentials['bucket'], object_key)
+            
+            # 获取文件大小（字节）
+            file_size_bytes = source['size']
+            
+            # 构建文件URL，配置的endpoint可能已带协议前缀，先统一为一个协议再拼接或签名
+            protocol, host = split_endpoint(credentials['endpoint'], credentials.get('use_https', True))
+            if not signed:
+                file_url = f"{protocol}://{credentials['bucket']}.{host}/{object_key}"
+            else:
+                # 签名URL始终使用配置的公网域名，不暴露内网或加速域名
+                public_bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                           f"{protocol}://{host}", credentials['bucket'],
+                                           limits=self.runtime.credentials)
+                file_url = public_bucket.sign_url("GET", object_key, expires=signed_expired)
+            
+            return {
+                "status": "success",
+                "file_url": file_url,
+                "filename": current_filename,
+                "object_key": object_key,
+                "file_type": file_type,
+                "file_size_bytes": file_size_bytes,
+                "deduplicated": deduplicated,
+                "message": "File already exists, upload skipped" if deduplicated else "File uploaded successfully",
+                "SourceFileName": source_file_name
+            }
+        except Exception as e:
+            # 如果单个文件上传失败，记录错误并继续上传其他文件
+            return {
+                "status": "error",
+                "error": str(e),
+                "file_index": i,
+                "filename": f"file_{i+1}"
+            }
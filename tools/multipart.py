@@ -0,0 +1,329 @@
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional
+
+import oss2
+from oss2.models import PartInfo
+from oss2.resumable import ResumableStore, determine_part_size
+
+from .concurrency import run_concurrently
+from .retry import call_with_retry
+
+# 超过该大小（字节）时改用分片上传
+DEFAULT_MULTIPART_THRESHOLD = 100 * 1024 * 1024
+# 默认分片大小（字节）
+DEFAULT_PART_SIZE = 10 * 1024 * 1024
+# 并发上传分片的线程数
+DEFAULT_PART_THREADS = 4
+
+# 断点信息保存目录，进程重启后同一文件可以从已完成的分片继续上传
+CHECKPOINT_ROOT = os.path.join(tempfile.gettempdir(), 'aliyun_oss_plugin')
+CHECKPOINT_DIR = 'upload_checkpoints'
+
+_store_lock = threading.Lock()
+_store: Optional[ResumableStore] = None
+
+
+def _get_store() -> ResumableStore:
+    """获取断点信息存储（延迟创建）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResumableStore(root=CHECKPOINT_ROOT, dir=CHECKPOINT_DIR)
+        return _store
+
+
+def mb_to_bytes(value: Any, default: int) -> int:
+    """
+    将以MB为单位的参数转换为字节数
+
+    Args:
+        value: 用户传入的MB数值，可能为空或字符串
+        default: 参数为空或非法时使用的默认字节数
+
+    Returns:
+        字节数
+    """
+    try:
+        if value in (None, ''):
+            return default
+        size = int(float(value) * 1024 * 1024)
+        return size if size > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+
+def upload_object(bucket: oss2.Bucket, object_key: str, source: Dict[str, Any],
+                  multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                  part_size: int = DEFAULT_PART_SIZE,
+                  num_threads: int = DEFAULT_PART_THREADS,
+                  headers: Optional[Dict[str, str]] = None) -> Any:
+    """
+    上传对象，超过阈值时自动切换为可断点续传的并发分片上传
+
+    Args:
+        bucket: OSS Bucket对象
+        object_key: 目标对象键
+        source: materialize_file返回的文件内容及校验信息
+        multipart_threshold: 分片上传阈值（字节）
+        part_size: 分片大小（字节）
+        num_threads: 并发上传分片的线程数
+        headers: 上传时附带的HTTP头
+
+    Returns:
+        oss2的上传结果对象
+    """
+    data = source['data']
+    is_path = source.get('is_path', False)
+
+    if source['size'] < multipart_threshold:
+        # 普通上传时附带Content-MD5，由服务端校验内容完整性
+        simple_headers = dict(headers or {})
+        if source.get('content_md5'):
+            simple_headers['Content-MD5'] = source['content_md5']
+        # 整个对象一次上传，重复上传结果相同，暂时性错误时可以安全重试
+        if is_path:
+            return call_with_retry(
+                lambda: bucket.put_object_from_file(object_key, data, headers=simple_headers), bucket.endpoint)
+        return call_with_retry(lambda: bucket.put_object(object_key, data, headers=simple_headers), bucket.endpoint)
+
+    if is_path:
+        # 本地文件直接使用oss2的断点续传实现
+        return oss2.resumable_upload(
+            bucket, object_key, os.fsdecode(data),
+            store=_get_store(),
+            headers=headers,
+            multipart_threshold=multipart_threshold,
+            part_size=part_size,
+            num_threads=num_threads
+        )
+
+    return _multipart_upload_bytes(bucket, object_key, data, source.get('md5'), part_size, num_threads, headers)
+
+
+def _multipart_upload_bytes(bucket: oss2.Bucket, object_key: str, data: bytes, digest: Optional[str],
+                            part_size: int, num_threads: int, headers: Optional[Dict[str, str]]) -> Any:
+    """并发分片上传内存中的数据，并在本地保存断点信息"""
+    size = len(data)
+    part_size = determine_part_size(size, preferred_size=part_size)
+    # 优先复用读取文件时已计算的校验值
+    digest = digest or hashlib.md5(data).hexdigest()
+
+    store = _get_store()
+    store_key = ResumableStore.make_store_key(bucket.bucket_name, object_key, f"md5:{digest}")
+
+    # 1. 读取断点信息，只有文件内容和分片大小都一致时才继续使用
+    upload_id = None
+    finished_parts: Dict[int, str] = {}
+    record = store.get(store_key)
+    if record and record.get('size') == size and record.get('part_size') == part_size \
+            and record.get('digest') == digest:
+        try:
+            # 以服务端已存在的分片为准，避免本地记录与实际状态不一致
+            for part in oss2.PartIterator(bucket, object_key, record['upload_id']):
+                finished_parts[part.part_number] = part.etag
+            upload_id = record['upload_id']
+        except oss2.exceptions.NoSuchUpload:
+            finished_parts = {}
+
+    # 2. 没有可用的断点时初始化新的分片上传
+    if upload_id is None:
+        upload_id = _init_multipart_upload(bucket, object_key, headers)
+        record = {'upload_id': upload_id, 'size': size, 'part_size': part_size, 'digest': digest}
+        store.put(store_key, record)
+
+    # 3. 并发上传尚未完成的分片
+    part_count = (size + part_size - 1) // part_size
+    pending = [n for n in range(1, part_count + 1) if n not in finished_parts]
+    parts_lock = threading.Lock()
+
+    def upload_part(_: int, part_number: int) -> None:
+        start = (part_number - 1) * part_size
+        etag = _upload_part_with_retry(bucket, object_key, upload_id, part_number, data[start:start + part_size])
+        with parts_lock:
+            finished_parts[part_number] = etag
+
+    run_concurrently(upload_part, pending, num_threads)
+
+    # 4. 合并分片，成功后删除断点信息
+    parts = [PartInfo(n, finished_parts[n]) for n in range(1, part_count + 1)]
+    result = _complete_multipart_upload(bucket, object_key, upload_id, parts)
+    store.delete(store_key)
+    return result
+
+
+def upload_stream(bucket: oss2.Bucket, object_key: str, chunks: Iterator[bytes],
+                  part_size: int = DEFAULT_PART_SIZE,
+                  num_threads: int = DEFAULT_PART_THREADS,
+                  headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    将数据块流式上传到OSS，内存占用与文件大小无关
+
+    数据不足一个分片时使用普通上传；否则每攒满一个分片就提交给线程池上传，
+    同时最多有num_threads个分片在上传，峰值内存约为(num_threads + 1) * part_size。
+
+    Args:
+        bucket: OSS Bucket对象
+        object_key: 目标对象键
+        chunks: bytes数据块迭代器
+        part_size: 分片大小（字节）
+        num_threads: 并发上传分片的线程数
+        headers: 上传时附带的HTTP头
+
+    Returns:
+        包含size、md5和content_md5的字典，与materialize_file的校验信息一致
+    """
+    # 除最后一个分片外，OSS要求分片不小于最小分片大小
+    part_size = max(part_size, oss2.defaults.min_part_size)
+    digest = hashlib.md5()
+    size = 0
+    buffer = bytearray()
+    upload_id = None
+    part_number = 0
+    futures = {}
+    failures = []
+    slots = threading.BoundedSemaphore(num_threads)
+    executor = ThreadPoolExecutor(max_workers=num_threads)
+
+    def on_part_done(future: Any) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            failures.append(future.exception())
+        slots.release()
+
+    def submit_part(chunk: bytes) -> None:
+        nonlocal upload_id, part_number
+        if upload_id is None:
+            upload_id = _init_multipart_upload(bucket, object_key, headers)
+        part_number += 1
+        # 等待空闲的上传槽位，限制同时驻留内存的分片数量
+        slots.acquire()
+        # 已有分片失败时不再继续读取数据
+        if failures:
+            slots.release()
+            raise failures[0]
+        future = executor.submit(_upload_part_with_retry, bucket, object_key, upload_id, part_number, chunk)
+        future.add_done_callback(on_part_done)
+        futures[part_number] = future
+
+    try:
+        for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            buffer += chunk
+            while len(buffer) >= part_size:
+                submit_part(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+
+        if upload_id is None:
+            # 数据不足一个分片，直接普通上传
+            simple_headers = dict(headers or {})
+            simple_headers['Content-MD5'] = base64.b64encode(digest.digest()).decode('ascii')
+            call_with_retry(lambda: bucket.put_object(object_key, bytes(buffer), headers=simple_headers),
+                            bucket.endpoint)
+        else:
+            if buffer:
+                submit_part(bytes(buffer))
+            parts = [PartInfo(n, futures[n].result()) for n in sorted(futures)]
+            _complete_multipart_upload(bucket, object_key, upload_id, parts)
+    except Exception:
+        # 流式数据无法续传，失败时取消分片上传以免残留碎片
+        if upload_id is not None:
+            for future in futures.values():
+                future.cancel()
+            try:
+                bucket.abort_multipart_upload(object_key, upload_id)
+            except oss2.exceptions.OssError:
+                pass
+        raise
+    finally:
+        executor.shutdown(wait=True)
+
+    return {
+        'size': size,
+        'md5': digest.hexdigest(),
+        'content_md5': base64.b64encode(digest.digest()).decode('ascii')
+    }
+
+
+def _init_multipart_upload(bucket: oss2.Bucket, object_key: str, headers: Optional[Dict[str, str]]) -> str:
+    """初始化分片上传，返回upload_id；每次调用都会创建新的上传任务，只在请求确定未被处理时重试"""
+    return call_with_retry(lambda: bucket.init_multipart_upload(object_key, headers=headers).upload_id,
+                           bucket.endpoint, idempotent=False)
+
+
+def _complete_multipart_upload(bucket: oss2.Bucket, object_key: str, upload_id: str, parts: list) -> Any:
+    """合并分片；首次请求成功后上传任务即被删除，重复请求会失败，只在请求确定未被处理时重试"""
+    return call_with_retry(lambda: bucket.complete_multipart_upload(object_key, upload_id, parts),
+                           bucket.endpoint, idempotent=False)
+
+
+def _upload_part_with_retry(bucket: oss2.Bucket, object_key: str, upload_id: str, part_number: int,
+                            chunk: bytes) -> str:
+    """上传单个分片，暂时性错误时重试（同一分片号重复上传会覆盖，可以安全重试），返回分片ETag"""
+    return call_with_retry(lambda: bucket.upload_part(object_key, upload_id, part_number, chunk).etag,
+                           bucket.endpoint)
+
+
+def copy_object(bucket: oss2.Bucket, source_bucket_name: str, source_key: str, target_key: str,
+                source_size: int, source_etag: Optional[str] = None,
+                multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                part_size: int = DEFAULT_PART_SIZE,
+                num_threads: int = DEFAULT_PART_THREADS,
+                headers: Optional[Dict[str, str]] = None) -> str:
+    """
+    在服务端复制对象，数据不经过插件
+
+    小于阈值的对象使用CopyObject一次复制；大对象初始化分片上传后并发执行UploadPartCopy，
+    每个分片复制源对象的一个字节区间，失败时取消分片上传。
+
+    Args:
+        bucket: 目标Bucket对象，源Bucket需与其位于同一地域
+        source_bucket_name: 源Bucket名称
+        source_key: 源对象键
+        target_key: 目标对象键
+        source_size: 源对象大小（字节）
+        source_etag: 源对象ETag，分片复制时用于确保所有分片来自同一版本
+        multipart_threshold: 使用分片复制的大小阈值
+        part_size: 分片大小
+        num_threads: 并发复制分片的线程数
+        headers: 分片复制时目标对象的HTTP头（如Content-Type），CopyObject会直接复制源对象的元数据
+
+    Returns:
+        使用的复制方式：copy_object或upload_part_copy
+    """
+    if source_size < multipart_threshold:
+        call_with_retry(lambda: bucket.copy_object(source_bucket_name, source_key, target_key), bucket.endpoint)
+        return 'copy_object'
+
+    part_size = determine_part_size(source_size, preferred_size=part_size)
+    part_count = (source_size + part_size - 1) // part_size
+    copy_headers = {'x-oss-copy-source-if-match': f'"{source_etag}"'} if source_etag else None
+    upload_id = _init_multipart_upload(bucket, target_key, headers)
+    finished_parts: Dict[int, str] = {}
+    parts_lock = threading.Lock()
+
+    def copy_part(_: int, part_number: int) -> None:
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, source_size) - 1
+        etag = call_with_retry(lambda: bucket.upload_part_copy(
+            source_bucket_name, source_key, (start, end), target_key, upload_id, part_number,
+            headers=copy_headers).etag, bucket.endpoint)
+        with parts_lock:
+            finished_parts[part_number] = etag
+
+    try:
+        run_concurrently(copy_part, range(1, part_count + 1), num_threads)
+        parts = [PartInfo(n, finished_parts[n]) for n in range(1, part_count + 1)]
+        _complete_multipart_upload(bucket, target_key, upload_id, parts)
+    except Exception:
+        # 复制失败时取消分片上传，避免残留的分片占用存储空间
+        try:
+            bucket.abort_multipart_upload(target_key, upload_id)
+        except oss2.exceptions.OssError:
+            pass
+        raise
+    return 'upload_part_copy'
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+import oss2
+
+from .singleflight import SingleFlight
+
+# 单次list_objects_v2请求返回的最大条目数（OSS限制）
+LIST_PAGE_SIZE = 1000
+# 缓存的列举结果有效期（秒）
+INDEX_TTL = 60
+# 单个前缀的对象数量超过该值时不缓存，直接分页列举
+INDEX_MAX_ENTRIES = 50000
+# 最多缓存的列举结果数量，超出后淘汰最久未使用的
+INDEX_MAX_LISTINGS = 64
+
+
+def object_entry(obj: oss2.models.SimplifiedObjectInfo) -> Dict[str, Any]:
+    """将列举结果中的对象转换为输出条目"""
+    return {
+        'key': obj.key,
+        'type': 'file',
+        'size': obj.size,
+        'etag': obj.etag,
+        'last_modified': datetime.fromtimestamp(obj.last_modified, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'storage_class': obj.storage_class
+    }
+
+
+def prefix_entry(prefix: str) -> Dict[str, Any]:
+    """将列举结果中的公共前缀转换为目录条目"""
+    return {'key': prefix, 'type': 'directory'}
+
+
+def iter_listing_pages(bucket: oss2.Bucket, prefix: str = '', delimiter: str = '', start_after: str = '',
+                       limit: Optional[int] = None) -> Generator[List[Dict[str, Any]], None, None]:
+    """
+    分页列举对象，每次请求返回后立即产出一页，不在内存中汇总全部结果
+
+    Args:
+        bucket: OSS Bucket对象
+        prefix: 对象键前缀
+        delimiter: 目录分隔符，设置后同一子目录下的对象合并为一个目录条目
+        start_after: 从该键之后开始列举（不包含该键）
+        limit: 最多列举的条目数量，为空时列举全部
+
+    Returns:
+        按对象键排序的条目列表的生成器，每个列表对应一次请求
+    """
+    continuation_token = ''
+    remaining = limit
+    while remaining is None or remaining > 0:
+        # 接近上限时只请求剩余数量的条目
+        max_keys = LIST_PAGE_SIZE if remaining is None else min(LIST_PAGE_SIZE, remaining)
+        result = bucket.list_objects_v2(prefix=prefix, delimiter=delimiter, start_after=start_after,
+                                        continuation_token=continuation_token, max_keys=max_keys)
+        entries = [object_entry(obj) for obj in result.object_list]
+        entries.extend(prefix_entry(common_prefix) for common_prefix in result.prefix_list)
+        entries.sort(key=lambda entry: entry['key'])
+        if entries:
+            yield entries
+        if remaining is not None:
+            remaining -= len(entries)
+        if not result.is_truncated:
+            return
+        continuation_token = result.next_continuation_token
+
+
+class ObjectIndex:
+    """
+    按(Endpoint, Bucket, 前缀, 分隔符)缓存完整列举结果的内存索引
+
+    缓存有效期内的重复列举和按文件名查找直接使用内存中的结果，不再请求OSS。
+    通过本插件上传、复制或删除对象时，包含该对象的缓存会被立即清除。
+    """
+
+    def __init__(self, ttl: float = INDEX_TTL, max_entries: int = INDEX_MAX_ENTRIES,
+                 max_listings: int = INDEX_MAX_LISTINGS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_listings = max_listings
+        self._listings: "OrderedDict[Tuple[str, str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get(self, bucket: oss2.Bucket, prefix: str = '', delimiter: str = '') -> Optional[Dict[str, Any]]:
+        """
+        获取前缀下的完整列举结果，缓存未命中时列举并写入缓存
+
+        Args:
+            bucket: OSS Bucket对象
+            prefix: 对象键前缀
+            delimiter: 目录分隔符
+
+        Returns:
+            包含entries（按对象键排序的全部条目）、names（文件名到条目的索引）和cached（是否命中缓存）的字典；
+            对象数量超过上限无法缓存时返回None
+        """
+        key = (bucket.endpoint, bucket.bucket_name, prefix, delimiter)
+        now = time.monotonic()
+
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is not None and listing['expires'] > now:
+                self._listings.move_to_end(key)
+                return dict(listing, cached=True)
+
+        # 相同前缀的并发列举合并为一次
+        listing = self._flight.do(key, lambda: self._load(bucket, prefix, delimiter))
+        if listing is None:
+            return None
+
+        with self._lock:
+            self._listings[key] = listing
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_listings:
+                self._listings.popitem(last=False)
+        return dict(listing, cached=False)
+
+    def invalidate(self, bucket_name: str, object_key: str) -> None:
+        """
+        清除包含指定对象的缓存
+
+        Args:
+            bucket_name: 存储空间名称
+            object_key: 新增、修改或删除的对象键
+        """
+        with self._lock:
+            for key in list(self._listings):
+                if key[1] == bucket_name and object_key.startswith(key[2]):
+                    del self._listings[key]
+
+    def _load(self, bucket: oss2.Bucket, prefix: str, delimiter: str) -> Optional[Dict[str, Any]]:
+        """列举前缀下的全部条目并建立文件名索引，超过上限时返回None"""
+        entries = []
+        for page in iter_listing_pages(bucket, prefix=prefix, delimiter=delimiter):
+            entries.extend(page)
+            if len(entries) > self.max_entries:
+                return None
+
+        names: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            if entry['type'] == 'file':
+                names.setdefault(os.path.basename(entry['key']), []).append(entry)
+
+        return {'entries': entries, 'names': names, 'expires': time.monotonic() + self.ttl}
+
+
+_index = ObjectIndex()
+
+
+def get_object_index() -> ObjectIndex:
+    """获取进程内共享的对象列举索引"""
+    return _index
@@ -0,0 +1,160 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import oss2
+
+from .endpoint_router import route_endpoint
+from .rate_limiter import ThrottledStream, get_rate_limiter
+from .deadline import call_timeout
+
+# 共享连接池中每个主机保持的最大连接数
+CONNECTION_POOL_SIZE = 32
+# 最多缓存的Bucket客户端数量，超出后淘汰最久未使用的
+MAX_CACHED_CLIENTS = 32
+# Bucket客户端空闲超过该时间（秒）后淘汰
+CLIENT_IDLE_TIMEOUT = 300
+
+# 进程内共享的HTTP会话，所有Bucket复用同一个连接池，保持长连接
+_session = oss2.Session(pool_size=CONNECTION_POOL_SIZE)
+_clients: "OrderedDict[Tuple, Tuple[oss2.Bucket, float]]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _is_object_data_request(method: str, key: str, params: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断请求是否传输对象数据：PutObject、UploadPart、AppendObject或GetObject
+
+    初始化、完成分片上传以及ACL、标签等子资源请求不传输对象数据，OSS不接受这些请求的x-oss-traffic-limit。
+
+    Args:
+        method: HTTP方法
+        key: 对象键
+        params: 请求参数
+
+    Returns:
+        是否为对象数据的上传或下载请求
+    """
+    if not key:
+        return False
+    params = params or {}
+    if method == 'PUT':
+        # PutObject没有子资源参数，UploadPart同时带uploadId和partNumber
+        return not params or ('uploadId' in params and 'partNumber' in params)
+    if method == 'POST':
+        return 'append' in params
+    if method == 'GET':
+        # GetObject只带图片处理、版本和响应头覆盖参数，ListParts等子资源请求不限速
+        return all(name in ('x-oss-process', 'versionId') or name.startswith('response-') for name in params)
+    return False
+
+
+class RateLimitedBucket(oss2.Bucket):
+    """
+    受进程内共享限速器约束的Bucket客户端
+
+    每个请求发送前消耗一个请求令牌；上传的请求体和下载的响应体按实际读取的字节数消耗带宽令牌，
+    启用服务端限速时为对象上传和下载请求添加x-oss-traffic-limit请求头。未配置任何限额时不做额外处理。
+
+    在截止时间范围（deadline_scope）内调用时，单次请求的超时时间不超过剩余时间，截止时间已到时不再发送请求。
+    """
+
+    @property
+    def timeout(self):
+        return call_timeout(self._timeout)
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+
+    def _do(self, method, bucket_name, key, **kwargs):
+        limiter = get_rate_limiter()
+        if not limiter.enabled():
+            return super()._do(method, bucket_name, key, **kwargs)
+
+        limiter.acquire_request(self.bucket_name)
+        is_object_transfer = _is_object_data_request(method, key, kwargs.get('params'))
+
+        headers = oss2.http.CaseInsensitiveDict(kwargs.get('headers') or {})
+        traffic_limit = limiter.traffic_limit(self.bucket_name)
+        if traffic_limit and is_object_transfer and oss2.headers.OSS_COPY_OBJECT_SOURCE not in headers:
+            # 请求头需要在签名前设置；服务端拷贝不经过本地链路，不限速
+            headers[oss2.headers.OSS_TRAFFIC_LIMIT] = str(traffic_limit)
+            kwargs['headers'] = headers
+
+        data = kwargs.get('data')
+        if data is not None:
+            if isinstance(data, (bytes, bytearray, str)):
+                data = io.BytesIO(oss2.compat.to_bytes(data))
+            kwargs['data'] = ThrottledStream(data, limiter, self.bucket_name)
+
+        resp = super()._do(method, bucket_name, key, **kwargs)
+        if method == 'GET' and key:
+            return ThrottledStream(resp, limiter, self.bucket_name)
+        return resp
+
+
+def get_bucket(access_key_id: str, access_key_secret: str, endpoint: str, bucket_name: str,
+               connect_timeout: Optional[float] = None, routing: Optional[str] = None,
+               limits: Optional[Dict[str, Any]] = None) -> oss2.Bucket:
+    """
+    获取复用连接池的OSS Bucket客户端
+
+    客户端按(AccessKey, Endpoint, Bucket)缓存，连续的工具调用可以直接使用已建立的TCP/TLS连接。
+
+    Args:
+        access_key_id: AccessKey ID
+        access_key_secret: AccessKey Secret
+        endpoint: OSS访问域名，可以带协议前缀
+        bucket_name: 存储空间名称
+        connect_timeout: 请求超时时间（秒），为空时使用oss2的默认值
+        routing: 域名路由模式（public、auto、internal、accelerate），为空时直接使用endpoint
+        limits: 该Bucket的限速配置（bandwidth_limit、request_rate_limit、server_traffic_limit），
+            为空时沿用已有配置或环境变量中的默认值
+
+    Returns:
+        oss2.Bucket对象
+    """
+    # 按路由模式将公网域名替换为内网或传输加速域名
+    endpoint = route_endpoint(endpoint, routing)
+
+    # 更新该Bucket在共享限速器中的限额
+    if limits is not None:
+        get_rate_limiter().configure(bucket_name, limits)
+
+    # 缓存键中只保存Secret的摘要，Secret变更后会创建新的客户端
+    secret_digest = hashlib.sha256(access_key_secret.encode('utf-8')).hexdigest()
+    key = (access_key_id, secret_digest, endpoint, bucket_name, connect_timeout)
+    now = time.monotonic()
+
+    with _clients_lock:
+        _evict_idle_clients(now)
+
+        cached = _clients.get(key)
+        if cached is not None:
+            bucket = cached[0]
+            _clients[key] = (bucket, now)
+            _clients.move_to_end(key)
+            return bucket
+
+        auth = oss2.Auth(access_key_id, access_key_secret)
+        bucket = RateLimitedBucket(auth, endpoint, bucket_name, session=_session, connect_timeout=connect_timeout)
+        _clients[key] = (bucket, now)
+
+        # 超出容量时淘汰最久未使用的客户端
+        while len(_clients) > MAX_CACHED_CLIENTS:
+            _clients.popitem(last=False)
+
+        return bucket
+
+
+def _evict_idle_clients(now: float) -> None:
+    """淘汰空闲超时的客户端（调用方需持有锁）"""
+    while _clients:
+        key, (_, last_used) = next(iter(_clients.items()))
+        if now - last_used <= CLIENT_IDLE_TIMEOUT:
+            break
+        del _clients[key]
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import uuid
+from typing import Any, Optional, Tuple
+
+import oss2
+from oss2.resumable import ResumableDownloadStore
+
+from .concurrency import run_concurrently
+from .multipart import CHECKPOINT_ROOT
+from .retry import call_with_retry
+
+# 分段下载时每个字节区间的大小（字节）
+DEFAULT_RANGE_PART_SIZE = 8 * 1024 * 1024
+# 并发下载字节区间的线程数
+DEFAULT_RANGE_THREADS = 4
+
+# 分段下载的临时文件及断点信息保存目录
+DOWNLOAD_DIR = os.path.join(CHECKPOINT_ROOT, 'downloads')
+CHECKPOINT_DIR = 'download_checkpoints'
+
+# 请求标准Range行为：区间非法时返回错误而不是整个对象
+STANDARD_RANGE_HEADERS = {'x-oss-range-behavior': 'standard'}
+
+_store_lock = threading.Lock()
+_store: Optional[ResumableDownloadStore] = None
+_active_paths = set()
+
+
+def _get_store() -> ResumableDownloadStore:
+    """获取断点信息存储（延迟创建）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResumableDownloadStore(root=CHECKPOINT_ROOT, dir=CHECKPOINT_DIR)
+            os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        return _store
+
+
+def parse_byte_range(value: Any) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    解析字节区间参数
+
+    Args:
+        value: 形如"0-1023"、"1024-"（从1024到末尾）或"-500"（最后500字节）的字符串
+
+    Returns:
+        oss2 get_object可用的(start, end)元组（包含两端），参数为空时返回None
+    """
+    if value in (None, ''):
+        return None
+
+    text = str(value).strip()
+    if text.lower().startswith('bytes='):
+        text = text[6:]
+    start_text, sep, end_text = text.partition('-')
+    if not sep or not (start_text.strip() or end_text.strip()):
+        raise ValueError(f"Invalid byte_range: {value}. Expected format like 0-1023, 1024- or -500")
+
+    try:
+        start = int(start_text) if start_text.strip() else None
+        end = int(end_text) if end_text.strip() else None
+    except ValueError:
+        raise ValueError(f"Invalid byte_range: {value}. Expected format like 0-1023, 1024- or -500")
+
+    if (start is not None and start < 0) or (end is not None and end < 0) \
+            or (start is not None and end is not None and start > end):
+        raise ValueError(f"Invalid byte_range: {value}")
+    return start, end
+
+
+def download_object_ranged(bucket: oss2.Bucket, object_key: str, object_meta: Any,
+                           part_size: int = DEFAULT_RANGE_PART_SIZE,
+                           num_threads: int = DEFAULT_RANGE_THREADS) -> str:
+    """
+    将大对象拆分为多个字节区间并发下载到本地文件
+
+    已完成的区间记录在断点信息中，下载中断后再次下载同一对象（ETag不变）时只下载缺失的区间。
+    调用方读取完文件后需调用finish_ranged_download清理。
+
+    Args:
+        bucket: OSS Bucket对象
+        object_key: 对象键
+        object_meta: head_object的返回结果
+        part_size: 每个字节区间的大小
+        num_threads: 并发下载的线程数
+
+    Returns:
+        下载完成的本地文件路径
+    """
+    store = _get_store()
+    size = object_meta.content_length
+    etag = object_meta.etag
+    part_count = (size + part_size - 1) // part_size
+
+    # 同一对象固定使用同一个本地文件，以便中断后续传；同时有其他任务在下载时改用独立文件
+    object_id = hashlib.md5(f"{bucket.endpoint}/{bucket.bucket_name}/{object_key}".encode('utf-8')).hexdigest()
+    path = os.path.join(DOWNLOAD_DIR, object_id)
+    with _store_lock:
+        if path in _active_paths:
+            path = os.path.join(DOWNLOAD_DIR, f"{object_id}-{uuid.uuid4().hex}")
+        _active_paths.add(path)
+    store_key = ResumableDownloadStore.make_store_key(bucket.bucket_name, object_key, path)
+
+    try:
+        # 1. 读取断点信息，对象未变化且本地文件完整时才继续使用
+        finished = set()
+        record = store.get(store_key)
+        if record and record.get('etag') == etag and record.get('size') == size \
+                and record.get('part_size') == part_size and os.path.exists(path) \
+                and os.path.getsize(path) == size:
+            finished = set(record.get('finished', []))
+        else:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            record = {'etag': etag, 'size': size, 'part_size': part_size, 'finished': []}
+            store.put(store_key, record)
+
+        # 2. 并发下载缺失的字节区间，每个区间独立重试
+        record_lock = threading.Lock()
+        pending = [n for n in range(part_count) if n not in finished]
+
+        def download_part(_: int, part_number: int) -> None:
+            start = part_number * part_size
+            end = min(start + part_size, size) - 1
+            # If-Match保证所有区间来自同一版本的对象
+            headers = dict(STANDARD_RANGE_HEADERS, **{'If-Match': f'"{etag}"'})
+
+            def fetch_range() -> bytes:
+                data = bucket.get_object(object_key, byte_range=(start, end), headers=headers).read()
+                if len(data) != end - start + 1:
+                    raise oss2.exceptions.InconsistentError(
+                        f"Range {start}-{end} returned {len(data)} bytes", None)
+                return data
+
+            # 暂时性错误和数据不完整时重试，4xx错误（包括对象已变化）重试也不会成功
+            data = call_with_retry(fetch_range, bucket.endpoint)
+
+            with open(path, 'r+b') as f:
+                f.seek(start)
+                f.write(data)
+            with record_lock:
+                finished.add(part_number)
+                record['finished'] = sorted(finished)
+                store.put(store_key, record)
+
+        run_concurrently(download_part, pending, num_threads)
+        return path
+    except Exception:
+        with _store_lock:
+            _active_paths.discard(path)
+        raise
+
+
+def finish_ranged_download(bucket: oss2.Bucket, object_key: str, path: str) -> None:
+    """删除分段下载的本地文件和断点信息"""
+    store = _get_store()
+    store_key = ResumableDownloadStore.make_store_key(bucket.bucket_name, object_key, path)
+    try:
+        store.delete(store_key)
+    except OSError:
+        pass
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    with _store_lock:
+        _active_paths.discard(path)
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 全局（进程内所有Bucket共享）带宽上限（MB/s）和请求速率上限（次/秒），为空或0表示不限制
+ENV_GLOBAL_BANDWIDTH_LIMIT = 'OSS_GLOBAL_BANDWIDTH_LIMIT'
+ENV_GLOBAL_REQUEST_RATE_LIMIT = 'OSS_GLOBAL_REQUEST_RATE_LIMIT'
+# 单个Bucket的默认带宽上限（MB/s）和请求速率上限（次/秒），可被提供商凭据覆盖
+ENV_BUCKET_BANDWIDTH_LIMIT = 'OSS_BUCKET_BANDWIDTH_LIMIT'
+ENV_BUCKET_REQUEST_RATE_LIMIT = 'OSS_BUCKET_REQUEST_RATE_LIMIT'
+# 是否同时通过x-oss-traffic-limit请求头由OSS服务端限速
+ENV_SERVER_TRAFFIC_LIMIT = 'OSS_SERVER_TRAFFIC_LIMIT'
+
+# x-oss-traffic-limit允许的取值范围（bit/s）：100KB/s到100MB/s
+TRAFFIC_LIMIT_MIN = 100 * 1024 * 8
+TRAFFIC_LIMIT_MAX = 100 * 1024 * 1024 * 8
+
+
+def _parse_rate(value: Any) -> float:
+    """解析速率配置，为空、非法或不大于0时返回0（不限制）"""
+    try:
+        rate = float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+    return rate if rate > 0 else 0.0
+
+
+def _parse_flag(value: Any) -> bool:
+    """解析布尔配置"""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    每秒补充rate个令牌，最多积累capacity个。预留令牌时允许透支，调用方按返回的等待时间休眠，
+    因此单次请求的数据量超过桶容量时也不会死锁，长期平均速率仍不超过rate。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        预留令牌
+
+        Args:
+            amount: 需要的令牌数量
+
+        Returns:
+            需要等待的时间（秒），令牌充足时为0
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    进程内共享的带宽和请求速率限制器
+
+    每个请求和每个传输的字节同时消耗全局令牌桶和所属Bucket的令牌桶，等待时间取两者的较大值。
+    全局限额来自环境变量；Bucket限额默认来自环境变量，可被该Bucket的提供商凭据覆盖。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global_bytes = self._make_bucket(_parse_rate(os.getenv(ENV_GLOBAL_BANDWIDTH_LIMIT)) * 1024 * 1024)
+        self._global_requests = self._make_bucket(_parse_rate(os.getenv(ENV_GLOBAL_REQUEST_RATE_LIMIT)))
+        self._default_limits = (
+            _parse_rate(os.getenv(ENV_BUCKET_BANDWIDTH_LIMIT)) * 1024 * 1024,
+            _parse_rate(os.getenv(ENV_BUCKET_REQUEST_RATE_LIMIT)),
+            _parse_flag(os.getenv(ENV_SERVER_TRAFFIC_LIMIT))
+        )
+        self._limits: Dict[str, Tuple[float, float, bool]] = {}
+        self._buckets: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+
+    @staticmethod
+    def _make_bucket(rate: float) -> Optional[TokenBucket]:
+        return TokenBucket(rate) if rate > 0 else None
+
+    def configure(self, bucket_name: str, credentials: Optional[Dict[str, Any]]) -> None:
+        """
+        根据提供商凭据设置Bucket的限额，凭据中未设置的项使用环境变量中的默认值
+
+        Args:
+            bucket_name: 存储空间名称
+            credentials: 提供商凭据，读取bandwidth_limit（MB/s）、request_rate_limit（次/秒）和server_traffic_limit
+        """
+        credentials = credentials or {}
+        default_bytes, default_requests, default_server = self._default_limits
+        bytes_rate = _parse_rate(credentials.get('bandwidth_limit')) * 1024 * 1024 or default_bytes
+        request_rate = _parse_rate(credentials.get('request_rate_limit')) or default_requests
+        server_limit = credentials.get('server_traffic_limit')
+        server_limit = default_server if server_limit in (None, '') else _parse_flag(server_limit)
+        limits = (bytes_rate, request_rate, server_limit)
+
+        with self._lock:
+            if self._limits.get(bucket_name) != limits:
+                self._limits[bucket_name] = limits
+                self._buckets[bucket_name] = (self._make_bucket(bytes_rate), self._make_bucket(request_rate))
+
+    def enabled(self) -> bool:
+        """是否配置了任何限额"""
+        with self._lock:
+            return bool(self._global_bytes or self._global_requests or any(self._default_limits)
+                        or any(any(limits) for limits in self._limits.values()))
+
+    def _bucket_limits(self, bucket_name: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        """获取Bucket的令牌桶，未通过凭据设置时使用环境变量中的默认值"""
+        with self._lock:
+            buckets = self._buckets.get(bucket_name)
+            if buckets is None:
+                bytes_rate, request_rate, _ = self._default_limits
+                buckets = (self._make_bucket(bytes_rate), self._make_bucket(request_rate))
+                self._limits[bucket_name] = self._default_limits
+                self._buckets[bucket_name] = buckets
+            return buckets
+
+    def reserve_request(self, bucket_name: str) -> float:
+        """预留一次请求，返回需要等待的时间（秒）"""
+        _, bucket_requests = self._bucket_limits(bucket_name)
+        return max([limiter.reserve(1) for limiter in (self._global_requests, bucket_requests) if limiter] or [0.0])
+
+    def reserve_bytes(self, bucket_name: str, amount: int) -> float:
+        """预留传输的字节数，返回需要等待的时间（秒）"""
+        if amount <= 0:
+            return 0.0
+        bucket_bytes, _ = self._bucket_limits(bucket_name)
+        return max([limiter.reserve(amount) for limiter in (self._global_bytes, bucket_bytes) if limiter] or [0.0])
+
+    def acquire_request(self, bucket_name: str) -> None:
+        """等待直到允许发送一次请求"""
+        _sleep(self.reserve_request(bucket_name))
+
+    def acquire_bytes(self, bucket_name: str, amount: int) -> None:
+        """等待直到允许传输指定字节数"""
+        _sleep(self.reserve_bytes(bucket_name, amount))
+
+    def traffic_limit(self, bucket_name: str) -> Optional[int]:
+        """
+        获取x-oss-traffic-limit请求头的取值
+
+        Returns:
+            启用服务端限速且设置了Bucket带宽上限时返回限速值（bit/s，限制在OSS允许的范围内），否则返回None
+        """
+        self._bucket_limits(bucket_name)
+        with self._lock:
+            bytes_rate, _, server_limit = self._limits[bucket_name]
+        if not server_limit or not bytes_rate:
+            return None
+        return int(min(max(bytes_rate * 8, TRAFFIC_LIMIT_MIN), TRAFFIC_LIMIT_MAX))
+
+
+def _sleep(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+class ThrottledStream:
+    """
+    按读取的字节数限速的数据流代理
+
+    用于上传请求体和下载响应体，其余属性（文件大小、CRC等）透传给原始对象。
+    """
+
+    def __init__(self, stream: Any, limiter: RateLimiter, bucket_name: str):
+        self._stream = stream
+        self._limiter = limiter
+        self._bucket_name = bucket_name
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        data = self._stream.read(amt) if amt is not None else self._stream.read()
+        self._limiter.acquire_bytes(self._bucket_name, len(data))
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._limiter.acquire_bytes(self._bucket_name, len(chunk))
+            yield chunk
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取进程内共享的限速器"""
+    return _limiter
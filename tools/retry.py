@@ -0,0 +1,239 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+import oss2
+import requests
+
+from .deadline import current_deadline
+
+T = TypeVar('T')
+
+# 单个请求最多尝试的次数（包括第一次）
+RETRY_MAX_ATTEMPTS = 3
+# 指数退避的基础等待时间和最大等待时间（秒），实际等待时间在[0, 退避上限]之间随机取值
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 5.0
+# 连续失败多少次后熔断该域名，以及熔断后多久（秒）放行一个探测请求
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# 表示服务端限流或暂时不可用的HTTP状态码
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# OSS返回的可重试错误码（例如QPS超限时的503 SlowDown）
+_RETRYABLE_OSS_CODES = {'SlowDown', 'RequestTimeout', 'InternalError', 'ServiceUnavailable'}
+
+
+class CircuitOpenError(Exception):
+    """域名处于熔断状态，请求未发送"""
+
+
+def _is_connect_error(error: BaseException) -> bool:
+    """判断错误是否发生在建立连接阶段（请求一定没有到达服务端）"""
+    if isinstance(error, oss2.exceptions.RequestError):
+        error = error.exception
+    return isinstance(error, (requests.exceptions.ConnectTimeout, httpx.ConnectError,
+                              httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def _error_status(error: BaseException) -> Optional[int]:
+    """获取错误对应的HTTP状态码，没有收到响应时返回None"""
+    if isinstance(error, oss2.exceptions.ServerError):
+        return error.status
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    return None
+
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """
+    判断错误是否可以重试
+
+    连接错误、超时和服务端5xx、429错误可以重试；4xx等客户端错误重试也不会成功。
+    非幂等请求只在确定服务端没有处理时重试：连接没有建立，或服务端明确返回限流、不可用。
+
+    Args:
+        error: 请求抛出的异常
+        idempotent: 请求是否可以安全地重复执行
+
+    Returns:
+        是否可以重试
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if _is_connect_error(error):
+        return True
+
+    status = _error_status(error)
+    if status is not None:
+        if status in (429, 503) or getattr(error, 'code', None) == 'SlowDown':
+            return True
+        if not idempotent:
+            return False
+        return status in _RETRYABLE_STATUS or getattr(error, 'code', None) in _RETRYABLE_OSS_CODES
+
+    # 没有响应的传输错误（连接中断、读取超时、CRC校验失败）：请求可能已被处理，只有幂等请求可以重试
+    transport_errors = (oss2.exceptions.RequestError, oss2.exceptions.InconsistentError,
+                        requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+                        httpx.TransportError)
+    return idempotent and isinstance(error, transport_errors)
+
+
+def backoff_delay(attempt: int) -> float:
+    """第attempt次重试（从1开始）前的等待时间，使用指数退避加全随机抖动"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    单个域名的熔断器
+
+    连续失败达到阈值后进入熔断状态，期间的请求直接失败而不是继续堆积超时；
+    每经过一个恢复时间放行一个探测请求，成功则恢复，失败则继续熔断。
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许发送请求"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # 半开状态：放行一个探测请求，并重新计时，探测请求没有结果前不放行其他请求
+            self._opened_at = now
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """获取域名对应的熔断器，同一主机的所有请求共享"""
+    host = urlparse(endpoint if '://' in endpoint else f"http://{endpoint}").netloc.lower()
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def _next_delay(error: BaseException, attempt: int, max_attempts: int, idempotent: bool,
+                deadline: Optional[float]) -> Optional[float]:
+    """计算下一次重试前的等待时间，不应重试时返回None"""
+    if attempt >= max_attempts or not is_retryable(error, idempotent):
+        return None
+    delay = backoff_delay(attempt)
+    # 等待后已经没有剩余时间时不再重试，未指定截止时间时使用当前范围内的截止时间
+    if deadline is None and current_deadline() is not None:
+        deadline = current_deadline().expires_at
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def _record(breaker: CircuitBreaker, error: Optional[BaseException]) -> None:
+    """记录请求结果，只有连接错误、超时和5xx等暂时性错误计入熔断"""
+    if error is None:
+        breaker.record_success()
+    elif is_retryable(error):
+        breaker.record_failure()
+    else:
+        status = _error_status(error)
+        if status is not None and status < 500:
+            # 服务端正常返回了4xx等错误，说明域名本身可用
+            breaker.record_success()
+        # 截止时间到达、本地错误等没有收到服务端响应的情况无法说明域名是否可用，不改变熔断状态
+
+
+def call_with_retry(request: Callable[[], T], endpoint: str, idempotent: bool = True,
+                    deadline: Optional[float] = None, max_attempts: int = RETRY_MAX_ATTEMPTS) -> T:
+    """
+    执行请求，暂时性错误时按指数退避重试
+
+    Args:
+        request: 发送请求的函数，重试时会再次调用，请求体需要能够重新读取
+        endpoint: 请求的域名或URL，用于选择熔断器
+        idempotent: 请求是否可以安全地重复执行
+        deadline: 截止时间（time.monotonic()的值），等待后超过截止时间时不再重试，
+            为空时使用deadline_scope设置的截止时间
+        max_attempts: 最多尝试的次数
+
+    Returns:
+        request的返回值
+
+    Raises:
+        CircuitOpenError: 域名处于熔断状态
+        Exception: 不可重试的错误或重试次数用尽后的最后一个错误
+    """
+    breaker = get_circuit_breaker(endpoint)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Endpoint {endpoint} is temporarily unavailable after repeated failures")
+        attempt += 1
+        try:
+            result = request()
+        except Exception as e:
+            _record(breaker, e)
+            delay = _next_delay(e, attempt, max_attempts, idempotent, deadline)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        _record(breaker, None)
+        return result
+
+
+async def async_call_with_retry(request: Callable[[], Awaitable[T]], endpoint: str, idempotent: bool = True,
+                                deadline: Optional[float] = None,
+                                max_attempts: int = RETRY_MAX_ATTEMPTS) -> T:
+    """call_with_retry的协程版本，等待重试时只挂起当前协程"""
+    breaker = get_circuit_breaker(endpoint)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Endpoint {endpoint} is temporarily unavailable after repeated failures")
+        attempt += 1
+        try:
+            result = await request()
+        except Exception as e:
+            _record(breaker, e)
+            delay = _next_delay(e, attempt, max_attempts, idempotent, deadline)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _record(breaker, None)
+        return result
@@ -0,0 +1,100 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+from urllib.parse import urlparse
+
+import oss2
+
+
+class _Call:
+    """一次正在进行的请求，等待者共享其结果或异常"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Exception = None
+
+
+class SingleFlight:
+    """
+    合并相同键的并发请求
+
+    同一时刻相同键只执行一次请求，期间到达的其他调用等待并共享该请求的结果，
+    请求结束后不保留结果，之后的调用会重新执行。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {'executed': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        执行请求，相同键已有请求在进行时等待其结果
+
+        Args:
+            key: 请求的合并键
+            func: 实际执行请求的回调，返回值会被所有等待者共享，不应被修改
+
+        Returns:
+            func的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """获取统计：executed（实际执行的请求数）和coalesced（合并到已有请求的调用数）"""
+        with self._lock:
+            return dict(self._stats)
+
+
+_download_flight = SingleFlight()
+
+
+def get_download_flight() -> SingleFlight:
+    """获取进程内共享的下载请求合并器，跨工具调用生效"""
+    return _download_flight
+
+
+def object_flight_key(access_key_id: str, bucket: oss2.Bucket, object_key: str, *variant: Any) -> tuple:
+    """
+    生成对象下载的合并键
+
+    Endpoint去掉协议并转为小写，同一对象的不同URL写法（大小写、协议、URL编码）得到相同的键。
+    键中包含AccessKey ID，不同凭证之间不会共享结果。
+
+    Args:
+        access_key_id: 下载使用的AccessKey ID
+        bucket: OSS Bucket对象
+        object_key: 解码后的对象键
+        variant: 影响返回内容的其他参数，例如图片处理参数、字节区间
+
+    Returns:
+        可作为字典键的元组
+    """
+    endpoint = urlparse(bucket.endpoint).netloc.lower() or bucket.endpoint.lower()
+    return (access_key_id, endpoint, bucket.bucket_name, object_key) + variant
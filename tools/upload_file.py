@@ -1,14 +1,18 @@
-import time
 import os
 from datetime import datetime
 from collections.abc import Generator
-from typing import Any, Dict
+from typing import Any
 
-import oss2
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from dify_plugin.file.file import File
-from .utils import get_file_type, get_file_extension
+from .utils import generate_object_key, get_file_type, get_file_extension, split_endpoint
+from .file_source import materialize_file, open_file_stream
+from .dedup import upload_if_absent
+from .oss_client import get_bucket
+from .object_index import get_object_index
+from .download_cache import get_download_cache
+from .multipart import DEFAULT_MULTIPART_THRESHOLD, DEFAULT_PART_SIZE, mb_to_bytes, upload_object, upload_stream
+from .deadline import Deadline, deadline_scope
 
 class UploadFileTool(Tool):
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
@@ -18,39 +22,21 @@ class UploadFileTool(Tool):
                 'endpoint': self.runtime.credentials.get('endpoint'),
                 'bucket': self.runtime.credentials.get('bucket'),
                 'access_key_id': self.runtime.credentials.get('access_key_id'),
-                'access_key_secret': self.runtime.credentials.get('access_key_secret')
+                'access_key_secret': self.runtime.credentials.get('access_key_secret'),
+                'endpoint_routing': self.runtime.credentials.get('endpoint_routing')
             }
             
             # 验证工具参数中的认证信息
             self._validate_credentials(credentials)
             
-            # 执行文件上传操作
-            result = self._upload_file(tool_parameters, credentials)
+            # 执行文件上传操作，单次请求的超时时间不超过本次调用的剩余时间
+            with deadline_scope(Deadline()):
+                result = self._upload_file(tool_parameters, credentials)
             
-            # 获取文件大小（字节）
-            file_size_bytes = 0
+            # 获取文件大小（字节），上传时已统计，无需再次读取文件
+            file_size_bytes = result.get("file_size_bytes", 0)
             file = tool_parameters.get('file')
             
-            # 尝试获取文件大小
-            if isinstance(file, File) and hasattr(file, 'blob'):
-                file_size_bytes = len(file.blob)
-            elif hasattr(file, 'read'):
-                # 保存当前文件指针位置
-                if hasattr(file, 'tell'):
-                    current_pos = file.tell()
-                else:
-                    current_pos = None
-                
-                # 读取文件内容获取大小
-                content = file.read()
-                file_size_bytes = len(content)
-                
-                # 重置文件指针
-                if hasattr(file, 'seek') and current_pos is not None:
-                    file.seek(current_pos)
-            elif isinstance(file, (str, bytes, os.PathLike)) and os.path.exists(file):
-                file_size_bytes = os.path.getsize(file)
-            
             # 转换为MB
             file_size_mb = round(file_size_bytes / (1024 * 1024), 2) if file_size_bytes > 0 else 0
             
@@ -66,6 +52,8 @@ class UploadFileTool(Tool):
                 "file_size_mb": file_size_mb,
                 "status": "success"
             }
+            if tool_parameters.get('dedup'):
+                file_info["deduplicated"] = result.get("deduplicated", False)
             
             # 构建JSON响应，与批量上传保持一致
             json_response = {
@@ -109,6 +97,13 @@ class UploadFileTool(Tool):
             filename_mode = parameters.get('filename_mode', 'filename')
             signed = parameters.get('signed',False)
             signed_expired = parameters.get('sign_expired',3600)
+            # 分片上传阈值和分片大小（参数单位为MB）
+            multipart_threshold = mb_to_bytes(parameters.get('multipart_threshold'), DEFAULT_MULTIPART_THRESHOLD)
+            part_size = mb_to_bytes(parameters.get('part_size'), DEFAULT_PART_SIZE)
+            # 上传模式：buffered（缓冲后上传）或streaming（流式上传）
+            upload_mode = parameters.get('upload_mode') or 'buffered'
+            # 是否启用基于内容哈希的去重上传
+            dedup = bool(parameters.get('dedup', False))
             
             # 验证必填参数
             if not file:
@@ -213,80 +208,63 @@ class UploadFileTool(Tool):
                     filename = f"{base_name}{extension}"
             
             # 根据目录模式生成完整的文件路径
-            object_key = self._generate_object_key(directory, directory_mode, filename)
+            object_key = generate_object_key(directory, directory_mode, filename)
             
-            # 创建OSS客户端
-            auth = oss2.Auth(credentials['access_key_id'], credentials['access_key_secret'])
-            bucket = oss2.Bucket(auth, credentials['endpoint'], credentials['bucket'])
+            # 获取OSS客户端（进程内复用连接池，按路由模式选择内网或加速域名）
+            bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                credentials['endpoint'], credentials['bucket'],
+                                routing=credentials['endpoint_routing'], limits=self.runtime.credentials)
 
-            # 上传文件 - 统一处理文件对象或文件路径
+            # 上传文件
+            deduplicated = False
             try:
-                # 处理dify_plugin的File对象
-                if isinstance(file, File):
-                    # 获取文件内容
-                    file_content = file.blob
-                    # 上传文件内容
-                    bucket.put_object(object_key, file_content)
-                # 尝试作为普通文件对象处理
-                elif hasattr(file, 'read'):
-                    # 重置文件指针到开头
-                    if hasattr(file, 'seek'):
-                        file.seek(0)
-                    # 读取文件内容
-                    file_content = file.read()
-                    # 上传文件内容
-                    bucket.put_object(object_key, file_content)
+                if dedup:
+                    # 去重模式：以内容SHA-256替换文件名（保留扩展名和目录结构），对象已存在时跳过上传
+                    source = materialize_file(file, with_sha256=True)
+                    _, extension = os.path.splitext(filename)
+                    filename = f"{source['sha256']}{extension.lower()}"
+                    object_key = generate_object_key(directory, directory_mode, filename)
+                    deduplicated = not upload_if_absent(
+                        bucket, object_key,
+                        lambda: upload_object(bucket, object_key, source,
+                                              multipart_threshold=multipart_threshold, part_size=part_size)
+                    )
+                elif upload_mode == 'streaming':
+                    # 流式模式：边读取边上传，内存占用只与分片大小有关
+                    with open_file_stream(file) as chunks:
+                        source = upload_stream(bucket, object_key, chunks, part_size=part_size)
                 else:
-                    # 尝试作为文件路径处理
-                    if isinstance(file, (str, bytes, os.PathLike)):
-                        bucket.put_object_from_file(object_key, file)
-                    else:
-                        # 如果是File对象但没有read方法，尝试获取其内容
-                        raise ValueError(f"Unsupported file type: {type(file)}. Expected file-like object or path.")
+                    # 缓冲模式：一次性获取文件内容，同时得到文件大小和校验值，上传时复用同一份数据
+                    source = materialize_file(file)
+                    upload_object(bucket, object_key, source,
+                                  multipart_threshold=multipart_threshold, part_size=part_size)
             except Exception as e:
                 raise ValueError(f"Failed to upload file: {str(e)}")
-            
-            # 构建文件URL
+
+            # 清除包含该对象的列举缓存和下载缓存，之后的列举和下载可以立即看到变化
+            get_object_index().invalidate(credentials['bucket'], object_key)
+            get_download_cache().invalidate(credentials['bucket'], object_key)
+
+            # 构建文件URL，配置的endpoint可能已带协议前缀，先统一为一个协议再拼接或签名
+            protocol, host = split_endpoint(credentials['endpoint'], credentials.get('use_https', True))
             if  not signed:
-                protocol = 'https' if credentials.get('use_https', True) else 'http'
-                file_url = f"{protocol}://{credentials['bucket']}.{credentials['endpoint']}/{object_key}"
+                file_url = f"{protocol}://{credentials['bucket']}.{host}/{object_key}"
             else:
-                file_url = bucket.sign_url("GET",object_key,expires=signed_expired)
-                if credentials.get('use_https', True):
-                    file_url = file_url.replace("http", "https")
+                # 签名URL始终使用配置的公网域名，不暴露内网或加速域名
+                public_bucket = get_bucket(credentials['access_key_id'], credentials['access_key_secret'],
+                                           f"{protocol}://{host}", credentials['bucket'],
+                                           limits=self.runtime.credentials)
+                file_url = public_bucket.sign_url("GET", object_key, expires=signed_expired)
 
             return {
                 "status": "success",
                 "file_url": file_url,
                 "filename": filename,
                 "object_key": object_key,
-                "message": "File uploaded successfully",
+                "file_size_bytes": source['size'],
+                "deduplicated": deduplicated,
+                "message": "File already exists, upload skipped" if deduplicated else "File uploaded successfully",
                 "SourceFileName": source_file_name
             }
         except Exception as e:
             raise ValueError(f"Failed to upload file: {str(e)}")
-    
-    def _generate_object_key(self, directory: str, directory_mode: str, filename: str) -> str:
-        """根据目录模式生成完整的对象键"""
-        # 确保目录名不以斜杠开头或结尾
-        directory = directory.strip('/')
-        
-        # 基础路径就是一级目录
-        base_path = directory
-        
-        # 根据目录模式添加日期相关的子目录
-        if directory_mode == 'yyyy_mm_dd_hierarchy':
-            # 年月日层级子目录模式 (一级目录/2025/09/10/目标文件)
-            now = datetime.now()
-            base_path = os.path.join(directory, str(now.year), f"{now.month:02d}", f"{now.day:02d}")
-        elif directory_mode == 'yyyy_mm_dd_combined':
-            # 年月日一体子目录模式 (一级目录/20250910/目标文件)
-            now = datetime.now()
-            base_path = os.path.join(directory, now.strftime('%Y%m%d'))
-        # 如果是no_subdirectory模式，则不添加额外的子目录
-        
-        # 组合完整的对象键
-        object_key = os.path.join(base_path, filename)
-        
-        # 将操作系统路径分隔符替换为OSS使用的斜杠
-        return object_key.replace('\\', '/')
\ No newline at end of file
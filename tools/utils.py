@@ -1,5 +1,7 @@
 import os
-from typing import Any, Union
+from datetime import datetime
+from typing import Any, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
 
 # 内容类型到扩展名的映射表（带点号）
 CONTENT_TYPE_TO_EXTENSION_WITH_DOT = {
@@ -133,6 +135,114 @@ def get_extension_from_content_type(content_type: str) -> str:
     return ".dat"
 
 
+def parse_oss_url(url: str) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    解析OSS URL，支持标准格式和自定义域名格式
+    标准格式: https://bucket.endpoint/object_key
+    自定义域名格式: https://custom-domain/object_key
+    
+    Args:
+        url: 文件URL
+        
+    Returns:
+        (bucket名称, endpoint, object_key)，自定义域名格式无法确定bucket和endpoint，两者为None，由调用方处理
+    """
+    parsed_url = urlparse(url)
+    
+    # 处理URL编码
+    object_key = unquote(parsed_url.path.lstrip('/'))
+    
+    # 如果是标准OSS URL格式 (bucket.endpoint)
+    if parsed_url.hostname and '.' in parsed_url.hostname:
+        parts = parsed_url.hostname.split('.', 1)
+        if len(parts) == 2:
+            bucket_name = parts[0]
+            endpoint = f"{parsed_url.scheme}://{parts[1]}"
+            # 保留URL中的端口（例如本地或自建的OSS兼容服务）
+            if parsed_url.port:
+                endpoint = f"{endpoint}:{parsed_url.port}"
+            return (bucket_name, endpoint, object_key)
+    
+    return None, None, object_key
+
+
+def resolve_oss_location(target: str, default_endpoint: str, default_bucket: str) -> Tuple[str, str, str]:
+    """
+    解析OSS URL或对象键，URL中没有的bucket和endpoint使用配置中的值
+    
+    Args:
+        target: 文件URL或配置Bucket中的对象键
+        default_endpoint: 配置的endpoint，可以带协议前缀
+        default_bucket: 配置的bucket名称
+        
+    Returns:
+        (带协议前缀的endpoint, bucket名称, 对象键)，对象键可能为空，由调用方校验
+    """
+    if target.startswith(('http://', 'https://')):
+        bucket_name, endpoint, object_key = parse_oss_url(target)
+    else:
+        # 不是URL时作为配置Bucket中的对象键处理
+        bucket_name, endpoint, object_key = None, None, target.lstrip('/')
+    
+    # 处理endpoint协议
+    endpoint_url = endpoint or default_endpoint
+    if not endpoint_url.startswith(('http://', 'https://')):
+        endpoint_url = f"http://{endpoint_url}"
+    
+    return endpoint_url, bucket_name or default_bucket, object_key
+
+
+def split_endpoint(endpoint: str, use_https: bool = True) -> Tuple[str, str]:
+    """
+    统一endpoint的协议，配置中的endpoint可能带或不带http(s)://前缀
+    
+    Args:
+        endpoint: OSS访问域名，例如 'oss-cn-hangzhou.aliyuncs.com' 或 'https://oss-cn-hangzhou.aliyuncs.com'
+        use_https: 是否使用https
+        
+    Returns:
+        (协议, 不带协议前缀的域名)，例如 ('https', 'oss-cn-hangzhou.aliyuncs.com')
+    """
+    host = endpoint.split('://', 1)[1] if '://' in endpoint else endpoint
+    return ('https' if use_https else 'http'), host.rstrip('/')
+
+
+def generate_object_key(directory: str, directory_mode: str, filename: str) -> str:
+    """
+    根据目录模式生成完整的对象键
+    
+    Args:
+        directory: 一级目录
+        directory_mode: 目录模式，no_subdirectory、yyyy_mm_dd_hierarchy或yyyy_mm_dd_combined
+        filename: 文件名
+        
+    Returns:
+        使用斜杠分隔的对象键，例如 'uploads/2025/09/10/a.png'
+    """
+    # 确保目录名不以斜杠开头或结尾
+    directory = directory.strip('/')
+    
+    # 基础路径就是一级目录
+    base_path = directory
+    
+    # 根据目录模式添加日期相关的子目录
+    if directory_mode == 'yyyy_mm_dd_hierarchy':
+        # 年月日层级子目录模式 (一级目录/2025/09/10/目标文件)
+        now = datetime.now()
+        base_path = os.path.join(directory, str(now.year), f"{now.month:02d}", f"{now.day:02d}")
+    elif directory_mode == 'yyyy_mm_dd_combined':
+        # 年月日一体子目录模式 (一级目录/20250910/目标文件)
+        now = datetime.now()
+        base_path = os.path.join(directory, now.strftime('%Y%m%d'))
+    # 如果是no_subdirectory模式，则不添加额外的子目录
+    
+    # 组合完整的对象键
+    object_key = os.path.join(base_path, filename)
+    
+    # 将操作系统路径分隔符替换为OSS使用的斜杠
+    return object_key.replace('\\', '/')
+
+
 def get_file_type(file: Any) -> str:
     """
     获取文件类型（不带点号）